@@ -16,6 +16,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Import database initialization
 from api.database import init_db, check_database_health
+from knowledge_base.retrieval.index_registry import init_index_registry, close_index_registry
 
 # Import all routers
 from api.routes import (
@@ -63,12 +64,16 @@ async def lifespan(app: FastAPI):
     health_status = check_database_health()
     logger.info(f"💚 Database health: {health_status.get('status', 'unknown')}")
     
+    # Shared dataset indexes (datasets load lazily on first query)
+    app.state.index_registry = init_index_registry()
+    
     logger.info("✅ API started successfully!")
     
     yield
     
     # Shutdown
     logger.info("👋 Shutting down RAG-ENTERPRISE API...")
+    close_index_registry()
 
 # Create FastAPI app
 app = FastAPI(
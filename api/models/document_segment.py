@@ -14,5 +14,6 @@ class DocumentSegment(Base):
     char_count = Column(Integer, default=0)
     embedding = Column(JSON, nullable=True)
     meta_data = Column(JSON, nullable=True)
+    keywords = Column(JSON, nullable=True)  # analyzed terms, computed once at indexing
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
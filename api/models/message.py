@@ -1,7 +1,7 @@
 """
 Message and MessageFeedback Models - Fixed (metadata renamed)
 """
-from sqlalchemy import Column, String, Text, JSON, Float
+from sqlalchemy import Column, String, Text, JSON, Float, Integer, Boolean
 from .base import BaseModel
 
 
@@ -14,6 +14,24 @@ class Message(BaseModel):
     answer = Column(Text, nullable=True)
     message_metadata = Column(JSON, nullable=True)  # Changed from 'metadata' to 'message_metadata'
     
+    # Model and usage (written by the chat and conversation routes)
+    agent_id = Column(String, nullable=True)
+    agent_mode = Column(String, nullable=True)
+    model_provider = Column(String, nullable=True)
+    model_id = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    total_price = Column(Float, default=0.0)
+    retrieval_used = Column(Boolean, default=False)
+    retrieval_count = Column(Integer, default=0)
+    created_by = Column(String, nullable=True)
+    
+    # Latency in seconds (reported by /analytics/performance)
+    time_to_first_token = Column(Float, nullable=True)
+    provider_response_latency = Column(Float, nullable=True)
+    total_latency = Column(Float, nullable=True)
+    
     def __repr__(self):
         return f"<Message {self.id}>"
 
@@ -13,6 +13,8 @@ from api.models.dataset import Dataset
 from api.models.document import Document
 from api.models.user import User
 from core.auth import get_current_user, require_admin
+from core.rag.rag_pipeline import RAGPipeline
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry, get_index_registry
 
 router = APIRouter()
 
@@ -221,7 +223,8 @@ async def update_dataset(
 async def delete_dataset(
     dataset_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    current_user: User = Depends(require_admin),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """Delete dataset"""
     try:
@@ -240,6 +243,8 @@ async def delete_dataset(
         db.delete(dataset)
         db.commit()
         
+        registry.drop(dataset_id, current_user.tenant_id)
+        
         return None
     except HTTPException:
         raise
@@ -334,3 +339,68 @@ async def get_dataset_statistics(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get statistics: {str(e)}"
         )
+
+
+@router.get("/{dataset_id}/vector-store", response_model=dict)
+async def get_dataset_vector_store_stats(
+    dataset_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
+):
+    """Get statistics of the dataset's vector collection"""
+    try:
+        rag_pipeline = RAGPipeline(db, registry)
+        stats = await rag_pipeline.retriever.get_collection_stats(
+            tenant_id=current_user.tenant_id, dataset_id=dataset_id
+        )
+        
+        if not stats["collections"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Dataset is not indexed"
+            )
+        
+        return {
+            "dataset_id": dataset_id,
+            "collection": stats["collections"][0]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_dataset_vector_store_stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get vector store statistics: {str(e)}"
+        )
+
+
+@router.post("/{dataset_id}/vector-store/compact", response_model=dict)
+async def compact_dataset_vector_store(
+    dataset_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
+):
+    """Compact the dataset's vector store and report its throughput"""
+    try:
+        rag_pipeline = RAGPipeline(db, registry)
+        result = await rag_pipeline.retriever.compact_vector_store(
+            dataset_id, tenant_id=current_user.tenant_id
+        )
+        
+        return {
+            "dataset_id": dataset_id,
+            "compaction": result
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        print(f"Error in compact_dataset_vector_store: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compact vector store: {str(e)}"
+        )
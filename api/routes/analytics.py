@@ -15,6 +15,7 @@ from api.models import (
 from api.middleware.auth import get_current_user
 from api.middleware.tenant import get_current_tenant
 from utilities.logger import get_logger
+from utilities.tracing import stage_breakdown
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/analytics")
@@ -192,6 +193,7 @@ async def get_performance_analytics(
     
     latencies = [msg.total_latency for msg in messages if msg.total_latency]
     provider_latencies = [msg.provider_response_latency for msg in messages if msg.provider_response_latency]
+    ttft_latencies = [msg.time_to_first_token for msg in messages if msg.time_to_first_token]
     
     return {
         "period": period,
@@ -208,8 +210,17 @@ async def get_performance_analytics(
                 "average": round(sum(provider_latencies) / len(provider_latencies), 3) if provider_latencies else 0,
                 "min": round(min(provider_latencies), 3) if provider_latencies else 0,
                 "max": round(max(provider_latencies), 3) if provider_latencies else 0
+            },
+            "time_to_first_token": {
+                "average": round(sum(ttft_latencies) / len(ttft_latencies), 3) if ttft_latencies else 0,
+                "min": round(min(ttft_latencies), 3) if ttft_latencies else 0,
+                "max": round(max(ttft_latencies), 3) if ttft_latencies else 0
             }
         },
+        # Milliseconds per request stage, from the traces saved with each message
+        "stages": stage_breakdown(
+            (msg.message_metadata or {}).get("trace") for msg in messages
+        ),
         "retrieval_performance": {
             "messages_with_retrieval": sum(1 for msg in messages if msg.retrieval_used),
             "average_retrieval_count": round(
@@ -2,24 +2,32 @@
 Enhanced Chat Routes with RAG Support
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Optional, List
 import logging
+import time
 
-from api.database import get_db
+from api.database import SessionLocal, get_db
 from api.models import User, Conversation, Message
 from api.middleware.auth import get_current_user
 from core.rag.rag_pipeline import RAGPipeline
+from core.rag.streaming import StreamingProvider, create_streaming_provider, format_sse
+from utilities.tracing import record_span, span, start_trace
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry, DatasetNotFoundError, get_index_registry
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/chat")
 
+NO_CONTEXT_RESPONSE = "عذراً، لم أجد معلومات ذات صلة في المستندات المتاحة. يرجى تحميل مستندات ذات صلة أو إعادة صياغة السؤال."
+
 
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     dataset_id: Optional[str] = None
+    dataset_ids: Optional[List[str]] = Field(default=None, max_length=20)  # searched concurrently
     use_rag: bool = True
     top_k: int = 5
     agent_id: Optional[str] = None
@@ -32,13 +40,65 @@ class ChatResponse(BaseModel):
     sources: List[dict] = []
     used_rag: bool
     model: str
+    cached: bool = False
+
+
+def _get_or_create_conversation(db: Session, request: ChatRequest, current_user: User) -> Conversation:
+    """The request's conversation (404 if not the user's), or a new one"""
+    if request.conversation_id:
+        conversation = db.query(Conversation).filter(
+            Conversation.id == request.conversation_id,
+            Conversation.user_id == current_user.id
+        ).first()
+        
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        return conversation
+    
+    # Create new conversation
+    conversation = Conversation(
+        user_id=current_user.id,
+        name=request.message[:50],
+        mode='chat',
+        status='normal'
+    )
+    db.add(conversation)
+    db.flush()
+    return conversation
+
+
+def _check_datasets(db: Session, request: ChatRequest, current_user: User):
+    """404 unless every requested dataset belongs to the user's tenant"""
+    if not request.use_rag:
+        return
+    datasets = ([request.dataset_id] if request.dataset_id else []) + list(request.dataset_ids or [])
+    for dataset_id in dict.fromkeys(datasets):
+        try:
+            DatasetIndexRegistry.owner(db, dataset_id, current_user.tenant_id)
+        except DatasetNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Dataset {dataset_id} not found"
+            )
+
+
+def _record_message(conversation: Conversation, message: Message, query: str):
+    """Update conversation counters for a new message"""
+    conversation.message_count += 1
+    if not conversation.first_message:
+        conversation.first_message = query
+        conversation.first_message_id = message.id
 
 
 @router.post("/", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """
     Enhanced chat endpoint with RAG support
@@ -49,106 +109,95 @@ async def chat(
     """
     logger.info(f"Chat request from user {current_user.id}: '{request.message[:50]}...'")
     
+    _check_datasets(db, request, current_user)
+    
     response_text = ""
     sources = []
     used_rag = False
+    cached = False
+    tokens_saved = 0
     
     try:
-        # RAG Mode
-        if request.use_rag and request.dataset_id:
-            logger.info(f"Using RAG mode with dataset {request.dataset_id}")
-            
-            # Initialize RAG pipeline
-            rag_pipeline = RAGPipeline(db)
-            
-            # Process query through RAG
-            rag_result = await rag_pipeline.process_query(
-                query=request.message,
-                top_k=request.top_k,
-                dataset_id=request.dataset_id
-            )
-            
-            if rag_result['contexts']:
-                # Build RAG prompt
-                prompt = rag_pipeline.build_rag_prompt(
+        with start_trace('chat', user_id=current_user.id, rag=bool(request.use_rag)) as trace:
+            # RAG Mode
+            if request.use_rag and (request.dataset_id or request.dataset_ids):
+                logger.info(f"Using RAG mode with dataset(s) {request.dataset_id or request.dataset_ids}")
+                
+                # RAG pipeline over the shared dataset indexes
+                rag_pipeline = RAGPipeline(db, registry)
+                
+                # Retrieve + generate (near-duplicate questions come from the answer cache)
+                rag_result = await rag_pipeline.answer(
                     query=request.message,
-                    contexts=rag_result['contexts']
+                    generate=_generate_response,
+                    top_k=request.top_k,
+                    dataset_id=request.dataset_id,
+                    tenant_id=current_user.tenant_id,
+                    dataset_ids=request.dataset_ids
                 )
                 
-                # Generate response (placeholder - will use Azure OpenAI)
-                response_text = await _generate_response(prompt)
-                sources = rag_result['sources']
-                used_rag = True
-                
-                logger.info(f"RAG response generated with {len(sources)} sources")
+                if rag_result['answer'] is not None:
+                    response_text = rag_result['answer']
+                    sources = rag_result['sources']
+                    used_rag = True
+                    cached = rag_result['cached']
+                    tokens_saved = 0 if cached else rag_result['context_packing']['tokens_saved']
+                    
+                    logger.info(f"RAG response generated with {len(sources)} sources (cached={cached})")
+                else:
+                    response_text = NO_CONTEXT_RESPONSE
+                    used_rag = False
+            
+            # Direct LLM Mode
             else:
-                response_text = "عذراً، لم أجد معلومات ذات صلة في المستندات المتاحة. يرجى تحميل مستندات ذات صلة أو إعادة صياغة السؤال."
+                logger.info("Using direct LLM mode (no RAG)")
+                with span('generate', prompt_chars=len(request.message)):
+                    response_text = await _generate_response(request.message)
                 used_rag = False
-        
-        # Direct LLM Mode
-        else:
-            logger.info("Using direct LLM mode (no RAG)")
-            response_text = await _generate_response(request.message)
-            used_rag = False
-        
-        # Create or get conversation
-        if request.conversation_id:
-            conversation = db.query(Conversation).filter(
-                Conversation.id == request.conversation_id,
-                Conversation.user_id == current_user.id
-            ).first()
             
-            if not conversation:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Conversation not found"
-                )
-        else:
-            # Create new conversation
-            conversation = Conversation(
-                user_id=current_user.id,
-                name=request.message[:50],
-                mode='chat',
-                status='normal'
+            conversation = _get_or_create_conversation(db, request, current_user)
+            
+            # Latency covers the answer (saving the message is not included)
+            trace.finish()
+            generation = trace.stages().get('generate')
+            
+            # Save message
+            message = Message(
+                conversation_id=conversation.id,
+                query=request.message,
+                answer=response_text,
+                agent_id=request.agent_id,
+                model_provider='azure_openai',
+                model_id='gpt-4',
+                retrieval_used=used_rag,
+                retrieval_count=len(sources),
+                provider_response_latency=generation / 1000 if generation is not None else None,
+                total_latency=trace.duration_ms / 1000,
+                message_metadata={
+                    'sources': sources if sources else [],
+                    'dataset_id': request.dataset_id,
+                    'dataset_ids': request.dataset_ids,
+                    'cached': cached,
+                    'tokens_saved': tokens_saved,
+                    'trace': trace.to_dict()
+                },
+                created_by=current_user.id
+            )
+            db.add(message)
+            
+            _record_message(conversation, message, request.message)
+            db.commit()
+            db.refresh(conversation)
+            
+            return ChatResponse(
+                message=request.message,
+                response=response_text,
+                conversation_id=conversation.id,
+                sources=sources,
+                used_rag=used_rag,
+                model='gpt-4',
+                cached=cached
             )
-            db.add(conversation)
-            db.flush()
-        
-        # Save message
-        message = Message(
-            conversation_id=conversation.id,
-            query=request.message,
-            answer=response_text,
-            agent_id=request.agent_id,
-            model_provider='azure_openai',
-            model_id='gpt-4',
-            retrieval_used=used_rag,
-            retrieval_count=len(sources),
-            message_metadata={
-                'sources': sources if sources else [],
-                'dataset_id': request.dataset_id
-            },
-            created_by=current_user.id
-        )
-        db.add(message)
-        
-        # Update conversation
-        conversation.message_count += 1
-        if not conversation.first_message:
-            conversation.first_message = request.message
-            conversation.first_message_id = message.id
-        
-        db.commit()
-        db.refresh(conversation)
-        
-        return ChatResponse(
-            message=request.message,
-            response=response_text,
-            conversation_id=conversation.id,
-            sources=sources,
-            used_rag=used_rag,
-            model='gpt-4'
-        )
         
     except HTTPException:
         raise
@@ -175,6 +224,10 @@ async def _generate_response(prompt: str) -> str:
     
     logger.info("Generating LLM response (placeholder)")
     
+    return _placeholder_response(prompt)
+
+
+def _placeholder_response(prompt: str) -> str:
     return f"""[Placeholder Response]
 
 هذه إجابة تجريبية. في الإصدار النهائي، سيتم استخدام Azure OpenAI GPT-4 لتوليد إجابة ذكية.
@@ -187,6 +240,160 @@ async def _generate_response(prompt: str) -> str:
 3. الإجابة ستكون مبنية على السياق المسترجع من المستندات"""
 
 
+def get_streaming_provider() -> StreamingProvider:
+    """Streaming LLM (Azure OpenAI when configured, else the placeholder streamed locally)"""
+    global _streaming_provider
+    if _streaming_provider is None:
+        _streaming_provider = create_streaming_provider(_placeholder_response)
+    return _streaming_provider
+
+
+_streaming_provider: Optional[StreamingProvider] = None
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    registry: DatasetIndexRegistry = Depends(get_index_registry),
+    provider: StreamingProvider = Depends(get_streaming_provider)
+):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Events: 'sources' (retrieval results, first), 'delta' (answer text
+    chunks) and 'done' (usage, latency and the saved message ID). The
+    message is saved once the answer is complete, with its
+    time-to-first-token and total latency.
+    """
+    logger.info(f"Streaming chat request from user {current_user.id}: '{request.message[:50]}...'")
+    
+    # Resolved before streaming so a bad conversation or dataset ID is still a 404
+    _check_datasets(db, request, current_user)
+    conversation = _get_or_create_conversation(db, request, current_user)
+    db.commit()
+    
+    return StreamingResponse(
+        _chat_events(request, current_user, conversation.id, registry, provider),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _chat_events(
+    request: ChatRequest,
+    current_user: User,
+    conversation_id: str,
+    registry: DatasetIndexRegistry,
+    provider: StreamingProvider,
+    session_factory=SessionLocal
+) -> AsyncIterator[str]:
+    """SSE frames for one streamed answer; saves the message at the end"""
+    started = time.perf_counter()
+    # The request's session is closed once the response starts
+    db = session_factory()
+    parts = []
+    sources = []
+    cached = False
+    used_rag = False
+    usage = {}
+    latency = {'time_to_first_token': None, 'provider_response_latency': None}
+    
+    try:
+        with start_trace('chat', user_id=current_user.id, rag=bool(request.use_rag), streamed=True) as trace:
+            if request.use_rag and (request.dataset_id or request.dataset_ids):
+                rag_pipeline = RAGPipeline(db, registry)
+                async for event, data in rag_pipeline.answer_stream(
+                    query=request.message,
+                    provider=provider,
+                    top_k=request.top_k,
+                    dataset_id=request.dataset_id,
+                    tenant_id=current_user.tenant_id,
+                    dataset_ids=request.dataset_ids
+                ):
+                    if event == 'sources':
+                        sources = data['sources']
+                        cached = data['cached']
+                    elif event == 'delta':
+                        parts.append(data['text'])
+                    elif event == 'done':
+                        usage = data['usage']
+                        latency.update(data['latency'])
+                        used_rag = data['answer'] is not None
+                        if not used_rag:
+                            parts.append(NO_CONTEXT_RESPONSE)
+                            latency['time_to_first_token'] = time.perf_counter() - started
+                            yield format_sse('delta', {'text': NO_CONTEXT_RESPONSE})
+                        continue
+                    yield format_sse(event, data)
+            else:
+                yield format_sse('sources', {'sources': [], 'cached': False})
+                provider_started = time.perf_counter()
+                async for delta in provider.stream(request.message):
+                    if not parts:
+                        latency['time_to_first_token'] = time.perf_counter() - started
+                    parts.append(delta)
+                    yield format_sse('delta', {'text': delta})
+                provider_finished = time.perf_counter()
+                latency['provider_response_latency'] = provider_finished - provider_started
+                record_span('generate', provider_started, provider_finished, provider=provider.name, deltas=len(parts))
+                usage = dict(provider.usage)
+            
+            latency['total_latency'] = time.perf_counter() - started
+            trace.finish()
+            
+            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            message = Message(
+                conversation_id=conversation_id,
+                query=request.message,
+                answer=''.join(parts),
+                agent_id=request.agent_id,
+                model_provider=provider.name,
+                model_id=provider.model,
+                prompt_tokens=usage.get('prompt_tokens', 0),
+                completion_tokens=usage.get('completion_tokens', 0),
+                total_tokens=usage.get('total_tokens', 0),
+                retrieval_used=used_rag,
+                retrieval_count=len(sources),
+                time_to_first_token=latency['time_to_first_token'],
+                provider_response_latency=latency['provider_response_latency'],
+                total_latency=latency['total_latency'],
+                message_metadata={
+                    'sources': sources,
+                    'dataset_id': request.dataset_id,
+                    'dataset_ids': request.dataset_ids,
+                    'cached': cached,
+                    'streamed': True,
+                    'trace': trace.to_dict()
+                },
+                created_by=current_user.id
+            )
+            db.add(message)
+            if conversation is not None:
+                _record_message(conversation, message, request.message)
+            db.commit()
+            
+            logger.info(
+                f"Streamed answer: ttft={latency['time_to_first_token']}s total={latency['total_latency']:.3f}s"
+            )
+            yield format_sse('done', {
+                'conversation_id': conversation_id,
+                'message_id': message.id,
+                'used_rag': used_rag,
+                'cached': cached,
+                'usage': usage,
+                'latency': latency
+            })
+    
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Streaming chat error: {e}")
+        yield format_sse('error', {'detail': f"Chat processing failed: {str(e)}"})
+    finally:
+        db.close()
+
+
 @router.get("/agents")
 async def list_agents(current_user: User = Depends(get_current_user)):
     """List available agents"""
@@ -223,23 +430,22 @@ async def list_agents(current_user: User = Depends(get_current_user)):
 @router.post("/index-dataset")
 async def index_dataset(
     dataset_id: str,
+    full: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """
     Index a dataset for RAG
     
-    This generates embeddings for all document segments
-    and stores them in the vector store
+    Only new or changed segments are embedded; vectors of deleted or
+    disabled segments are removed. full=true re-embeds every segment.
     """
     try:
         logger.info(f"Indexing dataset {dataset_id} by user {current_user.id}")
         
-        # Initialize RAG pipeline
-        rag_pipeline = RAGPipeline(db)
-        
-        # Index dataset
-        result = await rag_pipeline.retriever.index_dataset(dataset_id)
+        # Sync the dataset's shared index
+        result = await registry.reload(db, dataset_id, current_user.tenant_id, full=full)
         
         logger.info(f"Dataset indexed: {result}")
         
@@ -249,6 +455,11 @@ async def index_dataset(
             "statistics": result
         }
         
+    except DatasetNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Dataset {dataset_id} not found"
+        )
     except Exception as e:
         logger.error(f"Indexing error: {e}")
         raise HTTPException(
@@ -260,12 +471,13 @@ async def index_dataset(
 @router.get("/retrieval-stats")
 async def get_retrieval_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """Get RAG retrieval statistics"""
     try:
-        rag_pipeline = RAGPipeline(db)
-        stats = await rag_pipeline.retriever.get_stats()
+        rag_pipeline = RAGPipeline(db, registry)
+        stats = await rag_pipeline.retriever.get_stats(tenant_id=current_user.tenant_id)
         
         return {
             "statistics": stats,
@@ -10,6 +10,7 @@ from api.database import get_db
 from api.models import Dataset, User, Tenant, Document
 from api.middleware.auth import get_current_user
 from api.middleware.tenant import get_current_tenant
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry, get_index_registry
 from utilities.logger import get_logger
 
 logger = get_logger(__name__)
@@ -179,7 +180,8 @@ async def delete_dataset(
     dataset_id: str,
     current_user: User = Depends(get_current_user),
     current_tenant: Tenant = Depends(get_current_tenant),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """
     Delete dataset
@@ -206,6 +208,7 @@ async def delete_dataset(
     # Delete dataset (cascade will delete documents and segments)
     db.delete(dataset)
     db.commit()
+    registry.drop(dataset_id, current_tenant.id)
     
     logger.info(f"Dataset deleted: {dataset_id} by user {current_user.id}")
     
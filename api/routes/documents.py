@@ -10,12 +10,16 @@ from datetime import datetime
 import mimetypes
 
 from api.database import get_db
-from api.models.document import Document, DocumentStatus
+from api.models.document import Document, DocumentSegment, DocumentStatus
 from api.models.dataset import Dataset
 from api.models.user import User
 from core.auth import get_current_user
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry, get_index_registry
+from utilities.logger import get_logger
 from utilities.storage import save_upload_file
 
+logger = get_logger(__name__)
+
 router = APIRouter()
 
 # Allowed file types
@@ -28,7 +32,8 @@ async def upload_document(
     file: UploadFile = File(...),
     dataset_id: str = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """Upload a document to a dataset"""
     try:
@@ -103,6 +108,16 @@ async def upload_document(
             document.error_message = str(e)
             db.commit()
         
+        # Keep the dataset's shared index current. The document is already
+        # committed: an indexing failure must not fail the upload (a retry
+        # would create a duplicate); the next sync of the dataset picks it up
+        if document.status == DocumentStatus.COMPLETED:
+            try:
+                await registry.index_document(db, document.id)
+            except Exception as e:
+                logger.error(f"Indexing error for document {document.id}: {e}")
+                db.rollback()
+        
         return {
             "id": document.id,
             "name": document.name,
@@ -221,7 +236,8 @@ async def get_document(
 async def delete_document(
     document_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    registry: DatasetIndexRegistry = Depends(get_index_registry)
 ):
     """Delete a document"""
     try:
@@ -243,10 +259,19 @@ async def delete_document(
             except Exception as e:
                 print(f"Failed to delete file: {e}")
         
+        segment_ids = [
+            segment_id for (segment_id,) in db.query(DocumentSegment.id).filter(
+                DocumentSegment.document_id == document_id
+            )
+        ]
+        
         # Delete from database
         db.delete(document)
         db.commit()
         
+        # Drop its segments from the dataset's shared index
+        await registry.remove_segments(document.dataset_id, segment_ids, current_user.tenant_id)
+        
         return None
     except HTTPException:
         raise
@@ -67,6 +67,45 @@ class Settings(BaseSettings):
     embedding_model: str = "text-embedding-ada-002"
     embedding_dimension: int = 1536
     embedding_deployment: Optional[str] = None
+    embedding_cache_size: int = 10000
+    embedding_cache_ttl_seconds: int = 3600
+    
+    # === Vector Store ===
+    vector_store_backend: str = "memory"  # memory | hnsw | ivfpq | persistent | sharded
+    vector_store_path: str = "./data/vector_store"
+    vector_store_shards: int = 4
+    
+    # === Multi-dataset Retrieval ===
+    retrieval_max_concurrency: int = 8  # dataset searches in flight per query
+    retrieval_dataset_timeout_ms: int = 2000  # slower datasets are left out of the results
+    retrieval_score_normalization: str = "minmax"  # none | minmax | zscore
+    
+    # === Hybrid Search Fusion ===
+    hybrid_fusion_strategy: str = "minmax"  # rrf | minmax | zscore | weighted
+    hybrid_rrf_k: int = 60
+    hybrid_candidate_multiplier: int = 1  # hits fetched per leg = top_k * multiplier
+    hybrid_max_candidate_multiplier: int = 4  # deeper fetches only while the top-k is unsettled
+    hybrid_search_workers: int = 4  # threads scoring keyword queries off the event loop
+    hybrid_vector_timeout_ms: int = 2000  # embedding + vector search; slower legs are dropped
+    hybrid_keyword_timeout_ms: int = 1000
+    
+    # === Semantic Answer Cache ===
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_size: int = 1000  # answers per tenant/dataset
+    answer_cache_ttl_seconds: int = 86400
+    
+    # === Reranking (CPU) ===
+    rerank_max_candidates: int = 50
+    rerank_latency_budget_ms: float = 50.0
+    rerank_cache_size: int = 10000
+    rerank_onnx_model_path: Optional[str] = None  # cross-encoder .onnx, scored after cosine + BM25
+    rerank_onnx_tokenizer_path: Optional[str] = None  # defaults to the model file's directory
+    rerank_onnx_weight: float = 1.0
+    
+    # === Context Packing ===
+    context_token_budget: int = 3000  # estimated tokens of retrieved context per prompt
+    context_min_overlap_chars: int = 20  # shorter chunk overlaps are not merged
     
     # === Storage ===
     storage_path: str = "/tmp/rag-enterprise/storage"
@@ -79,6 +118,12 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_file: str = "/tmp/rag-enterprise/logs/api.log"
     
+    # === Tracing ===
+    trace_file_enabled: bool = True
+    trace_file_path: str = "/tmp/rag-enterprise/logs/traces.jsonl"
+    trace_file_max_bytes: int = 10485760  # rotate at 10MB
+    trace_file_backups: int = 5
+    
     # === CORS ===
     cors_origins: List[str] = [
         "http://localhost:3000",
@@ -127,3 +172,6 @@ class Settings(BaseSettings):
 
 # Singleton instance
 settings = Settings()
+
+# Legacy name used by older modules (`from core.config import config`)
+config = settings
@@ -0,0 +1,181 @@
+"""
+Semantic Answer Cache - reuse answers to near-duplicate questions
+
+Entries are keyed by the normalized query embedding and scoped per
+(tenant, dataset, top_k). A lookup returns the most similar earlier
+question above a similarity threshold. Every entry records the dataset
+version it was answered against; bumping the version (documents added,
+changed or deleted) makes older answers unreachable.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
+
+import numpy as np
+
+from knowledge_base.vector_store.vector_math import normalize_rows
+
+AnswerScope = Tuple[Optional[str], Optional[str], int]
+
+
+class _ScopeEntries:
+    """Cached answers of one scope: embedding matrix + payloads"""
+
+    __slots__ = ("embeddings", "answers", "expires_at", "versions")
+
+    def __init__(self):
+        self.embeddings: Optional[np.ndarray] = None
+        self.answers: List[Dict[str, Any]] = []
+        self.expires_at: List[float] = []
+        self.versions: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def append(self, embedding: np.ndarray, answer: Dict[str, Any], expires_at: float, version: int):
+        self.embeddings = embedding if self.embeddings is None else np.vstack([self.embeddings, embedding])
+        self.answers.append(answer)
+        self.expires_at.append(expires_at)
+        self.versions.append(version)
+
+    def keep(self, mask: np.ndarray):
+        rows = np.flatnonzero(mask)
+        self.embeddings = self.embeddings[rows] if rows.size else None
+        self.answers = [self.answers[i] for i in rows]
+        self.expires_at = [self.expires_at[i] for i in rows]
+        self.versions = [self.versions[i] for i in rows]
+
+
+class SemanticAnswerCache:
+    """Near-duplicate question cache scoped per tenant and dataset"""
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 86400,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            max_entries: Maximum answers kept per scope (oldest dropped first)
+            ttl_seconds: Answer lifetime (None = no expiry)
+            clock: Time source (monotonic seconds)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._scopes: Dict[AnswerScope, _ScopeEntries] = {}
+        self._versions: Dict[Optional[str], int] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, dataset_id: Optional[str]) -> int:
+        """Current version of a dataset's documents"""
+        return self._versions.get(dataset_id, 0)
+
+    def invalidate(self, dataset_id: Optional[str]) -> int:
+        """
+        Bump a dataset's version so earlier answers are no longer served
+
+        Returns:
+            The new version
+        """
+        # Unscoped (all datasets) answers depend on every dataset
+        for affected in {dataset_id, None}:
+            self._versions[affected] = self.version(affected) + 1
+        for scope in [scope for scope in self._scopes if scope[1] in (dataset_id, None)]:
+            del self._scopes[scope]
+        return self._versions[dataset_id]
+
+    def lookup(
+        self,
+        query_embedding: List[float],
+        dataset_id: Optional[str],
+        tenant_id: Optional[str] = None,
+        top_k: int = 5
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Most similar cached answer above the threshold
+
+        Returns:
+            The cached answer with its 'similarity', or None
+        """
+        entries = self._scopes.get((tenant_id, dataset_id, top_k))
+        if entries is None or not len(entries):
+            self.misses += 1
+            return None
+
+        # Drop expired answers and answers of older dataset versions
+        current = self.version(dataset_id)
+        now = self.clock()
+        alive = np.array([
+            version == current and expires_at > now
+            for version, expires_at in zip(entries.versions, entries.expires_at)
+        ])
+        if not alive.all():
+            entries.keep(alive)
+            if not len(entries):
+                self.misses += 1
+                return None
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        similarities = entries.embeddings @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return {**entries.answers[best], 'similarity': float(similarities[best])}
+
+    def store(
+        self,
+        query_embedding: List[float],
+        answer: Dict[str, Any],
+        dataset_id: Optional[str],
+        tenant_id: Optional[str] = None,
+        top_k: int = 5,
+        version: Optional[int] = None
+    ):
+        """
+        Cache an answer for a question
+
+        Args:
+            version: Dataset version the answer was computed against (read
+                before retrieval, so an answer racing an update is never served)
+        """
+        if self.max_entries <= 0:
+            return
+
+        scope = (tenant_id, dataset_id, top_k)
+        entries = self._scopes.get(scope)
+        if entries is None:
+            entries = self._scopes[scope] = _ScopeEntries()
+
+        embedding = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds is not None else float('inf')
+        if version is None:
+            version = self.version(dataset_id)
+        entries.append(embedding, answer, expires_at, version)
+
+        if len(entries) > self.max_entries:
+            mask = np.ones(len(entries), dtype=bool)
+            mask[:len(entries) - self.max_entries] = False
+            entries.keep(mask)
+
+    def clear(self):
+        self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'scopes': len(self._scopes),
+            'entries': sum(len(entries) for entries in self._scopes.values()),
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
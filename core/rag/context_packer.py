@@ -0,0 +1,187 @@
+"""
+Context Packer - assemble retrieved chunks into a token-budgeted context
+
+Chunks are split with an overlap (TextSplitter.chunk_overlap), so hits
+from neighbouring positions of one document repeat text. Adjacent hits are
+merged into one passage with the overlapping span removed, passages
+already contained in a better-ranked one are dropped, and the rest are
+packed greedily (best rank first) into a token budget.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import re
+
+from core.config import settings
+
+_WORD = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate (no tokenizer download)
+
+    Punctuation counts as one token and words as one token per ~4
+    characters, which tracks BPE tokenizers closely enough for budgeting.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _WORD.findall(text))
+
+
+def overlap_length(left: str, right: str, max_overlap: Optional[int] = None) -> int:
+    """Length of the longest suffix of left that is a prefix of right"""
+    size = min(len(left), len(right))
+    if max_overlap is not None:
+        size = min(size, max_overlap)
+    if not size:
+        return 0
+
+    # Prefix function over right-prefix + separator + left-suffix (linear time)
+    text = right[:size] + '\0' + left[-size:]
+    prefix = [0] * len(text)
+    for i in range(1, len(text)):
+        k = prefix[i - 1]
+        while k and text[i] != text[k]:
+            k = prefix[k - 1]
+        if text[i] == text[k]:
+            k += 1
+        prefix[i] = k
+    return prefix[-1]
+
+
+class ContextPacker:
+    """Merge, dedup and budget retrieved chunks for the prompt"""
+
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        min_overlap: int = 20,
+        max_overlap: Optional[int] = None
+    ):
+        """
+        Args:
+            token_budget: Maximum estimated tokens of packed context
+            min_overlap: Shorter suffix/prefix matches are treated as coincidence
+            max_overlap: Longest overlap searched (None = whole chunk)
+        """
+        self.token_budget = token_budget
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+
+    def _merge(self, left: str, right: str) -> Tuple[str, int]:
+        """right appended to left without their shared span, and the chars removed"""
+        overlap = overlap_length(left, right, self.max_overlap)
+        if overlap < self.min_overlap:
+            return f"{left}\n{right}", 0
+        return left + right[overlap:], overlap
+
+    def _passages(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs of adjacent chunks of one document merged into passages, in rank order"""
+        runs: Dict[Any, List[Tuple[int, int]]] = {}
+        passages = []
+        for rank, doc in enumerate(documents):
+            if doc.get('document_id') is None or doc.get('position') is None:
+                passages.append({'rank': rank, 'members': [rank], 'text': doc['text']})
+            else:
+                runs.setdefault(doc['document_id'], []).append((doc['position'], rank))
+
+        for hits in runs.values():
+            hits.sort()
+            current = None
+            for position, rank in hits:
+                text = documents[rank]['text']
+                if current is not None and position - current['position'] <= 1:
+                    if position != current['position']:
+                        current['text'], _ = self._merge(current['text'], text)
+                    current['position'] = position
+                    current['rank'] = min(current['rank'], rank)
+                    current['members'].append(rank)
+                    continue
+                current = {'rank': rank, 'members': [rank], 'text': text, 'position': position}
+                passages.append(current)
+
+        passages.sort(key=lambda passage: passage['rank'])
+        return passages
+
+    def pack(
+        self,
+        documents: List[Dict[str, Any]],
+        token_budget: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Pack ranked retrieval results into the token budget
+
+        Args:
+            documents: Ranked results ('text', 'segment_id', 'document_id', 'position', 'score')
+            token_budget: Overrides the packer's budget for this request
+
+        Returns:
+            (contexts, report) - each context has 'text', 'tokens' and the
+            'documents' it was built from (best first); the report has
+            tokens_in/tokens_out/tokens_saved and merge/drop counts
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        tokens_in = sum(estimate_tokens(doc['text']) for doc in documents)
+
+        contexts: List[Dict[str, Any]] = []
+        seen: List[str] = []
+        used = 0
+        duplicates = 0
+        over_budget = 0
+        for passage in self._passages(documents):
+            normalized = _WHITESPACE.sub(' ', passage['text']).strip()
+            if any(normalized in kept for kept in seen):
+                duplicates += 1
+                continue
+
+            text = passage['text']
+            tokens = estimate_tokens(text)
+            if used + tokens > budget:
+                if contexts:
+                    over_budget += 1
+                    continue
+                # The best passage alone is over budget: keep its head
+                text, tokens = self._truncate(text, budget)
+                if not tokens:
+                    over_budget += 1
+                    continue
+
+            seen.append(normalized)
+            used += tokens
+            contexts.append({
+                'text': text,
+                'tokens': tokens,
+                'documents': [documents[rank] for rank in sorted(passage['members'])]
+            })
+
+        report = {
+            'chunks_in': len(documents),
+            'contexts_out': len(contexts),
+            'merged': sum(len(context['documents']) - 1 for context in contexts),
+            'duplicates': duplicates,
+            'over_budget': over_budget,
+            'token_budget': budget,
+            'tokens_in': tokens_in,
+            'tokens_out': used,
+            'tokens_saved': tokens_in - used
+        }
+        return contexts, report
+
+    @staticmethod
+    def _truncate(text: str, budget: int) -> Tuple[str, int]:
+        """Longest prefix of whole words within the budget"""
+        end = 0
+        tokens = 0
+        for match in _WORD.finditer(text):
+            cost = math.ceil(len(match.group()) / 4)
+            if tokens + cost > budget:
+                break
+            tokens += cost
+            end = match.end()
+        return text[:end], tokens
+
+
+# Global instance
+context_packer = ContextPacker(
+    token_budget=settings.context_token_budget,
+    min_overlap=settings.context_min_overlap_chars
+)
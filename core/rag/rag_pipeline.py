@@ -1,11 +1,19 @@
 """
 RAG Pipeline - Complete Retrieval-Augmented Generation
 """
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
+import asyncio
 import logging
+import time
 
 from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry
+from core.rag.answer_cache import SemanticAnswerCache
+from core.rag.reranker import CPUReranker, cpu_reranker
+from core.rag.context_packer import ContextPacker, context_packer
+from core.rag.streaming import StreamingProvider
+from utilities.tracing import record_span, span
 from knowledge_base.embeddings.embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
@@ -14,17 +22,41 @@ logger = logging.getLogger(__name__)
 class RAGPipeline:
     """Complete RAG pipeline: retrieve → rerank → generate"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        registry: Optional[DatasetIndexRegistry] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        reranker: Optional[CPUReranker] = None,
+        packer: Optional[ContextPacker] = None
+    ):
+        """
+        Args:
+            db: Database session
+            registry: Shared dataset indexes; datasets are loaded on first
+                use and reused across requests. Without it the pipeline
+                uses its own empty collections.
+            answer_cache: Semantic answer cache (defaults to the registry's)
+            reranker: CPU reranking stage (defaults to the shared instance)
+            packer: Context assembly (merge, dedup, token budget)
+        """
         self.db = db
-        self.retriever = DocumentRetriever(db)
+        self.registry = registry
+        self.answer_cache = answer_cache or (registry.answer_cache if registry else None)
+        self.retriever = registry.retriever(db) if registry else DocumentRetriever(db)
         self.embedding_service = embedding_service
+        self.reranker = reranker or cpu_reranker
+        self.context_packer = packer or context_packer
+        self.timings: Dict[str, Any] = {}
     
     async def process_query(
         self,
         query: str,
         top_k: int = 5,
         dataset_id: Optional[str] = None,
-        use_reranking: bool = True
+        use_reranking: bool = True,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Process query through RAG pipeline
@@ -34,17 +66,44 @@ class RAGPipeline:
             top_k: Number of documents to retrieve
             dataset_id: Optional dataset filter
             use_reranking: Whether to rerank results
+            tenant_id: Optional tenant scope (only its collections are searched)
+            dataset_ids: Several datasets searched concurrently and merged
             
         Returns:
             Dict with retrieved contexts and metadata
         """
         logger.info(f"Processing RAG query: '{query[:50]}...'")
+        self.timings = {}
+        
+        with span('process_query', top_k=top_k, use_reranking=use_reranking) as stage:
+            result = await self._process_query(query, top_k, dataset_id, use_reranking, tenant_id, dataset_ids)
+            stage.set(contexts=len(result['contexts']))
+        return result
+    
+    async def _process_query(
+        self,
+        query: str,
+        top_k: int,
+        dataset_id: Optional[str],
+        use_reranking: bool,
+        tenant_id: Optional[str],
+        dataset_ids: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        """Retrieve, rerank and pack (see process_query)"""
+        datasets = list(dict.fromkeys(([dataset_id] if dataset_id else []) + list(dataset_ids or [])))
+        if self.registry and datasets:
+            with span('load_index', datasets=len(datasets)):
+                await asyncio.gather(*[
+                    self.registry.ensure_loaded(self.db, dataset, tenant_id) for dataset in datasets
+                ])
         
         # Step 1: Retrieve relevant documents
         retrieved_docs = await self.retriever.retrieve(
             query=query,
             top_k=top_k * 2 if use_reranking else top_k,  # Get more for reranking
-            dataset_id=dataset_id
+            dataset_id=dataset_id,
+            tenant_id=tenant_id,
+            dataset_ids=datasets if len(datasets) > 1 else None
         )
         
         if not retrieved_docs:
@@ -52,7 +111,8 @@ class RAGPipeline:
             return {
                 'contexts': [],
                 'sources': [],
-                'total_retrieved': 0
+                'total_retrieved': 0,
+                'timings': {**self.retriever.timings, **self.timings}
             }
         
         # Step 2: Rerank if enabled
@@ -62,28 +122,191 @@ class RAGPipeline:
         else:
             retrieved_docs = retrieved_docs[:top_k]
         
-        # Step 3: Prepare context
-        contexts = [doc['text'] for doc in retrieved_docs]
+        # Step 3: Prepare context (adjacent chunks merged, packed into the token budget)
+        with span('context_pack', chunks=len(retrieved_docs)) as packing_span:
+            packed, packing = self.context_packer.pack(retrieved_docs)
+            packing_span.set(contexts=len(packed), tokens_saved=packing['tokens_saved'])
+        contexts = [context['text'] for context in packed]
         
-        # Step 4: Prepare sources/citations
+        # Step 4: Prepare sources/citations (one per context, as numbered in the prompt)
         sources = []
-        for i, doc in enumerate(retrieved_docs, 1):
+        for i, context in enumerate(packed, 1):
+            doc = context['documents'][0]
             sources.append({
                 'index': i,
                 'segment_id': doc['segment_id'],
+                'segment_ids': [d['segment_id'] for d in context['documents']],
                 'document_id': doc['document_id'],
-                'score': doc['score'],
-                'preview': doc['text'][:200] + '...' if len(doc['text']) > 200 else doc['text']
+                'score': max(d['score'] for d in context['documents']),
+                'preview': context['text'][:200] + '...' if len(context['text']) > 200 else context['text']
             })
         
-        logger.info(f"RAG pipeline: Retrieved {len(contexts)} contexts")
+        logger.info(
+            f"RAG pipeline: Retrieved {len(retrieved_docs)} chunks, packed {len(contexts)} contexts "
+            f"({packing['tokens_saved']} tokens saved)"
+        )
         
         return {
             'contexts': contexts,
             'sources': sources,
             'total_retrieved': len(retrieved_docs),
-            'query': query
+            'query': query,
+            'context_packing': packing,
+            'timings': {**self.retriever.timings, **self.timings}
+        }
+    
+    async def answer(
+        self,
+        query: str,
+        generate: Callable[[str], Awaitable[str]],
+        top_k: int = 5,
+        dataset_id: Optional[str] = None,
+        use_reranking: bool = True,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Answer a query: retrieve, build the prompt and generate
+        
+        Near-duplicates of earlier questions on the same dataset and tenant
+        are answered from the semantic answer cache without retrieval or
+        generation. Multi-dataset queries are not cached (cache scopes and
+        invalidation are per dataset).
+        
+        Args:
+            query: User query
+            generate: Async LLM call (prompt -> answer)
+            top_k: Number of documents to retrieve
+            dataset_id: Optional dataset filter
+            use_reranking: Whether to rerank results
+            tenant_id: Optional tenant scope
+            dataset_ids: Several datasets searched concurrently and merged
+            
+        Returns:
+            Dict with 'answer' (None when nothing relevant was retrieved),
+            'sources', 'contexts' and 'cached'
+        """
+        cache = None if dataset_ids else self.answer_cache
+        if cache is not None:
+            with span('answer_cache') as lookup:
+                query_embedding = await self.embedding_service.generate_embedding(query)
+                version = cache.version(dataset_id)
+                cached = cache.lookup(query_embedding, dataset_id, tenant_id, top_k)
+                lookup.set(hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Answer served from cache (similarity={cached['similarity']:.3f})")
+                return {**cached, 'cached': True}
+        
+        rag_result = await self.process_query(
+            query=query,
+            top_k=top_k,
+            dataset_id=dataset_id,
+            use_reranking=use_reranking,
+            tenant_id=tenant_id,
+            dataset_ids=dataset_ids
+        )
+        
+        if not rag_result['contexts']:
+            return {**rag_result, 'answer': None, 'cached': False}
+        
+        prompt = self.build_rag_prompt(query=query, contexts=rag_result['contexts'])
+        with span('generate', prompt_chars=len(prompt)):
+            answer = await generate(prompt)
+        result = {
+            'answer': answer,
+            'sources': rag_result['sources'],
+            'contexts': rag_result['contexts'],
+            'total_retrieved': rag_result['total_retrieved'],
+            'query': query,
+            'context_packing': rag_result['context_packing']
         }
+        
+        if cache is not None:
+            cache.store(query_embedding, result, dataset_id, tenant_id, top_k, version)
+        
+        return {**result, 'cached': False, 'timings': rag_result['timings']}
+    
+    async def answer_stream(
+        self,
+        query: str,
+        provider: StreamingProvider,
+        top_k: int = 5,
+        dataset_id: Optional[str] = None,
+        use_reranking: bool = True,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of answer()
+        
+        Yields (event, data) pairs: 'sources' once retrieval is done, a
+        'delta' per chunk of answer text, then 'done' with the full answer,
+        token usage and latency (seconds): time_to_first_token (first
+        delta), provider_response_latency (LLM stream) and total_latency.
+        When nothing relevant is retrieved, 'done' carries answer None.
+        """
+        started = time.perf_counter()
+        latency: Dict[str, Optional[float]] = {'time_to_first_token': None, 'provider_response_latency': None}
+        
+        def done(answer: Optional[str], cached: bool, usage: Dict[str, Any], timings: Dict[str, Any]):
+            latency['total_latency'] = time.perf_counter() - started
+            return 'done', {'answer': answer, 'cached': cached, 'usage': usage, 'latency': latency, 'timings': timings}
+        
+        cache = None if dataset_ids else self.answer_cache
+        if cache is not None:
+            with span('answer_cache') as lookup:
+                query_embedding = await self.embedding_service.generate_embedding(query)
+                version = cache.version(dataset_id)
+                cached = cache.lookup(query_embedding, dataset_id, tenant_id, top_k)
+                lookup.set(hit=cached is not None)
+            if cached is not None:
+                yield 'sources', {'sources': cached['sources'], 'cached': True}
+                latency['time_to_first_token'] = time.perf_counter() - started
+                yield 'delta', {'text': cached['answer']}
+                yield done(cached['answer'], True, {}, {})
+                return
+        
+        rag_result = await self.process_query(
+            query=query,
+            top_k=top_k,
+            dataset_id=dataset_id,
+            use_reranking=use_reranking,
+            tenant_id=tenant_id,
+            dataset_ids=dataset_ids
+        )
+        yield 'sources', {'sources': rag_result['sources'], 'cached': False}
+        
+        if not rag_result['contexts']:
+            yield done(None, False, {}, rag_result['timings'])
+            return
+        
+        prompt = self.build_rag_prompt(query=query, contexts=rag_result['contexts'])
+        provider_started = time.perf_counter()
+        parts = []
+        async for delta in provider.stream(prompt):
+            if not parts:
+                latency['time_to_first_token'] = time.perf_counter() - started
+            parts.append(delta)
+            yield 'delta', {'text': delta}
+        provider_finished = time.perf_counter()
+        latency['provider_response_latency'] = provider_finished - provider_started
+        record_span(
+            'generate', provider_started, provider_finished,
+            provider=provider.name, deltas=len(parts), time_to_first_token=latency['time_to_first_token']
+        )
+        
+        answer = ''.join(parts)
+        if cache is not None:
+            cache.store(query_embedding, {
+                'answer': answer,
+                'sources': rag_result['sources'],
+                'contexts': rag_result['contexts'],
+                'total_retrieved': rag_result['total_retrieved'],
+                'query': query,
+                'context_packing': rag_result['context_packing']
+            }, dataset_id, tenant_id, top_k, version)
+        
+        yield done(answer, False, dict(provider.usage), rag_result['timings'])
     
     async def _rerank_documents(
         self,
@@ -92,15 +315,18 @@ class RAGPipeline:
         top_k: int
     ) -> List[Dict[str, Any]]:
         """
-        Rerank documents using cross-encoder or similarity
+        Rerank documents with the CPU reranker (cosine + BM25, optional ONNX)
         
-        For now, uses simple similarity reranking
-        TODO: Add cross-encoder model for better reranking
+        Records 'rerank_ms' and the per-scorer report in self.timings.
         """
-        # Simple reranking: already sorted by score from vector search
-        # In production, use cross-encoder like ms-marco-MiniLM
-        
-        return documents[:top_k]
+        with span('rerank', candidates=len(documents)) as rerank_span:
+            ranked, report = self.reranker.rerank(query, documents, top_k)
+            rerank_span.set(skipped=report['skipped'])
+        self.timings['rerank_ms'] = report['total_ms']
+        self.timings['rerank'] = report
+        if report['skipped']:
+            logger.info(f"Rerank budget spent, skipped: {report['skipped']}")
+        return ranked
     
     def build_rag_prompt(
         self,
@@ -0,0 +1,377 @@
+"""
+CPU Reranker - batched feature scorers combined under a latency budget
+
+Scorers run cheapest first over a capped candidate list. Each scorer's
+scores are min-max normalized and combined with its weight; scorers that
+would start after the request's latency budget is spent are skipped.
+(query, segment) scores of costly scorers are cached per scorer, and every
+scorer records its latency so it can be weighed against the recall it
+adds (evaluate). When settings.rerank_onnx_model_path points at a model
+file, an ONNX cross-encoder joins the default scorers.
+"""
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+import logging
+import math
+import time
+
+import numpy as np
+
+from core.config import settings
+from utilities.text_analyzer import analyze
+
+try:
+    import onnxruntime
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+logger = logging.getLogger(__name__)
+
+Candidate = Dict[str, Any]
+
+
+class RerankScorer(ABC):
+    """A batched relevance feature: one score per candidate"""
+
+    name: str = 'scorer'
+    # Scores depend on the whole candidate set (e.g. IDF), so a partial
+    # cache hit recomputes every candidate
+    pool_dependent: bool = False
+    # Scores are a pure function of (query, segment); cheap or
+    # request-dependent scorers are never cached
+    cacheable: bool = True
+
+    @abstractmethod
+    def score(self, query: str, candidates: Sequence[Candidate]) -> np.ndarray:
+        """Relevance of each candidate to the query (higher is better)"""
+        pass
+
+
+class BM25Scorer(RerankScorer):
+    """
+    BM25 term overlap, with IDF taken over the candidate set
+
+    Candidates carrying 'tokens' (terms analyzed at ingest) are not
+    re-analyzed; only the query is.
+    """
+
+    name = 'bm25'
+    pool_dependent = True
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, candidates: Sequence[Candidate]) -> np.ndarray:
+        terms = set(analyze(query))
+        docs = [
+            Counter(candidate['tokens'] if candidate.get('tokens') is not None else analyze(candidate['text']))
+            for candidate in candidates
+        ]
+        if not terms or not docs:
+            return np.zeros(len(candidates))
+
+        lengths = np.array([sum(doc.values()) for doc in docs], dtype=float)
+        avg_length = lengths.mean() or 1.0
+        scores = np.zeros(len(docs))
+        for term in terms:
+            tf = np.array([doc.get(term, 0) for doc in docs], dtype=float)
+            df = int((tf > 0).sum())
+            if not df:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            scores += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * lengths / avg_length))
+        return scores
+
+
+class CosineScorer(RerankScorer):
+    """
+    Query-passage cosine from the vector search
+
+    Candidates carry the cosine of their stored (already normalized)
+    vector in 'score', so no passage is re-embedded. The score comes with
+    the request (and may be normalized per dataset), so it is not cached.
+    """
+
+    name = 'cosine'
+    cacheable = False
+
+    def score(self, query: str, candidates: Sequence[Candidate]) -> np.ndarray:
+        return np.array([float(candidate.get('score', 0.0)) for candidate in candidates])
+
+
+class OnnxScorer(RerankScorer):
+    """
+    Cross-encoder style scorer backed by an ONNX model
+
+    Args:
+        model_path: .onnx file
+        encode: Builds the model inputs for (query, passages)
+        output_index: Model output holding one logit per passage
+    """
+
+    name = 'onnx'
+
+    def __init__(
+        self,
+        model_path: str,
+        encode: Callable[[str, List[str]], Dict[str, np.ndarray]],
+        output_index: int = 0
+    ):
+        if not HAS_ONNXRUNTIME:
+            raise ImportError("onnxruntime is required for OnnxScorer")
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.encode = encode
+        self.output_index = output_index
+
+    def score(self, query: str, candidates: Sequence[Candidate]) -> np.ndarray:
+        inputs = self.encode(query, [candidate['text'] for candidate in candidates])
+        # Tokenizers may emit inputs (e.g. token_type_ids) the model does not take
+        inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+        outputs = self.session.run(None, inputs)
+        return np.asarray(outputs[self.output_index], dtype=float).reshape(len(candidates), -1)[:, 0]
+
+
+def tokenizer_encoder(
+    tokenizer_path: str,
+    max_length: int = 512
+) -> Optional[Callable[[str, List[str]], Dict[str, np.ndarray]]]:
+    """OnnxScorer inputs from a Hugging Face tokenizer (None without transformers)"""
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        logger.warning("transformers not installed - ONNX reranker disabled")
+        return None
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+
+    def encode(query: str, passages: List[str]) -> Dict[str, np.ndarray]:
+        return dict(tokenizer(
+            [query] * len(passages), passages,
+            padding=True, truncation=True, max_length=max_length, return_tensors='np'
+        ))
+
+    return encode
+
+
+def create_onnx_scorer(
+    model_path: Optional[str],
+    encode: Optional[Callable[[str, List[str]], Dict[str, np.ndarray]]] = None,
+    tokenizer_path: Optional[str] = None
+) -> Optional[OnnxScorer]:
+    """
+    ONNX scorer when the model file and onnxruntime are available, else None
+
+    Without encode, inputs come from the tokenizer at tokenizer_path
+    (default: the model file's directory).
+    """
+    if not model_path or not Path(model_path).is_file():
+        return None
+    if not HAS_ONNXRUNTIME:
+        logger.warning("onnxruntime not installed - ONNX reranker disabled")
+        return None
+    if encode is None:
+        encode = tokenizer_encoder(tokenizer_path or str(Path(model_path).parent))
+        if encode is None:
+            return None
+    return OnnxScorer(model_path, encode)
+
+
+class _ScoreCache:
+    """Bounded LRU of (scorer, query, segment) -> score"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._scores: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[float]:
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def set(self, key: Tuple[str, str, str], score: float):
+        if self.max_size <= 0:
+            return
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.max_size:
+            self._scores.popitem(last=False)
+
+
+class CPUReranker:
+    """Combine weighted scorers over capped candidates within a latency budget"""
+
+    def __init__(
+        self,
+        scorers: Optional[List[Tuple[RerankScorer, float]]] = None,
+        max_candidates: int = 50,
+        latency_budget_ms: Optional[float] = 50.0,
+        cache_size: int = 10000
+    ):
+        """
+        Args:
+            scorers: (scorer, weight) pairs, cheapest first
+                (defaults to cosine 0.7 + BM25 0.3)
+            max_candidates: Candidates beyond this many (in retrieval order) are not rescored
+            latency_budget_ms: Scorers that would start after this budget are skipped
+            cache_size: Cached (scorer, query, segment) scores
+        """
+        self.scorers = scorers if scorers is not None else [(CosineScorer(), 0.7), (BM25Scorer(), 0.3)]
+        self.max_candidates = max_candidates
+        self.latency_budget_ms = latency_budget_ms
+        self.cache = _ScoreCache(cache_size)
+        self._latency: Dict[str, List[float]] = {scorer.name: [0, 0.0] for scorer, _ in self.scorers}
+
+    def _scores(self, scorer: RerankScorer, query: str, candidates: Sequence[Candidate]) -> np.ndarray:
+        """Scorer output for the candidates, computing only uncached pairs"""
+        if not scorer.cacheable:
+            return np.asarray(scorer.score(query, candidates), dtype=float)
+        # The query's own text (case and spacing aside): queries that merely
+        # analyze to the same terms can still score differently
+        query_key = ' '.join(query.lower().split())
+        keys = [
+            (scorer.name, query_key, str(candidate.get('segment_id', candidate.get('id', index))))
+            for index, candidate in enumerate(candidates)
+        ]
+        scores = np.array([self.cache.get(key) for key in keys], dtype=float)
+        missing = np.flatnonzero(np.isnan(scores))
+        if missing.size and scorer.pool_dependent:
+            missing = np.arange(len(candidates))
+        if missing.size:
+            computed = scorer.score(query, [candidates[i] for i in missing])
+            scores[missing] = computed
+            for i, score in zip(missing, computed):
+                self.cache.set(keys[i], float(score))
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[Candidate],
+        top_k: int,
+        scorers: Optional[List[Tuple[RerankScorer, float]]] = None
+    ) -> Tuple[List[Candidate], Dict[str, Any]]:
+        """
+        Rerank candidates
+
+        Returns:
+            (top_k candidates with 'rerank_score', report with per-scorer
+            latency and skipped scorers)
+        """
+        started = time.perf_counter()
+        pool = candidates[:self.max_candidates]
+        report: Dict[str, Any] = {'candidates': len(pool), 'scorers': {}, 'skipped': []}
+        if not pool:
+            report['total_ms'] = 0.0
+            return [], report
+
+        combined = np.zeros(len(pool))
+        for scorer, weight in (scorers if scorers is not None else self.scorers):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if self.latency_budget_ms is not None and elapsed_ms >= self.latency_budget_ms:
+                report['skipped'].append(scorer.name)
+                continue
+
+            scorer_started = time.perf_counter()
+            scores = self._scores(scorer, query, pool)
+            scorer_ms = (time.perf_counter() - scorer_started) * 1000
+            report['scorers'][scorer.name] = scorer_ms
+            latency = self._latency.setdefault(scorer.name, [0, 0.0])
+            latency[0] += 1
+            latency[1] += scorer_ms
+
+            spread = scores.max() - scores.min()
+            if spread > 0:
+                combined += weight * (scores - scores.min()) / spread
+
+        order = np.argsort(-combined, kind='stable')[:top_k]
+        ranked = [{**pool[i], 'rerank_score': float(combined[i])} for i in order]
+        report['total_ms'] = (time.perf_counter() - started) * 1000
+        return ranked, report
+
+    def evaluate(
+        self,
+        samples: List[Tuple[str, List[Candidate], Set[str]]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Recall@top_k and latency as scorers are added one at a time
+
+        Args:
+            samples: (query, candidates, relevant segment IDs)
+
+        Returns:
+            One row per stage: retrieval order, then each cumulative scorer set
+        """
+        def recall(ranked: List[Candidate], relevant: Set[str]) -> float:
+            found = {candidate.get('segment_id') for candidate in ranked}
+            return len(found & relevant) / len(relevant) if relevant else 1.0
+
+        rows = [{
+            'stage': 'retrieval',
+            'recall': float(np.mean([recall(c[:top_k], r) for _, c, r in samples])),
+            'mean_ms': 0.0
+        }]
+        # Unbudgeted and uncached, so each stage pays its full cost
+        budget, self.latency_budget_ms = self.latency_budget_ms, None
+        cache = self.cache
+        try:
+            for n in range(1, len(self.scorers) + 1):
+                active = self.scorers[:n]
+                recalls, latencies = [], []
+                for query, candidates, relevant in samples:
+                    self.cache = _ScoreCache(cache.max_size)
+                    ranked, report = self.rerank(query, candidates, top_k, scorers=active)
+                    recalls.append(recall(ranked, relevant))
+                    latencies.append(report['total_ms'])
+                rows.append({
+                    'stage': '+'.join(scorer.name for scorer, _ in active),
+                    'recall': float(np.mean(recalls)),
+                    'mean_ms': float(np.mean(latencies))
+                })
+        finally:
+            self.latency_budget_ms = budget
+            self.cache = cache
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            'max_candidates': self.max_candidates,
+            'latency_budget_ms': self.latency_budget_ms,
+            'cache_hit_rate': self.cache.hits / lookups if lookups else 0.0,
+            'scorers': {
+                name: {'calls': calls, 'mean_ms': total / calls if calls else 0.0}
+                for name, (calls, total) in self._latency.items()
+            }
+        }
+
+
+def create_default_reranker() -> CPUReranker:
+    """Reranker from settings: cosine + BM25, then the ONNX model when one is deployed"""
+    scorers: List[Tuple[RerankScorer, float]] = [(CosineScorer(), 0.7), (BM25Scorer(), 0.3)]
+    onnx_scorer = create_onnx_scorer(
+        settings.rerank_onnx_model_path, tokenizer_path=settings.rerank_onnx_tokenizer_path
+    )
+    if onnx_scorer is not None:
+        scorers.append((onnx_scorer, settings.rerank_onnx_weight))
+        logger.info(f"ONNX reranker loaded from {settings.rerank_onnx_model_path}")
+    return CPUReranker(
+        scorers,
+        max_candidates=settings.rerank_max_candidates,
+        latency_budget_ms=settings.rerank_latency_budget_ms,
+        cache_size=settings.rerank_cache_size
+    )
+
+
+# Global instance (shared score cache and latency stats)
+cpu_reranker = create_default_reranker()
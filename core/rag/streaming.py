@@ -0,0 +1,140 @@
+"""
+Streaming LLM Providers - token deltas for Server-Sent Events
+
+A provider yields the answer as text deltas and reports token usage once
+the stream is exhausted. FakeStreamingProvider streams a local response
+(tests and deployments without LLM credentials).
+"""
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+import asyncio
+import json
+import re
+
+try:
+    from openai import AsyncAzureOpenAI
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+from core.config import settings
+from core.rag.context_packer import estimate_tokens
+
+_DELTA = re.compile(r"\S+\s*|\s+")
+
+
+def format_sse(event: str, data: Any) -> str:
+    """One Server-Sent Event frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class StreamingProvider(ABC):
+    """LLM that streams its answer as text deltas"""
+
+    name: str = 'provider'
+    model: str = ''
+
+    def __init__(self):
+        # Usage of the last completed stream
+        self.usage: Dict[str, int] = {}
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield answer text deltas; sets self.usage when done"""
+        pass
+
+
+class FakeStreamingProvider(StreamingProvider):
+    """
+    Local provider streaming a fixed (or prompt-derived) response word by word
+
+    Args:
+        response: Response text, or a callable building it from the prompt
+        first_token_delay: Seconds before the first delta
+        delay: Seconds between deltas
+    """
+
+    name = 'fake'
+    model = 'fake-stream'
+
+    def __init__(
+        self,
+        response: Union[str, Callable[[str], str]] = "This is a streamed answer.",
+        first_token_delay: float = 0.0,
+        delay: float = 0.0
+    ):
+        super().__init__()
+        self.response = response
+        self.first_token_delay = first_token_delay
+        self.delay = delay
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.usage = {}
+        text = self.response(prompt) if callable(self.response) else self.response
+        await asyncio.sleep(self.first_token_delay)
+        for i, delta in enumerate(_DELTA.findall(text)):
+            if i and self.delay:
+                await asyncio.sleep(self.delay)
+            yield delta
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(text)
+        self.usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+
+
+class AzureOpenAIStreamingProvider(StreamingProvider):
+    """Azure OpenAI chat completions with stream=True"""
+
+    name = 'azure_openai'
+
+    def __init__(self, temperature: Optional[float] = None, max_tokens: Optional[int] = None):
+        super().__init__()
+        if not HAS_OPENAI:
+            raise ImportError("openai is required for AzureOpenAIStreamingProvider")
+        self.client = AsyncAzureOpenAI(
+            api_key=settings.azure_openai_api_key,
+            api_version=settings.azure_openai_api_version,
+            azure_endpoint=settings.azure_openai_endpoint
+        )
+        self.model = settings.azure_openai_deployment
+        self.temperature = settings.openai_temperature if temperature is None else temperature
+        self.max_tokens = settings.openai_max_tokens if max_tokens is None else max_tokens
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.usage = {}
+        completion_text = []
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True
+        )
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                completion_text.append(delta)
+                yield delta
+
+        # Older API versions send no usage with streamed completions
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(''.join(completion_text))
+        self.usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'estimated': True
+        }
+
+
+def create_streaming_provider(fallback: Union[str, Callable[[str], str]]) -> StreamingProvider:
+    """Azure OpenAI when configured, else a local provider streaming the fallback response"""
+    if HAS_OPENAI and settings.azure_openai_api_key and settings.azure_openai_endpoint:
+        return AzureOpenAIStreamingProvider()
+    return FakeStreamingProvider(fallback)
@@ -0,0 +1,181 @@
+"""
+Embedding Cache - bounded LRU/TTL cache with singleflight lookups
+
+Keys are (normalized text, model, dimension). Entries expire after a TTL
+and the least recently used entry is evicted when the cache is full.
+Concurrent lookups of the same key share one in-flight computation.
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import asyncio
+import re
+import time
+import unicodedata
+
+Embedding = List[float]
+CacheKey = Tuple[str, str, int]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different queries share a key"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of embeddings with a TTL and hit/miss/eviction counters"""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_seconds: Optional[float] = 3600,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_size: Maximum number of cached embeddings
+            ttl_seconds: Entry lifetime (None = no expiry)
+            clock: Time source (monotonic seconds)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Embedding]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared = 0
+
+    @staticmethod
+    def make_key(text: str, model: Optional[str], dimension: int) -> CacheKey:
+        return (normalize_text(text), model or "", dimension)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Embedding]:
+        """Cached embedding (refreshing its LRU position), or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, embedding = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return embedding
+
+    def set(self, key: Hashable, embedding: Embedding):
+        """Store an embedding, evicting the least recently used entries when full"""
+        if self.max_size <= 0:
+            return
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+        self._entries[key] = (expires_at, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Embedding]]
+    ) -> Embedding:
+        """Cached embedding, or the result of compute() shared by concurrent callers"""
+        return (await self.get_or_compute_many([key], lambda missing: _single(compute)))[0]
+
+    async def get_or_compute_many(
+        self,
+        keys: Sequence[Hashable],
+        compute: Callable[[List[int]], Awaitable[List[Embedding]]]
+    ) -> List[Embedding]:
+        """
+        Embeddings for several keys with one call for the misses
+
+        Args:
+            keys: Cache keys, one per input
+            compute: Called once with the positions (into keys) of the
+                missing, not-in-flight keys; returns their embeddings in order
+
+        Returns:
+            One embedding per key
+        """
+        results: List[Optional[Embedding]] = [None] * len(keys)
+        waiting: List[Tuple[int, asyncio.Future]] = []
+        owned: Dict[Hashable, List[int]] = {}
+
+        for i, key in enumerate(keys):
+            if key in owned:
+                owned[key].append(i)
+                continue
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.shared += 1
+                waiting.append((i, inflight))
+                continue
+            embedding = self.get(key)
+            if embedding is not None:
+                results[i] = embedding
+            else:
+                owned[key] = [i]
+
+        if owned:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in owned}
+            self._inflight.update(futures)
+            try:
+                computed = await compute([positions[0] for positions in owned.values()])
+            except BaseException as e:
+                for future in futures.values():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                        continue
+                    future.set_exception(e)
+                    # Only waiters observe the error; the caller gets it raised
+                    future.exception()
+                raise
+            finally:
+                for key in futures:
+                    self._inflight.pop(key, None)
+
+            for (key, positions), embedding in zip(owned.items(), computed):
+                self.set(key, embedding)
+                futures[key].set_result(embedding)
+                for i in positions:
+                    results[i] = embedding
+
+        for i, future in waiting:
+            results[i] = await asyncio.shield(future)
+
+        return results
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "shared_inflight": self.shared
+        }
+
+
+async def _single(compute: Callable[[], Awaitable[Embedding]]) -> List[Embedding]:
+    return [await compute()]
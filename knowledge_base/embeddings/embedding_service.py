@@ -1,12 +1,14 @@
 """
 Embeddings Service using Azure OpenAI
 """
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Union
 import asyncio
 import logging
 from openai import AzureOpenAI
 
 from core.config import settings
+from utilities.tracing import span
+from .embedding_cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +16,18 @@ logger = logging.getLogger(__name__)
 class EmbeddingService:
     """Generate embeddings using Azure OpenAI"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
+        """
+        Args:
+            cache: Embedding cache (defaults to settings.embedding_cache_size /
+                embedding_cache_ttl_seconds)
+        """
         self.client = None
         self.model = settings.azure_openai.embedding_deployment
+        self.cache = cache or EmbeddingCache(
+            max_size=settings.embedding_cache_size,
+            ttl_seconds=settings.embedding_cache_ttl_seconds
+        )
         self._initialize_client()
     
     def _initialize_client(self):
@@ -46,14 +57,20 @@ class EmbeddingService:
     async def generate_embeddings(
         self,
         texts: List[str],
-        batch_size: int = 16
+        batch_size: int = 16,
+        use_cache: bool = True
     ) -> List[List[float]]:
         """
         Generate embeddings for multiple texts
         
+        Cached texts are served from the LRU/TTL cache; the misses are
+        requested in batches, and identical concurrent requests share one call.
+        
         Args:
             texts: List of texts
             batch_size: Batch size for API calls
+            use_cache: Read and fill the query cache; document indexing
+                passes False so bulk text does not evict hot query embeddings
             
         Returns:
             List of embedding vectors
@@ -61,6 +78,26 @@ class EmbeddingService:
         if not texts:
             return []
         
+        dimension = self.get_embedding_dimension()
+        keys = [EmbeddingCache.make_key(text, self.model, dimension) for text in texts]
+        
+        async def compute(missing: List[int]) -> List[List[float]]:
+            stage.set(computed=len(missing))
+            return await self._request_embeddings([texts[i] for i in missing], batch_size)
+        
+        try:
+            with span('embedding', texts=len(texts), computed=0) as stage:
+                if not use_cache:
+                    return await compute(list(range(len(texts))))
+                return await self.cache.get_or_compute_many(keys, compute)
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            # Fallback to mock (not cached)
+            import numpy as np
+            return [np.random.randn(dimension).tolist() for _ in texts]
+    
+    async def _request_embeddings(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        """Call Azure OpenAI for texts that are not cached"""
         # Use mock embeddings if client not initialized
         if self.client is None:
             logger.warning("Using mock embeddings (1536 dimensions)")
@@ -70,33 +107,30 @@ class EmbeddingService:
                 for _ in texts
             ]
         
-        try:
-            all_embeddings = []
+        all_embeddings = []
+        
+        # Process in batches
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
             
-            # Process in batches
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                
-                # Call Azure OpenAI
-                response = await asyncio.to_thread(
-                    self.client.embeddings.create,
-                    input=batch,
-                    model=self.model
-                )
-                
-                # Extract embeddings
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
-                
-                logger.info(f"Generated {len(batch_embeddings)} embeddings (batch {i//batch_size + 1})")
+            # Call Azure OpenAI
+            response = await asyncio.to_thread(
+                self.client.embeddings.create,
+                input=batch,
+                model=self.model
+            )
             
-            return all_embeddings
+            # Extract embeddings
+            batch_embeddings = [item.embedding for item in response.data]
+            all_embeddings.extend(batch_embeddings)
             
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {e}")
-            # Fallback to mock
-            import numpy as np
-            return [np.random.randn(1536).tolist() for _ in texts]
+            logger.info(f"Generated {len(batch_embeddings)} embeddings (batch {i//batch_size + 1})")
+        
+        return all_embeddings
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Embedding cache hit/miss/eviction counters"""
+        return self.cache.stats()
     
     def get_embedding_dimension(self) -> int:
         """Get embedding dimension"""
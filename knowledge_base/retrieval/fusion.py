@@ -0,0 +1,185 @@
+"""
+Rank Fusion - merge the ranked hit lists of several retrieval legs
+
+Each leg (e.g. vector and keyword search) returns hits best first. A
+strategy turns every hit into a per-leg contribution and the fused score
+of a document is the sum of its contributions across legs:
+
+- 'rrf': reciprocal rank fusion, weight / (rrf_k + rank)
+- 'minmax' / 'zscore': weight * score normalized within the leg
+- 'weighted': the hit's weighted_score when the leg set one (scaled and
+  weighted by the leg), otherwise weight * raw score
+
+fuse() walks the legs rank by rank and stops once no document further
+down - including hits a leg was not asked for - can still enter the
+top-k (a threshold-algorithm cutoff). When the top-k is not settled at
+the fetched depth, the caller can fetch deeper.
+
+'minmax' and 'zscore' normalize over the hits that were fetched, so a
+deeper fetch rescales every score and no bound holds for documents below
+a leg's last hit: the cutoff only applies to them once every leg is
+exhausted, and callers fetch the deepest candidate list up front.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+import heapq
+
+from core.config import settings
+from knowledge_base.vector_store.vector_math import normalize_scores
+
+FUSION_STRATEGIES = ('rrf', 'minmax', 'zscore', 'weighted')
+NORMALIZED_STRATEGIES = ('minmax', 'zscore')
+
+
+@dataclass
+class FusionConfig:
+    """Fusion settings of one index"""
+
+    strategy: str = 'minmax'
+    rrf_k: int = 60
+    candidate_multiplier: int = 1  # hits fetched per leg = top_k * multiplier
+    max_candidate_multiplier: int = 4  # deepest fetch while the top-k is unsettled
+    early_cutoff: bool = True
+
+    def __post_init__(self):
+        if self.strategy not in FUSION_STRATEGIES:
+            raise ValueError(f"Unknown fusion strategy '{self.strategy}' (expected one of {FUSION_STRATEGIES})")
+        if self.rrf_k < 0:
+            raise ValueError("rrf_k must be non-negative")
+        if not 1 <= self.candidate_multiplier <= self.max_candidate_multiplier:
+            raise ValueError("Expected 1 <= candidate_multiplier <= max_candidate_multiplier")
+
+    @property
+    def fetch_multiplier(self) -> int:
+        """Multiplier of the first fetch (the deepest one for normalized strategies)"""
+        if self.strategy in NORMALIZED_STRATEGIES:
+            return self.max_candidate_multiplier
+        return self.candidate_multiplier
+
+    @classmethod
+    def from_settings(cls) -> "FusionConfig":
+        return cls(
+            strategy=settings.hybrid_fusion_strategy,
+            rrf_k=settings.hybrid_rrf_k,
+            candidate_multiplier=settings.hybrid_candidate_multiplier,
+            max_candidate_multiplier=settings.hybrid_max_candidate_multiplier
+        )
+
+
+@dataclass
+class FusionLeg:
+    """Hits of one retrieval leg, best first"""
+
+    name: str
+    results: List[Dict[str, Any]]
+    weight: float = 1.0
+    exhausted: bool = True  # the leg has no hits beyond these
+
+
+def _contributions(leg: FusionLeg, config: FusionConfig) -> List[float]:
+    """Contribution of each hit of a leg, non-increasing with rank"""
+    if config.strategy == 'rrf':
+        return [leg.weight / (config.rrf_k + rank) for rank in range(1, len(leg.results) + 1)]
+    if config.strategy == 'weighted':
+        return [result.get('weighted_score', leg.weight * result['score']) for result in leg.results]
+
+    scores = [result['score'] for result in normalize_scores(leg.results, config.strategy)]
+    if config.strategy == 'minmax':
+        # A leg with one distinct score keeps raw scores; keep them on the [0, 1] scale
+        scores = [min(max(score, 0.0), 1.0) for score in scores]
+    return [leg.weight * score for score in scores]
+
+
+def fuse(
+    legs: List[FusionLeg],
+    top_k: int,
+    config: FusionConfig
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Fuse ranked legs into one top-k ranking
+
+    A document missing from a leg gets that leg's floor (0, or the lowest
+    z-score). If the leg is not exhausted the document may still sit below
+    its last hit, so its score is bounded above by the last hit's
+    contribution; the top-k is settled when its k-th score is at least the
+    bound of every other document, seen or not. Normalized strategies have
+    no such bound, so with a leg that is not exhausted they walk every rank
+    and report the top-k as unsettled.
+
+    Returns:
+        (results, report) - results carry 'combined_score' and
+        'search_types'; report has strategy, depth (ranks walked),
+        candidates (documents scored) and complete (top-k settled)
+    """
+    contributions = [_contributions(leg, config) for leg in legs]
+    floors = [min([0.0, *leg_contributions]) for leg_contributions in contributions]
+    beyond = [
+        floor if leg.exhausted or not leg_contributions else leg_contributions[-1]
+        for leg, leg_contributions, floor in zip(legs, contributions, floors)
+    ]
+    positions = [{result['id']: rank for rank, result in enumerate(leg.results)} for leg in legs]
+    max_depth = max((len(leg.results) for leg in legs), default=0)
+
+    bounded = config.strategy not in NORMALIZED_STRATEGIES or all(leg.exhausted for leg in legs)
+    scores: Dict[str, float] = {}
+    upper: Dict[str, float] = {}
+
+    def settled(depth: int) -> bool:
+        if not bounded:
+            return False
+        if all(leg.exhausted and depth >= len(leg.results) for leg in legs):
+            unseen = float('-inf')
+        else:
+            unseen = sum(
+                leg_contributions[depth] if depth < len(leg_contributions) else bound
+                for leg_contributions, bound in zip(contributions, beyond)
+            )
+        if len(scores) < top_k:
+            return unseen == float('-inf')
+        top = heapq.nlargest(top_k, scores, key=scores.get)
+        kth = scores[top[-1]]
+        chosen = set(top)
+        rest = max((bound for doc_id, bound in upper.items() if doc_id not in chosen), default=float('-inf'))
+        return kth >= max(unseen, rest)
+
+    depth = 0
+    complete = settled(0) if max_depth == 0 else False
+    while depth < max_depth:
+        for leg in legs:
+            if depth >= len(leg.results):
+                continue
+            doc_id = leg.results[depth]['id']
+            if doc_id in scores:
+                continue
+            score = slack = 0.0
+            for i, position in enumerate(positions):
+                rank = position.get(doc_id)
+                if rank is None:
+                    score += floors[i]
+                    slack += beyond[i] - floors[i]
+                else:
+                    score += contributions[i][rank]
+            scores[doc_id] = score
+            upper[doc_id] = score + slack
+        depth += 1
+        if config.early_cutoff or depth == max_depth:
+            complete = settled(depth)
+            if complete:
+                break
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    results = []
+    for doc_id in ranked:
+        hits = [(leg, leg.results[position[doc_id]]) for leg, position in zip(legs, positions) if doc_id in position]
+        result = hits[0][1].copy()
+        result['combined_score'] = scores[doc_id]
+        result['search_types'] = [leg.name for leg, _ in hits]
+        results.append(result)
+
+    report = {
+        'strategy': config.strategy,
+        'depth': depth,
+        'candidates': len(scores),
+        'complete': complete
+    }
+    return results, report
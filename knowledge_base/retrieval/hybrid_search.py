@@ -4,12 +4,30 @@
 يجمع بين Vector Search و Keyword Search
 """
 
-from typing import List, Dict, Optional
-import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import List, Dict, Optional, Tuple, Union
+import asyncio
 
+from core.config import settings
+from knowledge_base.retrieval.fusion import FusionConfig, FusionLeg, fuse
 from knowledge_base.vector_store.embeddings import EmbeddingsGenerator
 from knowledge_base.vector_store.memory_store import MemoryVectorStore
 from utilities.logger import logger
+from utilities.text_analyzer import analyze
+
+_scoring_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_scoring_executor() -> ThreadPoolExecutor:
+    """thread pool مشترك ومحدود لحساب درجات الكلمات المفتاحية خارج الـ event loop"""
+    global _scoring_executor
+    if _scoring_executor is None:
+        _scoring_executor = ThreadPoolExecutor(
+            max_workers=settings.hybrid_search_workers,
+            thread_name_prefix="hybrid-scoring"
+        )
+    return _scoring_executor
 
 
 class HybridSearchEngine:
@@ -20,7 +38,11 @@ class HybridSearchEngine:
         embeddings_generator: EmbeddingsGenerator,
         vector_store: MemoryVectorStore,
         vector_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        keyword_weight: float = 0.3,
+        fusion: Optional[FusionConfig] = None,
+        vector_timeout: Optional[float] = None,
+        keyword_timeout: Optional[float] = None,
+        executor: Optional[Executor] = None
     ):
         """
         تهيئة محرك البحث
@@ -30,17 +52,46 @@ class HybridSearchEngine:
             vector_store: مخزن vectors
             vector_weight: وزن البحث بالـ vectors
             keyword_weight: وزن البحث بالكلمات المفتاحية
+            fusion: إعدادات دمج النتائج الافتراضية (من settings إن لم تُحدد)
+            vector_timeout: مهلة مسار الـ vectors بالثواني (embedding + بحث)
+            keyword_timeout: مهلة مسار الكلمات المفتاحية بالثواني
+            executor: thread pool لحساب درجات الكلمات المفتاحية
+                (الافتراضي pool مشترك بحجم hybrid_search_workers)
         """
         self.embeddings = embeddings_generator
         self.vector_store = vector_store
         self.vector_weight = vector_weight
         self.keyword_weight = keyword_weight
+        self.fusion = fusion or FusionConfig.from_settings()
+        self.vector_timeout = (
+            settings.hybrid_vector_timeout_ms / 1000 if vector_timeout is None else vector_timeout
+        )
+        self.keyword_timeout = (
+            settings.hybrid_keyword_timeout_ms / 1000 if keyword_timeout is None else keyword_timeout
+        )
+        self.executor = executor or get_scoring_executor()
+        self.index_fusion: Dict[str, FusionConfig] = {}
         
         logger.info(
             f"Initialized HybridSearchEngine "
-            f"(vector={vector_weight}, keyword={keyword_weight})"
+            f"(vector={vector_weight}, keyword={keyword_weight}, fusion={self.fusion.strategy})"
         )
     
+    def configure_index(self, index_name: str, **options) -> FusionConfig:
+        """
+        ضبط الدمج لفهرس محدد
+        
+        الخيارات غير المذكورة تؤخذ من الإعدادات الافتراضية للمحرك
+        (strategy, rrf_k, candidate_multiplier, max_candidate_multiplier, early_cutoff)
+        """
+        config = replace(self.fusion, **options)
+        self.index_fusion[index_name] = config
+        return config
+    
+    def fusion_config(self, index_name: str) -> FusionConfig:
+        """إعدادات الدمج الفعلية لفهرس"""
+        return self.index_fusion.get(index_name, self.fusion)
+    
     async def search(
         self,
         query: str,
@@ -48,8 +99,9 @@ class HybridSearchEngine:
         index_name: str = "general",
         filters: Optional[Dict] = None,
         use_vector: bool = True,
-        use_keyword: bool = True
-    ) -> List[Dict]:
+        use_keyword: bool = True,
+        return_report: bool = False
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
         """
         البحث الهجين
         
@@ -60,62 +112,191 @@ class HybridSearchEngine:
             filters: فلاتر
             use_vector: استخدام vector search
             use_keyword: استخدام keyword search
+            return_report: إرجاع تقرير الدمج مع النتائج
+                (strategy, depth, candidates, complete, fetched, degraded)
             
         Returns:
-            List[Dict]: النتائج المرتبة
+            List[Dict]: النتائج المرتبة، أو (النتائج، التقرير) مع return_report
         """
         logger.info(f"Hybrid search: '{query[:50]}...'")
         
-        results = []
+        final_results, report = await self._fused_search(
+            query, top_k, index_name, filters, use_vector, use_keyword
+        )
         
-        # 1. Vector Search
-        if use_vector:
-            vector_results = await self._vector_search(
-                query, top_k * 2, index_name, filters
-            )
-            results.extend(vector_results)
+        logger.info(f"Hybrid search returned {len(final_results)} results")
+        if return_report:
+            return final_results, report
+        return final_results
+    
+    async def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        index_name: str = "general",
+        filters: Optional[Dict] = None,
+        use_vector: bool = True,
+        use_keyword: bool = True,
+        return_report: bool = False
+    ) -> Union[List[List[Dict]], Tuple[List[List[Dict]], List[Dict]]]:
+        """
+        البحث الهجين لمجموعة استعلامات
         
-        # 2. Keyword Search
-        if use_keyword:
-            keyword_results = await self._keyword_search(
-                query, top_k * 2, index_name, filters
-            )
-            results.extend(keyword_results)
+        الـ embeddings تُولَّد دفعة واحدة والبحث بالـ vectors يتم بمسح واحد
+        للفهرس لكل الاستعلامات
         
-        # 3. دمج وترتيب النتائج
-        merged_results = self._merge_results(results)
+        Returns:
+            List[List[Dict]]: نتائج كل استعلام بنفس الترتيب، أو (النتائج،
+            تقارير الدمج) مع return_report
+        """
+        logger.info(f"Hybrid batch search: {len(queries)} queries")
         
-        # 4. إرجاع أفضل k
-        final_results = merged_results[:top_k]
+        vector_results: List = [None] * len(queries)
+        degraded: Dict[str, str] = {}
+        if use_vector and queries:
+            depth = top_k * self.fusion_config(index_name).fetch_multiplier
+            batch = await self._run_leg("vector", self._embed_and_search(
+                list(queries), depth, index_name, filters
+            ), self.vector_timeout, degraded)
+            if batch is not None:
+                vector_results = batch
+            else:
+                use_vector = False
         
-        logger.info(f"Hybrid search returned {len(final_results)} results")
-        return final_results
+        # مسارات الكلمات المفتاحية للاستعلامات تعمل بالتوازي
+        # (تعثّر مسار الـ vectors المجمّع يظهر في تقرير كل استعلام)
+        fused = await asyncio.gather(*[
+            self._fused_search(
+                query, top_k, index_name, filters, use_vector, use_keyword,
+                vector_results=results, degraded=dict(degraded)
+            )
+            for query, results in zip(queries, vector_results)
+        ])
+        batched = [results for results, _ in fused]
+        if return_report:
+            return batched, [report for _, report in fused]
+        return batched
     
-    async def _vector_search(
+    async def _fused_search(
         self,
         query: str,
         top_k: int,
         index_name: str,
-        filters: Optional[Dict]
-    ) -> List[Dict]:
-        """البحث باستخدام vectors"""
-        # توليد embedding للاستعلام
-        query_embedding = await self.embeddings.generate(query)
+        filters: Optional[Dict],
+        use_vector: bool,
+        use_keyword: bool,
+        vector_results: Optional[List[Dict]] = None,
+        degraded: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        جلب نتائج المسارين بالتوازي ودمجها، مع تقرير الدمج
         
-        # البحث
-        results = await self.vector_store.search(
-            query_embedding=query_embedding,
+        مسار الـ vectors (توليد الـ embedding ثم البحث) ومسار الكلمات
+        المفتاحية (في thread pool) يعملان معاً ولكل منهما مهلة؛ المسار الذي
+        يتأخر أو يفشل يُستبعد وتُرجع نتائج المسار الآخر وحده.
+        
+        يبدأ بـ top_k * candidate_multiplier نتيجة لكل مسار، ويضاعف العمق
+        فقط إذا كان يمكن لنتائج أعمق أن تغيّر أفضل k؛ minmax و zscore تجلب
+        أقصى عمق مباشرة لأن التطبيع يتغير مع العمق
+        """
+        config = self.fusion_config(index_name)
+        depth = top_k * config.fetch_multiplier
+        max_depth = top_k * config.max_candidate_multiplier
+        weights = {"vector": self.vector_weight, "keyword": self.keyword_weight}
+        degraded = {} if degraded is None else degraded
+        query_embedding = None
+        
+        async def vector_leg(depth: int) -> List[Dict]:
+            nonlocal query_embedding
+            if query_embedding is None:
+                query_embedding = await self.embeddings.generate(query)
+            return (await self._vector_search_many([query_embedding], depth, index_name, filters))[0]
+        
+        while True:
+            fetched: Dict[str, List[Dict]] = {}
+            pending = {}
+            if use_vector:
+                if vector_results is not None:
+                    fetched["vector"] = vector_results
+                    vector_results = None
+                else:
+                    pending["vector"] = (vector_leg(depth), self.vector_timeout)
+            if use_keyword:
+                pending["keyword"] = (self._keyword_search(query, depth, index_name, filters), self.keyword_timeout)
+            
+            outcomes = await asyncio.gather(*[
+                self._run_leg(name, leg, timeout, degraded)
+                for name, (leg, timeout) in pending.items()
+            ])
+            for name, results in zip(pending, outcomes):
+                if results is not None:
+                    fetched[name] = results
+            
+            legs = [
+                FusionLeg(name, fetched[name], weights[name], len(fetched[name]) < depth)
+                for name in ("vector", "keyword") if name in fetched
+            ]
+            results, report = fuse(legs, top_k, config)
+            report["fetched"] = depth
+            if (degraded or report["complete"] or not config.early_cutoff
+                    or depth >= max_depth or all(leg.exhausted for leg in legs)):
+                break
+            depth = min(depth * 2, max_depth)
+        
+        report["degraded"] = degraded
+        return results, report
+    
+    async def _run_leg(
+        self,
+        name: str,
+        leg,
+        timeout: float,
+        degraded: Dict[str, str]
+    ) -> Optional[List]:
+        """تشغيل مسار بحث بمهلة؛ None إذا تأخر أو فشل (مع تسجيل السبب في degraded)"""
+        try:
+            return await asyncio.wait_for(leg, timeout)
+        except asyncio.TimeoutError:
+            degraded[name] = "timeout"
+            logger.warning(f"Hybrid {name} search timed out after {timeout}s")
+        except Exception as e:
+            degraded[name] = "failed"
+            logger.error(f"Hybrid {name} search failed: {e}")
+        return None
+    
+    async def _embed_and_search(
+        self,
+        queries: List[str],
+        top_k: int,
+        index_name: str,
+        filters: Optional[Dict]
+    ) -> List[List[Dict]]:
+        """توليد embeddings للاستعلامات دفعة واحدة ثم البحث بمسح واحد"""
+        query_embeddings = await self.embeddings.generate(list(queries))
+        return await self._vector_search_many(query_embeddings, top_k, index_name, filters)
+    
+    async def _vector_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        index_name: str,
+        filters: Optional[Dict]
+    ) -> List[List[Dict]]:
+        """البحث باستخدام vectors لمجموعة embeddings (مسح واحد للفهرس)"""
+        all_results = await self.vector_store.search_many(
+            query_embeddings=query_embeddings,
             top_k=top_k,
             index_name=index_name,
             filters=filters
         )
         
         # إضافة نوع البحث والوزن
-        for result in results:
-            result["search_type"] = "vector"
-            result["weighted_score"] = result["score"] * self.vector_weight
+        for results in all_results:
+            for result in results:
+                result["search_type"] = "vector"
+                result["weighted_score"] = result["score"] * self.vector_weight
         
-        return results
+        return all_results
     
     async def _keyword_search(
         self,
@@ -124,99 +305,29 @@ class HybridSearchEngine:
         index_name: str,
         filters: Optional[Dict]
     ) -> List[Dict]:
-        """البحث باستخدام الكلمات المفتاحية"""
-        # استخراج الكلمات المفتاحية
-        keywords = self._extract_keywords(query)
-        
-        # الحصول على جميع المستندات من الفهرس
-        index = self.vector_store.indexes.get(index_name, {})
-        
-        results = []
-        for doc_id, doc in index.items():
-            # تطبيق الفلاتر
-            if filters and not self._apply_filters(doc, filters):
-                continue
-            
-            # حساب درجة التطابق
-            score = self._calculate_keyword_score(keywords, doc.content)
-            
-            if score > 0:
-                results.append({
-                    "id": doc.id,
-                    "content": doc.content,
-                    "metadata": doc.metadata,
-                    "score": score,
-                    "search_type": "keyword",
-                    "weighted_score": score * self.keyword_weight,
-                    "created_at": doc.created_at
-                })
-        
-        # ترتيب
-        results.sort(key=lambda x: x["score"], reverse=True)
-        
-        return results[:top_k]
-    
-    def _extract_keywords(self, text: str) -> List[str]:
-        """استخراج الكلمات المفتاحية"""
-        # تنظيف النص
-        text = text.lower()
-        
-        # إزالة علامات الترقيم
-        text = re.sub(r'[^\w\s\u0600-\u06FF]', ' ', text)
-        
-        # تقسيم إلى كلمات
-        words = text.split()
-        
-        # إزالة الكلمات القصيرة جداً والشائعة
-        stop_words = {'the', 'is', 'at', 'which', 'on', 'في', 'من', 'إلى', 'على', 'هو', 'هي'}
-        keywords = [w for w in words if len(w) > 2 and w not in stop_words]
-        
-        return keywords
-    
-    def _calculate_keyword_score(self, keywords: List[str], content: str) -> float:
-        """حساب درجة التطابق بالكلمات المفتاحية"""
-        content_lower = content.lower()
-        
-        # حساب عدد الكلمات المطابقة
-        matches = sum(1 for keyword in keywords if keyword in content_lower)
-        
-        if not keywords:
-            return 0.0
-        
-        # النسبة المئوية للتطابق
-        score = matches / len(keywords)
+        """
+        البحث باستخدام الكلمات المفتاحية (BM25 من الفهرس المقلوب)
         
-        return score
-    
-    def _merge_results(self, results: List[Dict]) -> List[Dict]:
-        """دمج نتائج البحث المختلفة"""
-        # تجميع حسب ID
-        merged = {}
+        score هي درجة BM25 الخام؛ weighted_score تُقسم على أعلى درجة
+        لتبقى في مدى [0, 1] مثل درجات الـ vectors قبل الدمج
+        """
+        results = await self.vector_store.keyword_search(
+            query=query,
+            top_k=top_k,
+            index_name=index_name,
+            filters=filters,
+            executor=self.executor
+        )
+        if not results:
+            return []
         
+        top_score = results[0]["score"]
         for result in results:
-            doc_id = result["id"]
-            
-            if doc_id not in merged:
-                merged[doc_id] = result.copy()
-                merged[doc_id]["combined_score"] = result["weighted_score"]
-                merged[doc_id]["search_types"] = [result["search_type"]]
-            else:
-                # دمج الدرجات
-                merged[doc_id]["combined_score"] += result["weighted_score"]
-                if result["search_type"] not in merged[doc_id]["search_types"]:
-                    merged[doc_id]["search_types"].append(result["search_type"])
-        
-        # تحويل إلى قائمة وترتيب
-        merged_list = list(merged.values())
-        merged_list.sort(key=lambda x: x["combined_score"], reverse=True)
+            result["search_type"] = "keyword"
+            result["weighted_score"] = result["score"] / top_score * self.keyword_weight
         
-        return merged_list
+        return results
     
-    def _apply_filters(self, doc, filters: Dict) -> bool:
-        """تطبيق الفلاتر"""
-        for key, value in filters.items():
-            if key not in doc.metadata:
-                return False
-            if doc.metadata[key] != value:
-                return False
-        return True
\ No newline at end of file
+    def _extract_keywords(self, text: str) -> List[str]:
+        """استخراج الكلمات المفتاحية (نفس محلل الفهرس)"""
+        return analyze(text)
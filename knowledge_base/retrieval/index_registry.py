@@ -0,0 +1,255 @@
+"""
+Dataset Index Registry - process-wide vector indexes shared across requests
+
+The registry owns the CollectionManager for the whole process (created in
+the application lifespan). A dataset is loaded on first use - from its
+snapshot when the backend persists one, then synced incrementally with the
+database - behind a per-dataset lock, so concurrent first requests load it
+once and later requests pay nothing. Ingestion and deletion keep loaded datasets current
+and invalidate the dataset's cached answers.
+
+Loaded datasets are keyed by (tenant_id, dataset_id). A dataset is only
+loaded for the tenant that owns it (Dataset.tenant_id); asking for another
+tenant's dataset raises DatasetNotFoundError.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from sqlalchemy.orm import Session
+
+from api.models import Dataset, Document
+from core.config import settings
+from core.rag.answer_cache import SemanticAnswerCache
+from knowledge_base.vector_store.collection_manager import CollectionManager, create_default_collections
+from .retriever import DocumentRetriever
+
+logger = logging.getLogger(__name__)
+
+DatasetKey = Tuple[Optional[str], str]
+
+
+class DatasetNotFoundError(LookupError):
+    """The dataset does not exist or belongs to another tenant"""
+
+
+class DatasetIndexRegistry:
+    """Long-lived registry of loaded dataset indexes"""
+
+    def __init__(
+        self,
+        collections: Optional[CollectionManager] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None
+    ):
+        """
+        Args:
+            collections: Vector collections (defaults to settings.vector_store_backend)
+            answer_cache: Semantic answer cache (defaults to settings.answer_cache_*;
+                None when settings.answer_cache_enabled is off)
+        """
+        self.collections = collections or create_default_collections()
+        if answer_cache is None and settings.answer_cache_enabled:
+            answer_cache = SemanticAnswerCache(
+                threshold=settings.answer_cache_threshold,
+                max_entries=settings.answer_cache_size,
+                ttl_seconds=settings.answer_cache_ttl_seconds
+            )
+        self.answer_cache = answer_cache
+        self._locks: Dict[DatasetKey, asyncio.Lock] = {}
+        self._loaded: Set[DatasetKey] = set()
+
+    def retriever(self, db: Session) -> DocumentRetriever:
+        """Request-scoped retriever over the shared collections"""
+        return DocumentRetriever(db, collections=self.collections)
+
+    def is_loaded(self, dataset_id: str, tenant_id: Optional[str] = None) -> bool:
+        """Whether the tenant's dataset is loaded (for any tenant when omitted)"""
+        if tenant_id is None:
+            return any(loaded == dataset_id for _, loaded in self._loaded)
+        return (tenant_id, dataset_id) in self._loaded
+
+    @staticmethod
+    def owner(db: Optional[Session], dataset_id: str, tenant_id: Optional[str] = None) -> Optional[str]:
+        """
+        Tenant owning a dataset
+
+        Raises:
+            DatasetNotFoundError: The dataset is missing, or tenant_id is
+                given and does not own it
+        """
+        if db is None:
+            return tenant_id
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        if dataset is None or (tenant_id is not None and dataset.tenant_id != tenant_id):
+            raise DatasetNotFoundError(dataset_id)
+        return dataset.tenant_id
+
+    def _changed(self, dataset_id: str):
+        """A dataset's documents changed: stop serving its cached answers"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(dataset_id)
+    
+    def _lock(self, key: DatasetKey) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def ensure_loaded(
+        self,
+        db: Session,
+        dataset_id: str,
+        tenant_id: Optional[str] = None
+    ) -> bool:
+        """
+        Load a dataset's index on first use
+
+        Returns:
+            True if this call loaded the dataset, False if it was already loaded
+
+        Raises:
+            DatasetNotFoundError: The dataset is not the tenant's
+        """
+        if (tenant_id, dataset_id) in self._loaded:
+            return False
+
+        tenant_id = self.owner(db, dataset_id, tenant_id)
+        key = (tenant_id, dataset_id)
+        async with self._lock(key):
+            if key in self._loaded:
+                return False
+
+            retriever = self.retriever(db)
+            store = retriever.get_vector_store(dataset_id, tenant_id)
+            stats = await store.get_stats()
+
+            # A restored snapshot may predate the database: the incremental
+            # sync only embeds what changed since it was written
+            result = await retriever.index_dataset(dataset_id, tenant_id)
+            if stats.get('total_vectors', 0):
+                logger.info(
+                    f"Dataset {dataset_id} loaded from snapshot ({stats['total_vectors']} vectors, "
+                    f"{result['indexed']} segments re-indexed)"
+                )
+            else:
+                logger.info(f"Dataset {dataset_id} loaded from database ({result['indexed']} segments)")
+
+            self._loaded.add(key)
+            return True
+
+    async def reload(
+        self,
+        db: Session,
+        dataset_id: str,
+        tenant_id: Optional[str] = None,
+        full: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Sync a dataset's index with the database
+
+        Only new or changed segments are embedded (see
+        DocumentRetriever.index_dataset); full=True re-embeds everything.
+
+        Raises:
+            DatasetNotFoundError: The dataset is not the tenant's
+        """
+        tenant_id = self.owner(db, dataset_id, tenant_id)
+        key = (tenant_id, dataset_id)
+        async with self._lock(key):
+            result = await self.retriever(db).index_dataset(dataset_id, tenant_id, full=full)
+            self._loaded.add(key)
+            self._changed(dataset_id)
+            return result
+
+    async def index_document(self, db: Session, document_id: str) -> Dict[str, Any]:
+        """
+        Bring a document's dataset index up to date after ingestion
+
+        Datasets that are not loaded yet are skipped: they pick the
+        document up when they are loaded.
+
+        Returns:
+            The indexing diff (empty when skipped)
+        """
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is None or not self.is_loaded(document.dataset_id):
+            return {}
+
+        tenant_id = self.owner(db, document.dataset_id)
+        key = (tenant_id, document.dataset_id)
+        if key not in self._loaded:
+            return {}
+
+        async with self._lock(key):
+            result = await self.retriever(db).index_dataset(document.dataset_id, tenant_id)
+            self._changed(document.dataset_id)
+            return result
+
+    async def remove_segments(
+        self,
+        dataset_id: str,
+        segment_ids: List[str],
+        tenant_id: Optional[str] = None
+    ) -> bool:
+        """Remove deleted segments from the tenant's loaded dataset index"""
+        key = (tenant_id, dataset_id)
+        if key not in self._loaded or not segment_ids:
+            return False
+
+        async with self._lock(key):
+            store = self.collections.get(tenant_id, dataset_id)
+            if store is None:
+                return False
+            deleted = await store.delete(segment_ids)
+            self._changed(dataset_id)
+            return deleted
+
+    def drop(self, dataset_id: str, tenant_id: Optional[str] = None) -> bool:
+        """Forget the tenant's dataset (e.g. when it is deleted)"""
+        key = (tenant_id, dataset_id)
+        self._loaded.discard(key)
+        self._locks.pop(key, None)
+        dropped = self.collections.drop(tenant_id, dataset_id)
+        if dropped:
+            self._changed(dataset_id)
+        return dropped
+
+    def close(self):
+        """Release every collection"""
+        self.collections.close()
+        self._loaded.clear()
+        self._locks.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'loaded_datasets': sorted(dataset_id for _, dataset_id in self._loaded),
+            'collections': len(self.collections.keys()),
+            'answer_cache': self.answer_cache.stats() if self.answer_cache is not None else None
+        }
+
+
+_registry: Optional[DatasetIndexRegistry] = None
+
+
+def init_index_registry(collections: Optional[CollectionManager] = None) -> DatasetIndexRegistry:
+    """Create the process-wide registry (called from the application lifespan)"""
+    global _registry
+    _registry = DatasetIndexRegistry(collections)
+    return _registry
+
+
+def get_index_registry() -> DatasetIndexRegistry:
+    """Process-wide registry (FastAPI dependency); created on demand outside the app"""
+    if _registry is None:
+        return init_index_registry()
+    return _registry
+
+
+def close_index_registry():
+    """Release the process-wide registry (called on shutdown)"""
+    global _registry
+    if _registry is not None:
+        _registry.close()
+        _registry = None
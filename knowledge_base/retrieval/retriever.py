@@ -3,53 +3,209 @@ Document Retrieval Service
 """
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
+import hashlib
 import logging
+import time
 
-from api.models import DocumentSegment, Dataset
-from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from api.models import Document, DocumentSegment, Dataset
+from core.config import settings
+from utilities.text_analyzer import analyze
+from utilities.tracing import span
+from knowledge_base.vector_store.base_vector_store import BaseVectorStore
+from knowledge_base.vector_store.collection_manager import CollectionManager, create_default_collections
 from knowledge_base.embeddings.embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
 
 
+def segment_hash(content: str) -> str:
+    """Content hash stored in DocumentSegment.index_node_hash"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
 class DocumentRetriever:
     """Retrieve relevant document segments"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        dataset_backends: Optional[Dict[str, Dict[str, Any]]] = None,
+        collections: Optional[CollectionManager] = None
+    ):
+        """
+        Args:
+            db: Database session
+            dataset_backends: Optional per-dataset vector store selection,
+                e.g. {'ds-1': {'backend': 'hnsw', 'ef_search': 128}}.
+                Other datasets use settings.vector_store_backend.
+            collections: Vector collections, one per (tenant_id, dataset_id)
+        """
         self.db = db
-        self.vector_store = MemoryVectorStore()
+        self.collections = collections or create_default_collections()
         self.embedding_service = embedding_service
+        
+        # Per-stage timings of the last retrieve call
+        self.timings: Dict[str, Any] = {}
+
+        for dataset_id, options in (dataset_backends or {}).items():
+            self.configure_dataset(dataset_id, **options)
+    
+    def _tenant_for(self, dataset_id: str) -> Optional[str]:
+        """Tenant owning a dataset (from its collection, else the database)"""
+        keys = self.collections.keys(dataset_ids=[dataset_id])
+        if keys:
+            return keys[0][0]
+        if self.db is None:
+            return None
+        dataset = self.db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        return dataset.tenant_id if dataset else None
+    
+    def configure_dataset(
+        self,
+        dataset_id: str,
+        backend: str = 'memory',
+        tenant_id: Optional[str] = None,
+        **params: Any
+    ) -> BaseVectorStore:
+        """
+        Select a dedicated vector store backend for a dataset
+        
+        Args:
+            dataset_id: Dataset ID
+            backend: Backend name ('memory', 'hnsw', ...)
+            tenant_id: Owning tenant (looked up when omitted)
+            **params: Backend options
+            
+        Returns:
+            The dataset's vector store
+        """
+        tenant_id = tenant_id or self._tenant_for(dataset_id)
+        store = self.collections.configure(tenant_id, dataset_id, backend, **params)
+        logger.info(f"Dataset {dataset_id} uses '{backend}' vector store")
+        return store
     
-    async def index_dataset(self, dataset_id: str) -> Dict[str, Any]:
+    def get_vector_store(self, dataset_id: str, tenant_id: Optional[str] = None) -> BaseVectorStore:
+        """Vector store (collection) holding a dataset"""
+        return self.collections.get_or_create(tenant_id or self._tenant_for(dataset_id), dataset_id)
+    
+    async def index_dataset(
+        self,
+        dataset_id: str,
+        tenant_id: Optional[str] = None,
+        full: bool = False
+    ) -> Dict[str, Any]:
         """
-        Index all segments from a dataset into vector store
+        Incrementally sync a dataset's segments into its vector store
+        
+        Each segment's content hash is compared with the hash recorded in
+        index_node_hash when it was last embedded: only new or changed
+        segments are embedded, and vectors of deleted or disabled segments
+        are removed. Unchanged segments indexed before terms were stored
+        get their keywords backfilled without being re-embedded.
         
         Args:
             dataset_id: Dataset ID to index
+            tenant_id: Owning tenant (looked up when omitted)
+            full: Re-embed every enabled segment
             
         Returns:
-            Statistics about indexing
+            Statistics about indexing, with the added/updated/removed/skipped diff
         """
         logger.info(f"Indexing dataset: {dataset_id}")
         
-        # Get all segments from dataset
-        segments = self.db.query(DocumentSegment).filter(
-            DocumentSegment.dataset_id == dataset_id,
-            DocumentSegment.enabled == True
-        ).all()
+        # All segments of the dataset's documents (disabled ones are removed)
+        segments = self.db.query(DocumentSegment).join(
+            Document, Document.id == DocumentSegment.document_id
+        ).filter(Document.dataset_id == dataset_id).all()
+        
+        store = self.get_vector_store(dataset_id, tenant_id)
+        stored_ids = await store.get_ids()
+        stored = set(stored_ids) if stored_ids is not None else None
         
+        added, updated, skipped, to_embed = [], [], [], []
+        disabled, backfilled = [], []
+        for segment in segments:
+            if segment.enabled is False:
+                if segment.index_node_id:
+                    disabled.append(segment)
+                continue
+            
+            content_hash = segment_hash(segment.content)
+            # Without an ID listing, trust the recorded index_node_id
+            indexed = segment.index_node_id is not None and (stored is None or segment.id in stored)
+            if indexed and not full and segment.index_node_hash == content_hash:
+                skipped.append(segment.id)
+                # Indexed before terms were stored at indexing
+                if segment.keywords is None:
+                    segment.keywords = analyze(segment.content)
+                    backfilled.append(segment.id)
+                continue
+            
+            (updated if indexed else added).append(segment.id)
+            to_embed.append((segment, content_hash))
+        
+        # Vectors whose segment was deleted or disabled
+        enabled_ids = {segment.id for segment in segments if segment.enabled is not False}
+        removed = [segment.id for segment in disabled]
+        if stored is not None:
+            removed = sorted((stored - enabled_ids) | set(removed))
+        if removed:
+            await store.delete(removed)
+        for segment in disabled:
+            segment.index_node_id = None
+            segment.index_node_hash = None
+        
+        await self.index_segments(dataset_id, [segment for segment, _ in to_embed], tenant_id)
+        for segment, content_hash in to_embed:
+            segment.index_node_id = segment.id
+            segment.index_node_hash = content_hash
+        if to_embed or disabled or backfilled:
+            self.db.commit()
+        
+        logger.info(
+            f"✅ Indexed dataset {dataset_id}: {len(added)} added, {len(updated)} updated, "
+            f"{len(removed)} removed, {len(skipped)} skipped"
+        )
+        
+        return {
+            'indexed': len(to_embed),
+            'dataset_id': dataset_id,
+            'added': len(added),
+            'updated': len(updated),
+            'removed': len(removed),
+            'skipped': len(skipped),
+            'keywords_backfilled': len(backfilled),
+            'vector_dimension': self.embedding_service.get_embedding_dimension()
+        }
+    
+    async def index_segments(
+        self,
+        dataset_id: str,
+        segments: List[DocumentSegment],
+        tenant_id: Optional[str] = None
+    ) -> int:
+        """
+        Embed segments and add (or replace) them in the dataset's collection
+        
+        Each segment's analyzed terms are stored in segment.keywords (saved
+        with the caller's commit), so keyword scoring never re-analyzes it.
+        
+        Returns:
+            Number of segments indexed
+        """
         if not segments:
-            logger.warning(f"No segments found for dataset {dataset_id}")
-            return {'indexed': 0, 'dataset_id': dataset_id}
+            return 0
         
         # Prepare data
         texts = [seg.content for seg in segments]
+        for seg in segments:
+            seg.keywords = analyze(seg.content)
         ids = [seg.id for seg in segments]
         metadatas = [
             {
                 'segment_id': seg.id,
                 'document_id': seg.document_id,
-                'dataset_id': seg.dataset_id,
+                'dataset_id': dataset_id,
                 'position': seg.position,
                 'word_count': seg.word_count
             }
@@ -58,30 +214,26 @@ class DocumentRetriever:
         
         # Generate embeddings
         logger.info(f"Generating embeddings for {len(texts)} segments...")
-        embeddings = await self.embedding_service.generate_embeddings(texts)
+        embeddings = await self.embedding_service.generate_embeddings(texts, use_cache=False)
         
-        # Add to vector store
+        # Add to the dataset's collection
         logger.info(f"Adding to vector store...")
-        await self.vector_store.add_embeddings(
+        await self.get_vector_store(dataset_id, tenant_id).add_embeddings(
             texts=texts,
             embeddings=embeddings,
             metadatas=metadatas,
             ids=ids
         )
-        
-        logger.info(f"✅ Indexed {len(segments)} segments from dataset {dataset_id}")
-        
-        return {
-            'indexed': len(segments),
-            'dataset_id': dataset_id,
-            'vector_dimension': self.embedding_service.get_embedding_dimension()
-        }
+        return len(segments)
     
     async def retrieve(
         self,
         query: str,
         top_k: int = 5,
-        dataset_id: Optional[str] = None
+        dataset_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        enrich_from_db: bool = True,
+        dataset_ids: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant segments for query
@@ -89,54 +241,211 @@ class DocumentRetriever:
         Args:
             query: Search query
             top_k: Number of results
-            dataset_id: Optional dataset filter
+            dataset_id: Optional dataset scope
+            tenant_id: Optional tenant scope
+            enrich_from_db: Load segment/document rows (one batched query);
+                when False, results are built from the index payload only
+            dataset_ids: Several datasets to search concurrently (with
+                dataset_id, if given); the query is embedded once, each
+                dataset search has a timeout and scores are normalized
+                per dataset before merging
             
         Returns:
             List of relevant segments with scores
         """
         logger.info(f"Retrieving for query: '{query[:50]}...'")
         
-        # Generate query embedding
-        query_embedding = await self.embedding_service.generate_embedding(query)
+        with span('retrieve', top_k=top_k, datasets=len(dataset_ids) if dataset_ids else int(bool(dataset_id))):
+            # Generate query embedding
+            started = time.perf_counter()
+            query_embedding = await self.embedding_service.generate_embedding(query)
+            embedded = time.perf_counter()
+            
+            fanout = None
+            with span('vector_search') as search:
+                if dataset_ids:
+                    # Fan out over the datasets; slow ones are left out
+                    results, fanout = await self.collections.search_fanout(
+                        query_embedding=query_embedding,
+                        top_k=top_k,
+                        tenant_id=tenant_id,
+                        dataset_ids=list(dict.fromkeys(([dataset_id] if dataset_id else []) + list(dataset_ids))),
+                        max_concurrency=settings.retrieval_max_concurrency,
+                        timeout_seconds=settings.retrieval_dataset_timeout_ms / 1000,
+                        normalization=settings.retrieval_score_normalization
+                    )
+                    search.set(timed_out=len(fanout['timed_out']), failed=len(fanout['failed']))
+                else:
+                    # Search only the collections in scope
+                    results = await self.collections.search(
+                        query_embedding=query_embedding,
+                        top_k=top_k,
+                        tenant_id=tenant_id,
+                        dataset_ids=[dataset_id] if dataset_id else None
+                    )
+                search.set(hits=len(results))
+            searched = time.perf_counter()
+            
+            self.timings = {
+                'embedding_ms': (embedded - started) * 1000,
+                'search_ms': (searched - embedded) * 1000
+            }
+            if fanout is not None:
+                self.timings['fanout'] = fanout
+            enriched_results = self._enrich_many([results], enrich_from_db)[0]
+        
+        logger.info(f"Retrieved {len(enriched_results)} relevant segments")
+        return enriched_results
+    
+    async def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        dataset_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        enrich_from_db: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve segments for several queries with one batched search
+        
+        Query embeddings are generated in one call, the vector store
+        scores the whole batch together (search_many) and the hits of all
+        queries are enriched with a single database query.
         
-        # Build filter
-        filter_dict = {}
-        if dataset_id:
-            filter_dict['dataset_id'] = dataset_id
+        Returns:
+            One result list per query, in query order
+        """
+        logger.info(f"Retrieving for {len(queries)} queries")
+        if not queries:
+            return []
         
-        # Search
-        results = await self.vector_store.search(
-            query_embedding=query_embedding,
-            top_k=top_k,
-            filter=filter_dict if filter_dict else None
-        )
+        started = time.perf_counter()
+        query_embeddings = await self.embedding_service.generate_embeddings(queries)
+        embedded = time.perf_counter()
         
-        # Enrich with document info
-        enriched_results = []
-        for result in results:
-            # Get segment from DB for full info
-            segment_id = result['metadata']['segment_id']
-            segment = self.db.query(DocumentSegment).filter(
-                DocumentSegment.id == segment_id
-            ).first()
-            
-            if segment:
-                enriched_results.append({
+        with span('vector_search', queries=len(queries)):
+            all_results = await self.collections.search_many(
+                query_embeddings=query_embeddings,
+                top_k=top_k,
+                tenant_id=tenant_id,
+                dataset_ids=[dataset_id] if dataset_id else None
+            )
+        searched = time.perf_counter()
+        
+        self.timings = {
+            'embedding_ms': (embedded - started) * 1000,
+            'search_ms': (searched - embedded) * 1000
+        }
+        return self._enrich_many(all_results, enrich_from_db)
+    
+    def _enrich(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Enrich vector store hits with document info"""
+        return self._enrich_many([results])[0]
+    
+    def _enrich_many(
+        self,
+        all_results: List[List[Dict[str, Any]]],
+        from_db: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Enrich the hits of one or more queries, keeping ranking order
+        
+        All hit segments and their parent documents are fetched with one
+        IN (...) query. Without a database (or with from_db=False) results
+        come from the payload stored in the index. Hits whose segment no
+        longer exists in the database are dropped.
+        """
+        if not from_db or self.db is None:
+            self.timings.update({'enrich_db_ms': 0.0, 'enrich_db_queries': 0})
+            return [[self._from_payload(result) for result in results] for results in all_results]
+        
+        segment_ids = list({
+            result['metadata'].get('segment_id', result['id'])
+            for results in all_results
+            for result in results
+        })
+        
+        started = time.perf_counter()
+        rows = {}
+        if segment_ids:
+            with span('db_enrich', segments=len(segment_ids)):
+                rows = {
+                    segment.id: (segment, document)
+                    for segment, document in self.db.query(DocumentSegment, Document).outerjoin(
+                        Document, Document.id == DocumentSegment.document_id
+                    ).filter(DocumentSegment.id.in_(segment_ids))
+                }
+        self.timings.update({
+            'enrich_db_ms': (time.perf_counter() - started) * 1000,
+            'enrich_db_queries': 1 if segment_ids else 0
+        })
+        
+        enriched = []
+        for results in all_results:
+            query_results = []
+            for result in results:
+                row = rows.get(result['metadata'].get('segment_id', result['id']))
+                if row is None:
+                    continue
+                segment, document = row
+                query_results.append({
                     'text': result['text'],
                     'score': result['score'],
                     'segment_id': segment.id,
                     'document_id': segment.document_id,
-                    'dataset_id': segment.dataset_id,
+                    'document_name': document.name if document else None,
+                    'dataset_id': document.dataset_id if document else result['metadata'].get('dataset_id'),
                     'position': segment.position,
-                    'metadata': segment.meta
+                    'metadata': segment.meta_data,
+                    'tokens': segment.keywords
                 })
+            enriched.append(query_results)
+        return enriched
+    
+    @staticmethod
+    def _from_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Enriched result built from the index payload alone"""
+        metadata = result['metadata']
+        return {
+            'text': result['text'],
+            'score': result['score'],
+            'segment_id': metadata.get('segment_id', result['id']),
+            'document_id': metadata.get('document_id'),
+            'document_name': metadata.get('document_name'),
+            'dataset_id': metadata.get('dataset_id'),
+            'position': metadata.get('position'),
+            'metadata': metadata
+        }
+    
+    async def compact_vector_store(self, dataset_id: str, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Drop tombstoned rows from a dataset's vector store
         
-        logger.info(f"Retrieved {len(enriched_results)} relevant segments")
-        return enriched_results
+        Returns:
+            Compaction result (removed rows, seconds, rows per second)
+        """
+        store = self.collections.get(tenant_id or self._tenant_for(dataset_id), dataset_id)
+        if store is None:
+            raise ValueError(f"Dataset {dataset_id} is not indexed")
+        compact = getattr(store, 'compact', None)
+        if compact is None:
+            raise ValueError(f"{type(store).__name__} does not support compaction")
+        return compact()
+    
+    async def get_collection_stats(
+        self,
+        tenant_id: Optional[str] = None,
+        dataset_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Per-collection vector statistics for a tenant and/or dataset"""
+        return await self.collections.get_stats(
+            tenant_id=tenant_id,
+            dataset_ids=[dataset_id] if dataset_id else None
+        )
     
-    async def get_stats(self) -> Dict[str, Any]:
+    async def get_stats(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
         """Get retriever statistics"""
-        vector_stats = await self.vector_store.get_stats()
+        collection_stats = await self.get_collection_stats(tenant_id)
         
         total_segments = self.db.query(DocumentSegment).count()
         enabled_segments = self.db.query(DocumentSegment).filter(
@@ -146,5 +455,5 @@ class DocumentRetriever:
         return {
             'total_segments_in_db': total_segments,
             'enabled_segments': enabled_segments,
-            'vector_store': vector_stats
+            'vector_collections': collection_stats
         }
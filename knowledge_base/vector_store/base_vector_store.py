@@ -2,15 +2,49 @@
 Base Vector Store Interface
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+QueryFilters = Optional[Union[Dict[str, Any], List[Optional[Dict[str, Any]]]]]
+
+
+def group_queries_by_filter(
+    n_queries: int,
+    filters: QueryFilters
+) -> List[Tuple[Optional[Dict[str, Any]], List[int]]]:
+    """
+    Group query positions that share the same filter
+
+    Args:
+        n_queries: Number of queries in the batch
+        filters: None, one filter for every query, or one filter per query
+
+    Returns:
+        (filter, query positions) pairs, so each group costs one scan
+    """
+    if filters is None or isinstance(filters, dict):
+        return [(filters or None, list(range(n_queries)))]
+
+    if len(filters) != n_queries:
+        raise ValueError(f"Got {len(filters)} filters for {n_queries} queries")
+
+    groups: Dict[Any, Tuple[Optional[Dict[str, Any]], List[int]]] = {}
+    for position, filter in enumerate(filters):
+        key = repr(sorted(filter.items())) if filter else None
+        groups.setdefault(key, (filter or None, []))[1].append(position)
+    return list(groups.values())
+
+
 class BaseVectorStore(ABC):
     """Abstract base class for vector stores"""
     
+    # search() scores on the calling thread without yielding to the event
+    # loop; callers that need concurrency run it in a worker thread
+    blocking_search = True
+    
     @abstractmethod
     async def add_embeddings(
         self,
@@ -53,11 +87,46 @@ class BaseVectorStore(ABC):
         """
         pass
     
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: QueryFilters = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several query vectors at once
+        
+        Backends that can score a whole batch with one matrix-matrix
+        product override this; the default runs the queries one by one.
+        
+        Args:
+            query_embeddings: Query vectors
+            top_k: Number of results per query
+            filters: One metadata filter for all queries, or one per query
+            
+        Returns:
+            One result list per query, in query order
+        """
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        for filter, positions in group_queries_by_filter(len(query_embeddings), filters):
+            for position in positions:
+                results[position] = await self.search(query_embeddings[position], top_k, filter)
+        return results
+    
     @abstractmethod
     async def delete(self, ids: List[str]) -> bool:
         """Delete vectors by IDs"""
         pass
     
+    async def get_ids(self) -> Optional[List[str]]:
+        """
+        IDs of the live vectors
+        
+        Returns:
+            The IDs, or None when the backend cannot enumerate them
+        """
+        return None
+    
     @abstractmethod
     async def get_stats(self) -> Dict[str, Any]:
         """Get vector store statistics"""
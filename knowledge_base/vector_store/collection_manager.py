@@ -0,0 +1,248 @@
+"""
+Vector Collections - one vector store per (tenant_id, dataset_id)
+
+Each collection owns its own matrix and indexes, so a search scoped to a
+dataset (or a tenant) only touches that dataset's (or tenant's) vectors
+instead of filtering a shared store after scoring.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from core.config import settings
+
+from .base_vector_store import BaseVectorStore
+from .factory import create_vector_store
+from .sharded_vector_store import ShardPool
+from .vector_math import normalize_scores, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+CollectionKey = Tuple[Optional[str], str]
+
+# Directory name for collections of datasets without a tenant
+SHARED_TENANT = '_shared'
+
+
+class CollectionManager:
+    """Registry of per-(tenant, dataset) vector store collections"""
+
+    def __init__(self, backend: str = 'memory', **params: Any):
+        """
+        Args:
+            backend: Default backend for new collections (see VECTOR_STORE_BACKENDS)
+            **params: Default backend options; a 'path' option is treated as
+                the root directory and each collection gets its own subdirectory
+        """
+        self.backend = backend
+        self.params = params
+        self._collections: Dict[CollectionKey, BaseVectorStore] = {}
+        self._backends: Dict[CollectionKey, str] = {}
+        self._shard_pools: Dict[Tuple[int, Optional[str]], ShardPool] = {}
+
+    def _shard_pool(self, n_shards: int, start_method: Optional[str]) -> ShardPool:
+        """Worker pool shared by every 'sharded' collection with the same shard count"""
+        pool = self._shard_pools.get((n_shards, start_method))
+        if pool is None:
+            pool = self._shard_pools[(n_shards, start_method)] = ShardPool(n_shards, start_method)
+        return pool
+
+    def _create(self, key: CollectionKey, backend: str, params: Dict[str, Any]) -> BaseVectorStore:
+        tenant_id, dataset_id = key
+        if 'path' in params:
+            params = {**params, 'path': str(Path(params['path']) / (tenant_id or SHARED_TENANT) / dataset_id)}
+        if backend == 'sharded' and 'pool' not in params:
+            params = dict(params)
+            params['pool'] = self._shard_pool(params.pop('n_shards', 4), params.pop('start_method', None))
+        store = create_vector_store(backend, **params)
+        self._collections[key] = store
+        self._backends[key] = backend
+        logger.info(f"Created '{backend}' collection for tenant={tenant_id} dataset={dataset_id}")
+        return store
+
+    def configure(
+        self,
+        tenant_id: Optional[str],
+        dataset_id: str,
+        backend: Optional[str] = None,
+        **params: Any
+    ) -> BaseVectorStore:
+        """Create (or replace) a collection with a dedicated backend"""
+        self.drop(tenant_id, dataset_id)
+        backend = backend or self.backend
+        # Default options only apply to the default backend
+        if backend == self.backend:
+            params = {**self.params, **params}
+        return self._create((tenant_id, dataset_id), backend, params)
+
+    def get(self, tenant_id: Optional[str], dataset_id: str) -> Optional[BaseVectorStore]:
+        return self._collections.get((tenant_id, dataset_id))
+
+    def get_or_create(self, tenant_id: Optional[str], dataset_id: str) -> BaseVectorStore:
+        store = self.get(tenant_id, dataset_id)
+        if store is None:
+            store = self._create((tenant_id, dataset_id), self.backend, self.params)
+        return store
+
+    def drop(self, tenant_id: Optional[str], dataset_id: str) -> bool:
+        """Remove a collection (closing it when the backend holds resources)"""
+        store = self._collections.pop((tenant_id, dataset_id), None)
+        self._backends.pop((tenant_id, dataset_id), None)
+        if store is None:
+            return False
+        close = getattr(store, 'close', None)
+        if close is not None:
+            close()
+        return True
+
+    def close(self):
+        """Remove every collection and stop the shared shard workers"""
+        for tenant_id, dataset_id in self.keys():
+            self.drop(tenant_id, dataset_id)
+        for pool in self._shard_pools.values():
+            pool.close()
+        self._shard_pools.clear()
+
+    def keys(
+        self,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None
+    ) -> List[CollectionKey]:
+        """
+        Collections matching a scope
+
+        Args:
+            tenant_id: Only this tenant's collections (all tenants if None)
+            dataset_ids: Only these datasets (all datasets if None)
+        """
+        return [
+            key for key in self._collections
+            if (tenant_id is None or key[0] == tenant_id)
+            and (dataset_ids is None or key[1] in dataset_ids)
+        ]
+
+    async def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search only the collections in scope and merge their top-k"""
+        return (await self.search_many([query_embedding], top_k, tenant_id, dataset_ids, filter))[0]
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Batched search over the collections in scope"""
+        merged: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        keys = self.keys(tenant_id, dataset_ids)
+
+        for key in keys:
+            results = await self._collections[key].search_many(query_embeddings, top_k, filter)
+            for query_results, collection_results in zip(merged, results):
+                query_results.extend(collection_results)
+
+        if len(keys) > 1:
+            for i, results in enumerate(merged):
+                scores = np.array([result['score'] for result in results])
+                merged[i] = [results[j] for j in top_k_indices(scores, top_k)]
+        return merged
+
+    async def search_fanout(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None,
+        max_concurrency: int = 8,
+        timeout_seconds: Optional[float] = None,
+        normalization: str = 'minmax',
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Search many collections concurrently and merge their top-k
+
+        At most max_concurrency collections are searched at once, each in
+        a worker thread when its backend scores on the calling thread
+        (BaseVectorStore.blocking_search). A collection that does not
+        answer within timeout_seconds (or fails) is left out, so slow
+        datasets yield partial results instead of delaying the request.
+        Scores are normalized per collection before the merge.
+
+        Returns:
+            (merged hits, report with per-dataset latency, timed_out and failed datasets)
+        """
+        keys = self.keys(tenant_id, dataset_ids)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        report: Dict[str, Any] = {'datasets': len(keys), 'latency_ms': {}, 'timed_out': [], 'failed': []}
+
+        async def search_one(key: CollectionKey) -> List[Dict[str, Any]]:
+            async with semaphore:
+                started = time.perf_counter()
+                store = self._collections[key]
+                search = store.search(query_embedding, top_k, filter)
+                if store.blocking_search:
+                    # A timed-out thread finishes in the background; its result is dropped
+                    search = asyncio.to_thread(asyncio.run, search)
+                try:
+                    results = await asyncio.wait_for(search, timeout_seconds)
+                except asyncio.TimeoutError:
+                    report['timed_out'].append(key[1])
+                    logger.warning(f"Search of dataset {key[1]} timed out after {timeout_seconds}s")
+                    return []
+                except Exception as e:
+                    report['failed'].append(key[1])
+                    logger.error(f"Search of dataset {key[1]} failed: {e}")
+                    return []
+                finally:
+                    report['latency_ms'][key[1]] = (time.perf_counter() - started) * 1000
+            return normalize_scores(results, normalization)
+
+        hits = [hit for results in await asyncio.gather(*[search_one(key) for key in keys]) for hit in results]
+        scores = np.array([hit['score'] for hit in hits])
+        report['partial'] = bool(report['timed_out'] or report['failed'])
+        return [hits[i] for i in top_k_indices(scores, top_k)], report
+
+    async def get_stats(
+        self,
+        tenant_id: Optional[str] = None,
+        dataset_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Per-collection statistics for a scope"""
+        collections = []
+        for key in self.keys(tenant_id, dataset_ids):
+            stats = await self._collections[key].get_stats()
+            collections.append({
+                'tenant_id': key[0],
+                'dataset_id': key[1],
+                'backend': self._backends[key],
+                **stats
+            })
+
+        return {
+            'total_collections': len(collections),
+            'total_vectors': sum(c.get('total_vectors', 0) for c in collections),
+            'collections': collections
+        }
+
+
+def create_default_collections() -> CollectionManager:
+    """Collections using settings.vector_store_backend"""
+    backend = settings.vector_store_backend
+    if backend == 'persistent':
+        return CollectionManager(backend, path=settings.vector_store_path)
+    if backend == 'sharded':
+        return CollectionManager(backend, n_shards=settings.vector_store_shards)
+    return CollectionManager(backend)
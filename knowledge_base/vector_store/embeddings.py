@@ -13,6 +13,7 @@ except ImportError:
     HAS_OPENAI = False
 
 from core.config import config
+from knowledge_base.embeddings.embedding_cache import EmbeddingCache
 from utilities.logger import logger
 
 
@@ -38,7 +39,11 @@ class EmbeddingsGenerator:
                 logger.warning(f"Failed to initialize OpenAI client: {e}")
                 self.client = None
         
-        self.cache = {}
+        # كاش محدود (LRU + مدة صلاحية) بدل القاموس غير المحدود
+        self.cache = EmbeddingCache(
+            max_size=config.embedding_cache_size,
+            ttl_seconds=config.embedding_cache_ttl_seconds
+        )
         logger.info(f"Initialized EmbeddingsGenerator (using_openai={self.client is not None})")
     
     async def generate(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
@@ -57,18 +62,17 @@ class EmbeddingsGenerator:
         if not text or not text.strip():
             return self._get_zero_embedding()
         
-        cache_key = self._get_cache_key(text)
-        if cache_key in self.cache:
-            logger.debug("Using cached embedding")
-            return self.cache[cache_key]
-        
+        # الطلبات المتزامنة لنفس النص تنتظر استدعاءً واحداً
+        return await self.cache.get_or_compute(
+            self._get_cache_key(text),
+            lambda: self._generate_uncached(text)
+        )
+    
+    async def _generate_uncached(self, text: str) -> List[float]:
+        """توليد embedding بدون كاش"""
         if self.client:
-            embedding = await self._generate_with_openai(text)
-        else:
-            embedding = self._generate_fallback(text)
-        
-        self.cache[cache_key] = embedding
-        return embedding
+            return await self._generate_with_openai(text)
+        return self._generate_fallback(text)
     
     async def _generate_with_openai(self, text: str) -> List[float]:
         """توليد embedding باستخدام Azure OpenAI (API الجديد)"""
@@ -106,8 +110,9 @@ class EmbeddingsGenerator:
     def _get_zero_embedding(self) -> List[float]:
         return [0.0] * 1536
     
-    def _get_cache_key(self, text: str) -> str:
-        return hashlib.md5(text.encode()).hexdigest()
+    def _get_cache_key(self, text: str) -> tuple:
+        model = getattr(self, "deployment", None) if self.client else "fallback"
+        return EmbeddingCache.make_key(text, model, 1536)
     
     def cosine_similarity(self, emb1: List[float], emb2: List[float]) -> float:
         """حساب التشابه"""
@@ -119,4 +124,8 @@ class EmbeddingsGenerator:
     
     def clear_cache(self):
         self.cache.clear()
-        logger.info("Embeddings cache cleared")
\ No newline at end of file
+        logger.info("Embeddings cache cleared")
+    
+    def get_cache_stats(self) -> dict:
+        """إحصائيات الكاش (hits / misses / evictions)"""
+        return self.cache.stats()
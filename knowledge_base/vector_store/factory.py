@@ -0,0 +1,58 @@
+"""
+Vector Store Factory - select a BaseVectorStore backend by name
+"""
+from typing import Any, Dict, Type
+import logging
+
+from core.config import settings
+
+from .base_vector_store import BaseVectorStore
+from .memory_vector_store import MemoryVectorStore
+from .hnsw_vector_store import HNSWVectorStore
+from .ivfpq_vector_store import IVFPQVectorStore
+from .persistent_vector_store import PersistentVectorStore
+from .sharded_vector_store import ShardedVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+VECTOR_STORE_BACKENDS: Dict[str, Type[BaseVectorStore]] = {
+    'memory': MemoryVectorStore,
+    'hnsw': HNSWVectorStore,
+    'ivfpq': IVFPQVectorStore,
+    'persistent': PersistentVectorStore,
+    'sharded': ShardedVectorStore,
+}
+
+
+def create_vector_store(backend: str = 'memory', **params: Any) -> BaseVectorStore:
+    """
+    Create a vector store backend
+
+    Args:
+        backend: Backend name (see VECTOR_STORE_BACKENDS)
+        **params: Backend constructor options (e.g. M, ef_search for hnsw)
+
+    Returns:
+        New vector store instance
+    """
+    store_class = VECTOR_STORE_BACKENDS.get(backend)
+    if store_class is None:
+        raise ValueError(
+            f"Unknown vector store backend '{backend}'. "
+            f"Available: {', '.join(sorted(VECTOR_STORE_BACKENDS))}"
+        )
+
+    logger.info(f"Creating vector store backend: {backend}")
+    # Persistent stores are shared per directory (single WAL writer)
+    constructor = getattr(store_class, 'open', store_class)
+    return constructor(**params)
+
+
+def create_default_vector_store() -> BaseVectorStore:
+    """Vector store configured by settings.vector_store_backend"""
+    if settings.vector_store_backend == 'persistent':
+        return create_vector_store('persistent', path=settings.vector_store_path)
+    if settings.vector_store_backend == 'sharded':
+        return create_vector_store('sharded', n_shards=settings.vector_store_shards)
+    return create_vector_store(settings.vector_store_backend)
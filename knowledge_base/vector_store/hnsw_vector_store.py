@@ -0,0 +1,486 @@
+"""
+HNSW Vector Store - Approximate nearest-neighbour search
+
+Hierarchical Navigable Small World graph (Malkov & Yashunin) in pure
+Python/NumPy. Vectors are L2-normalized on insert so similarity is a dot
+product; deletes are tombstones that stay traversable in the graph, and
+the graph is rebuilt from the live nodes once the tombstone ratio crosses
+compaction_threshold.
+
+Filtered searches whose matching rows are few (per the metadata index)
+score those rows exactly instead of widening the graph beam.
+"""
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from datetime import datetime
+import heapq
+import logging
+import math
+import random
+import time
+import uuid
+
+import numpy as np
+
+from .base_vector_store import BaseVectorStore
+from .metadata_index import DEFAULT_PREFILTER_RATIO, MetadataIndex, choose_filter_strategy
+from .vector_math import normalize_rows, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+class HNSWVectorStore(BaseVectorStore):
+    """HNSW graph index implementing the BaseVectorStore contract"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(
+        self,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: Optional[int] = None,
+        prefilter_ratio: float = DEFAULT_PREFILTER_RATIO,
+        compaction_threshold: float = 0.25
+    ):
+        """
+        Args:
+            M: Max neighbours per node on upper layers (2*M on layer 0)
+            ef_construction: Candidate list size while inserting
+            ef_search: Candidate list size while searching
+            seed: Optional seed for level sampling (kept across clear())
+            prefilter_ratio: Filter selectivity below which matching rows
+                are scored exactly instead of searching the graph
+            compaction_threshold: Tombstone ratio that triggers a rebuild
+        """
+        if M < 2:
+            raise ValueError("M must be at least 2")
+
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1.0 / math.log(M)
+        self.seed = seed
+        self.prefilter_ratio = prefilter_ratio
+        self.compaction_threshold = compaction_threshold
+        self._rng = random.Random(seed)
+
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._links: List[List[List[int]]] = []  # node -> level -> neighbours
+        self._entry_point: Optional[int] = None
+        self._max_level = -1
+        self._deleted: set = set()
+        self._id_to_node: Dict[str, int] = {}
+        self._metadata_index = MetadataIndex()
+
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+        self.recall_report: Dict[int, Dict[str, float]] = {}
+
+        logger.info(
+            f"HNSWVectorStore initialized (M={M}, ef_construction={ef_construction}, ef_search={ef_search})"
+        )
+
+    # ------------------------------------------------------------------
+    # Graph primitives
+    # ------------------------------------------------------------------
+
+    def _ensure_capacity(self, extra: int, dimension: int):
+        """Grow the backing matrix (amortized doubling)"""
+        if self._matrix is None:
+            self._matrix = np.zeros((max(self.INITIAL_CAPACITY, extra), dimension), dtype=np.float32)
+            return
+
+        if dimension != self._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {dimension} does not match store dimension {self._matrix.shape[1]}"
+            )
+
+        capacity = self._matrix.shape[0]
+        needed = self._size + extra
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, dimension), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        level: int
+    ) -> List[Tuple[float, int]]:
+        """
+        Best-first search on one layer
+
+        Returns up to ef (similarity, node) pairs, best first.
+        """
+        visited = set(entry_points)
+        sims = (self._matrix[entry_points] @ query).tolist()
+        candidates = [(-s, n) for s, n in zip(sims, entry_points)]
+        heapq.heapify(candidates)
+        results = [(s, n) for s, n in zip(sims, entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+
+            for sim, n in zip((self._matrix[neighbours] @ query).tolist(), neighbours):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    heapq.heappush(results, (sim, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbour selection heuristic
+
+        Keeps a candidate only if it is closer to the base node than to any
+        already selected neighbour, then tops up with the closest rejects.
+        """
+        if len(candidates) <= m:
+            return [n for _, n in candidates]
+
+        nodes = [n for _, n in candidates]
+        vectors = self._matrix[nodes]
+        pairwise = vectors @ vectors.T
+        # Highest similarity of each candidate to any selected neighbour
+        closest_selected = np.full(len(nodes), -np.inf, dtype=np.float32)
+
+        selected: List[int] = []
+        for i, (sim, node) in enumerate(candidates):
+            if closest_selected[i] > sim:
+                continue
+            selected.append(i)
+            if len(selected) >= m:
+                break
+            np.maximum(closest_selected, pairwise[i], out=closest_selected)
+
+        if len(selected) < m:
+            chosen = set(selected)
+            for i in range(len(nodes)):
+                if i not in chosen:
+                    selected.append(i)
+                    if len(selected) >= m:
+                        break
+
+        return [nodes[i] for i in selected]
+
+    def _insert(self, node: int):
+        """Link a node that is already stored in the matrix"""
+        query = self._matrix[node]
+        level = self._random_level()
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point is None:
+            self._entry_point = node
+            self._max_level = level
+            return
+
+        entry = [self._entry_point]
+        for lc in range(self._max_level, level, -1):
+            entry = [self._search_layer(query, entry, 1, lc)[0][1]]
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(query, entry, self.ef_construction, lc)
+            m_max = self.M0 if lc == 0 else self.M
+            neighbours = self._select_neighbours(candidates, self.M)
+            self._links[node][lc] = neighbours
+
+            for neighbour in neighbours:
+                links = self._links[neighbour][lc]
+                links.append(node)
+                if len(links) > m_max:
+                    sims = self._matrix[links] @ self._matrix[neighbour]
+                    order = np.argsort(-sims)
+                    ranked = [(float(sims[i]), links[i]) for i in order]
+                    self._links[neighbour][lc] = self._select_neighbours(ranked, m_max)
+
+            entry = [n for _, n in candidates]
+
+        if level > self._max_level:
+            self._entry_point = node
+            self._max_level = level
+
+    def _knn(self, query: np.ndarray, top_k: int, ef: int) -> List[Tuple[float, int]]:
+        """Approximate top_k over live nodes"""
+        if self._entry_point is None:
+            return []
+
+        entry = [self._entry_point]
+        for lc in range(self._max_level, 0, -1):
+            entry = [self._search_layer(query, entry, 1, lc)[0][1]]
+
+        candidates = self._search_layer(query, entry, max(ef, top_k), 0)
+        return [(s, n) for s, n in candidates if n not in self._deleted][:top_k]
+
+    def _filtered_knn(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        filter: Optional[Dict[str, Any]]
+    ) -> List[Tuple[float, int]]:
+        """Graph search, post-filtered (tombstones count as filtered out)"""
+        ef = max(self.ef_search, top_k)
+        while True:
+            hits = self._knn(query, self._size if filter else top_k, ef)
+            if filter:
+                hits = [
+                    (s, n) for s, n in hits
+                    if all(self.metadatas[n].get(key) == value for key, value in filter.items())
+                ]
+            # Widen the beam when tombstones or a filter leave too few hits
+            if len(hits) >= top_k or ef >= self._size:
+                return hits
+            ef *= 2
+
+    def _exact(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[float, int]]:
+        """Exact top_k over the given rows (tombstoned ones skipped)"""
+        if self._deleted:
+            rows = rows[~np.isin(rows, np.fromiter(self._deleted, dtype=np.int64))]
+        if rows.size == 0:
+            return []
+        scores = self._matrix[rows] @ query
+        return [(float(scores[j]), int(rows[j])) for j in top_k_indices(scores, top_k)]
+
+    # ------------------------------------------------------------------
+    # BaseVectorStore contract
+    # ------------------------------------------------------------------
+
+    async def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Insert embeddings into the graph incrementally"""
+
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        if not texts:
+            return ids
+
+        block = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        self._ensure_capacity(len(texts), block.shape[1])
+
+        added_at = datetime.utcnow().isoformat()
+        for text, vector, metadata, id_ in zip(texts, block, metadatas, ids):
+            # Re-adding an id replaces the previous node
+            previous = self._id_to_node.get(id_)
+            if previous is not None:
+                self._deleted.add(previous)
+            self._append(text, vector, {**metadata, 'added_at': added_at}, id_)
+
+        logger.info(f"Added {len(texts)} embeddings to HNSW index")
+        self._maybe_compact()
+        return ids
+
+    def _append(self, text: str, vector: np.ndarray, metadata: Dict[str, Any], id_: str):
+        """Store a row and link it into the graph"""
+        node = self._size
+        self._matrix[node] = vector
+        self._size += 1
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+        self.ids.append(id_)
+        self._id_to_node[id_] = node
+        self._metadata_index.add(node, metadata)
+        self._insert(node)
+
+    async def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Approximate cosine search"""
+
+        if self._entry_point is None or len(self._id_to_node) == 0:
+            logger.warning("Vector store is empty")
+            return []
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+
+        rows = self._metadata_index.lookup(filter) if filter else None
+        if rows is not None and choose_filter_strategy(
+            len(rows), len(self._id_to_node), self.prefilter_ratio
+        ) == 'prefilter':
+            # Few rows match: scoring them beats widening the beam towards _size
+            hits = self._exact(query, rows, top_k)
+        else:
+            hits = self._filtered_knn(query, top_k, filter)
+
+        results = [
+            {
+                'id': self.ids[node],
+                'text': self.texts[node],
+                'metadata': self.metadatas[node],
+                'score': float(sim)
+            }
+            for sim, node in hits[:top_k]
+        ]
+
+        logger.info(f"Search returned {len(results)} results")
+        return results
+
+    async def delete(self, ids: List[str]) -> bool:
+        """Tombstone nodes by IDs"""
+        try:
+            deleted = 0
+            for id_ in ids:
+                node = self._id_to_node.pop(id_, None)
+                if node is not None:
+                    self._deleted.add(node)
+                    deleted += 1
+
+            logger.info(f"Deleted {deleted} vectors")
+            self._maybe_compact()
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            return False
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """Fraction of graph nodes that are deleted but not yet compacted"""
+        return len(self._deleted) / self._size if self._size else 0.0
+
+    def _maybe_compact(self):
+        if self._deleted and self.tombstone_ratio > self.compaction_threshold:
+            self.compact()
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Rebuild the graph from the live nodes, dropping tombstones
+
+        Returns:
+            Nodes removed / kept, elapsed seconds and nodes inserted per second
+        """
+        started = time.perf_counter()
+        removed = len(self._deleted)
+
+        if removed:
+            live = sorted(self._id_to_node.values())
+            matrix = self._matrix[live]
+            rows = [(self.texts[n], self.metadatas[n], self.ids[n]) for n in live]
+            self.clear()
+            if rows:
+                self._ensure_capacity(len(rows), matrix.shape[1])
+                for vector, (text, metadata, id_) in zip(matrix, rows):
+                    self._append(text, vector, metadata, id_)
+
+        seconds = time.perf_counter() - started
+        result = {
+            'removed_rows': removed,
+            'remaining_rows': self._size,
+            'seconds': seconds,
+            'rows_per_second': self._size / seconds if seconds > 0 else float(self._size)
+        }
+        logger.info(f"Compacted HNSW graph: {result}")
+        return result
+
+    async def get_ids(self) -> List[str]:
+        """IDs of the live vectors"""
+        return list(self._id_to_node)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get statistics"""
+        return {
+            'total_vectors': len(self._id_to_node),
+            'vector_dimension': self._matrix.shape[1] if self._id_to_node else 0,
+            'storage_type': 'hnsw',
+            'deleted_vectors': len(self._deleted),
+            'max_level': self._max_level,
+            'parameters': {
+                'M': self.M,
+                'ef_construction': self.ef_construction,
+                'ef_search': self.ef_search
+            },
+            'recall': self.recall_report
+        }
+
+    # ------------------------------------------------------------------
+    # Quality reporting
+    # ------------------------------------------------------------------
+
+    def measure_recall(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int = 10,
+        ef_values: Sequence[int] = (16, 32, 64, 128, 256)
+    ) -> Dict[int, Dict[str, float]]:
+        """
+        Measure recall@top_k and latency against exact search
+
+        Args:
+            queries: Sample query vectors
+            top_k: Number of neighbours compared
+            ef_values: ef_search settings to evaluate
+
+        Returns:
+            {ef_search: {'recall', 'p50_ms', 'p95_ms'}} (also kept in get_stats)
+        """
+        if not self._id_to_node or len(queries) == 0:
+            return {}
+
+        live = np.fromiter(self._id_to_node.values(), dtype=np.int64)
+        live_matrix = self._matrix[live]
+        query_matrix = normalize_rows(np.asarray(queries, dtype=np.float32))
+
+        truth = [
+            set(live[top_k_indices(live_matrix @ q, top_k)].tolist())
+            for q in query_matrix
+        ]
+
+        report = {}
+        for ef in ef_values:
+            hits = 0
+            latencies = []
+            for q, expected in zip(query_matrix, truth):
+                start = time.perf_counter()
+                found = self._knn(q, top_k, max(ef, top_k))
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(expected.intersection(n for _, n in found))
+
+            report[ef] = {
+                'recall': hits / max(1, sum(len(t) for t in truth)),
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95))
+            }
+            logger.info(
+                f"HNSW ef_search={ef}: recall@{top_k}={report[ef]['recall']:.3f}, "
+                f"p95={report[ef]['p95_ms']:.2f}ms"
+            )
+
+        self.recall_report = report
+        return report
+
+    def clear(self):
+        """Clear all data"""
+        self.__init__(
+            self.M, self.ef_construction, self.ef_search, self.seed,
+            self.prefilter_ratio, self.compaction_threshold
+        )
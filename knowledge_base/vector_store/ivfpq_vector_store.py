@@ -0,0 +1,498 @@
+"""
+IVF-PQ Vector Store - Compressed approximate search
+
+Inverted file (k-means coarse quantizer) + product quantization of the
+residuals. Each vector is stored as n_subvectors uint8 codes; queries are
+scored with asymmetric distance computation (ADC) lookup tables over the
+nprobe closest lists, optionally re-scored exactly from full vectors.
+The full vectors live in a memory-mapped file (a temporary one unless a
+path is given), so only the codes stay in RAM.
+"""
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from pathlib import Path
+import logging
+import os
+import tempfile
+import uuid
+import weakref
+
+import numpy as np
+
+from .base_vector_store import BaseVectorStore, QueryFilters, group_queries_by_filter
+from .vector_math import normalize_rows, top_k_indices, top_k_indices_batch
+
+logger = logging.getLogger(__name__)
+
+
+def kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int = 20,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Lloyd's k-means with squared L2 distance
+
+    Args:
+        data: (n, d) float32 training matrix
+        k: Number of centroids (capped at n)
+        iterations: Refinement rounds
+        seed: Random seed for initialization
+
+    Returns:
+        (k, d) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignments = nearest_centroid(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=k)
+
+        empty = counts == 0
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+        # Re-seed empty clusters with random points
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()))]
+
+    return centroids.astype(np.float32)
+
+
+def nearest_centroid(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the closest centroid (squared L2) for each row"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        distances = centroid_norms[None, :] - 2.0 * (chunk @ centroids.T)
+        assignments[start:start + chunk_size] = distances.argmin(axis=1)
+    return assignments
+
+
+def _remove_file(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class IVFPQVectorStore(BaseVectorStore):
+    """Inverted-file + product-quantization vector store"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(
+        self,
+        n_lists: int = 256,
+        n_subvectors: int = 16,
+        nprobe: int = 8,
+        train_size: int = 10000,
+        rescore: bool = True,
+        rescore_factor: int = 4,
+        full_vectors_path: Optional[str] = None,
+        seed: int = 0
+    ):
+        """
+        Args:
+            n_lists: Number of coarse k-means centroids (inverted lists)
+            n_subvectors: PQ sub-quantizers per vector (bytes per code)
+            nprobe: Inverted lists scanned per query
+            train_size: Vectors buffered before codebooks are trained
+            rescore: Re-score top candidates with full vectors
+            rescore_factor: Candidates re-scored = top_k * rescore_factor
+            full_vectors_path: File for the memory-mapped full vectors
+                (default: a temporary file removed with the store); an
+                existing file is truncated, since the codes it would back
+                are not persisted. Only used when rescore is enabled
+            seed: Random seed for training
+        """
+        self.n_lists = n_lists
+        self.n_subvectors = n_subvectors
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.full_vectors_path = Path(full_vectors_path) if full_vectors_path else None
+        self.seed = seed
+
+        self.dimension = 0
+        self._sub_dim = 0
+        self.centroids: Optional[np.ndarray] = None   # (n_lists, d)
+        self.codebooks: Optional[np.ndarray] = None   # (m, 256, sub_dim)
+
+        self._size = 0
+        self._codes: Optional[np.ndarray] = None      # (capacity, m) uint8
+        self._assignments: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self._pending: List[np.ndarray] = []          # vectors seen before training
+        self._full_map: Optional[np.memmap] = None
+        self._deleted = np.zeros(0, dtype=bool)       # grown geometrically; rows < _size used
+        self._id_to_row: Dict[str, int] = {}
+
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+
+        if rescore:
+            if self.full_vectors_path is None:
+                fd, name = tempfile.mkstemp(prefix='ivfpq-', suffix='.f32')
+                os.close(fd)
+                self.full_vectors_path = Path(name)
+                weakref.finalize(self, _remove_file, self.full_vectors_path)
+            else:
+                # Rows from a previous run have no codes here: start empty
+                self.full_vectors_path.parent.mkdir(parents=True, exist_ok=True)
+                self.full_vectors_path.write_bytes(b'')
+
+        logger.info(
+            f"IVFPQVectorStore initialized (n_lists={n_lists}, n_subvectors={n_subvectors}, nprobe={nprobe})"
+        )
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    # ------------------------------------------------------------------
+    # Training and encoding
+    # ------------------------------------------------------------------
+
+    def _pad(self, vectors: np.ndarray) -> np.ndarray:
+        """Zero-pad vectors so the dimension splits into n_subvectors"""
+        padded = self._sub_dim * self.n_subvectors
+        if vectors.shape[1] == padded:
+            return vectors
+        out = np.zeros((vectors.shape[0], padded), dtype=np.float32)
+        out[:, :vectors.shape[1]] = vectors
+        return out
+
+    def train(self, sample: Optional[np.ndarray] = None, iterations: int = 20):
+        """
+        Train coarse centroids and PQ codebooks, then encode buffered vectors
+
+        Args:
+            sample: Optional training matrix (defaults to buffered vectors)
+            iterations: k-means rounds
+        """
+        if sample is None:
+            if not self._pending:
+                raise ValueError("No vectors available to train IVF-PQ index")
+            sample = np.vstack(self._pending)
+        sample = normalize_rows(np.asarray(sample, dtype=np.float32))
+        if self.dimension == 0:
+            self.dimension = sample.shape[1]
+            self._sub_dim = -(-self.dimension // self.n_subvectors)
+
+        rng = np.random.default_rng(self.seed)
+        if len(sample) > self.train_size:
+            sample = sample[rng.choice(len(sample), self.train_size, replace=False)]
+
+        self.centroids = kmeans(sample, self.n_lists, iterations, self.seed)
+        residuals = self._pad(sample - self.centroids[nearest_centroid(sample, self.centroids)])
+        self.codebooks = np.stack([
+            self._pad_codebook(kmeans(
+                residuals[:, j * self._sub_dim:(j + 1) * self._sub_dim], 256, iterations, self.seed + j
+            ))
+            for j in range(self.n_subvectors)
+        ])
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._list_arrays = {}
+
+        pending = np.vstack(self._pending) if self._pending else np.zeros((0, self.dimension), np.float32)
+        self._pending = []
+        self._codes = np.zeros((max(self.INITIAL_CAPACITY, self._size), self.n_subvectors), dtype=np.uint8)
+        self._assignments = np.zeros(self._codes.shape[0], dtype=np.int64)
+        self._encode_rows(0, pending)
+
+        logger.info(f"Trained IVF-PQ index on {len(sample)} vectors ({len(self.centroids)} lists)")
+
+    @staticmethod
+    def _pad_codebook(codebook: np.ndarray) -> np.ndarray:
+        """
+        Codebooks always have 256 entries
+
+        Small training sets yield fewer centroids; the padding repeats the
+        first codeword, which argmin never prefers over the original.
+        """
+        if len(codebook) == 256:
+            return codebook
+        out = np.repeat(codebook[:1], 256, axis=0)
+        out[:len(codebook)] = codebook
+        return out
+
+    def _encode(self, vectors: np.ndarray):
+        """Coarse assignment and PQ codes for normalized vectors"""
+        assignments = nearest_centroid(vectors, self.centroids)
+        residuals = self._pad(vectors - self.centroids[assignments])
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for j in range(self.n_subvectors):
+            sub = residuals[:, j * self._sub_dim:(j + 1) * self._sub_dim]
+            codes[:, j] = nearest_centroid(sub, self.codebooks[j])
+        return assignments, codes
+
+    def _encode_rows(self, start: int, vectors: np.ndarray):
+        """Encode vectors for rows [start, start + len(vectors))"""
+        if len(vectors) == 0:
+            return
+        end = start + len(vectors)
+        if end > self._codes.shape[0]:
+            capacity = self._codes.shape[0]
+            while capacity < end:
+                capacity *= 2
+            codes = np.zeros((capacity, self.n_subvectors), dtype=np.uint8)
+            codes[:self._codes.shape[0]] = self._codes
+            assignments = np.zeros(capacity, dtype=np.int64)
+            assignments[:self._assignments.shape[0]] = self._assignments
+            self._codes, self._assignments = codes, assignments
+
+        assignments, codes = self._encode(vectors)
+        self._codes[start:end] = codes
+        self._assignments[start:end] = assignments
+        for row, list_id in zip(range(start, end), assignments.tolist()):
+            self._lists[list_id].append(row)
+            self._list_arrays.pop(list_id, None)
+
+    # ------------------------------------------------------------------
+    # Full vectors (for re-scoring)
+    # ------------------------------------------------------------------
+
+    def _append_full(self, vectors: np.ndarray):
+        if not self.rescore:
+            return
+        with open(self.full_vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._full_map = None
+
+    def _full_vectors(self) -> Optional[np.ndarray]:
+        if not self.rescore or self._size == 0:
+            return None
+        if self._full_map is None:
+            self._full_map = np.memmap(
+                self.full_vectors_path, dtype=np.float32, mode='r',
+                shape=(self._size, self.dimension)
+            )
+        return self._full_map
+
+    def _grow_deleted(self, needed: int):
+        """Grow the tombstone flags geometrically (amortized O(1) per row)"""
+        if needed <= len(self._deleted):
+            return
+        capacity = max(len(self._deleted), self.INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros(capacity, dtype=bool)
+        grown[:len(self._deleted)] = self._deleted
+        self._deleted = grown
+
+    # ------------------------------------------------------------------
+    # BaseVectorStore contract
+    # ------------------------------------------------------------------
+
+    async def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Add embeddings (buffered until the index is trained)"""
+
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        if not texts:
+            return ids
+
+        block = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        if self.dimension == 0:
+            self.dimension = block.shape[1]
+            self._sub_dim = -(-self.dimension // self.n_subvectors)
+        elif block.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {block.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        for id_ in ids:
+            previous = self._id_to_row.get(id_)
+            if previous is not None:
+                self._deleted[previous] = True
+
+        start = self._size
+        self._append_full(block)
+        self._size += len(block)
+        self._grow_deleted(self._size)
+
+        added_at = datetime.utcnow().isoformat()
+        for offset, (text, metadata, id_) in enumerate(zip(texts, metadatas, ids)):
+            self.texts.append(text)
+            self.metadatas.append({
+                **metadata,
+                'added_at': added_at
+            })
+            self.ids.append(id_)
+            self._id_to_row[id_] = start + offset
+
+        if self.is_trained:
+            self._encode_rows(start, block)
+        else:
+            self._pending.append(block)
+            if self._size >= self.train_size:
+                self.train()
+
+        logger.info(f"Added {len(texts)} embeddings to IVF-PQ index")
+        return ids
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays.get(list_id)
+        if rows is None:
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = rows
+        return rows
+
+    def _matches(self, row: int, filter: Dict[str, Any]) -> bool:
+        metadata = self.metadatas[row]
+        return all(metadata.get(key) == value for key, value in filter.items())
+
+    async def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """ADC search over the nprobe closest inverted lists"""
+        results = (await self.search_many([query_embedding], top_k, filter))[0]
+        logger.info(f"Search returned {len(results)} results")
+        return results
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: QueryFilters = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Batched ADC search
+
+        Coarse scores and ADC lookup tables for the whole batch come from
+        one matrix product each; the inverted-list scans stay per query.
+        """
+        if not query_embeddings:
+            return []
+        if not self._id_to_row:
+            logger.warning("Vector store is empty")
+            return [[] for _ in query_embeddings]
+
+        queries = normalize_rows(
+            np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        )
+        per_query_filter: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        for filter, positions in group_queries_by_filter(len(queries), filters):
+            for position in positions:
+                per_query_filter[position] = filter
+
+        if not self.is_trained:
+            # Exact scan of the (small) untrained buffer
+            rows = np.arange(self._size)
+            all_scores = queries @ np.vstack(self._pending).T
+            return [
+                self._rank(query, rows, scores, top_k, filter, None)
+                for query, scores, filter in zip(queries, all_scores, per_query_filter)
+            ]
+
+        coarse = queries @ self.centroids.T
+        probes = top_k_indices_batch(coarse, self.nprobe)
+
+        # ADC lookup tables: every query sub-vector · every codeword
+        query_sub = self._pad(queries).reshape(len(queries), self.n_subvectors, self._sub_dim)
+        luts = np.einsum('mkd,qmd->qmk', self.codebooks, query_sub)
+        full = self._full_vectors()
+
+        results = []
+        for i, query in enumerate(queries):
+            rows = np.concatenate([self._list_rows(int(p)) for p in probes[i]])
+            scores = coarse[i][self._assignments[rows]] + luts[i][
+                np.arange(self.n_subvectors)[None, :], self._codes[rows]
+            ].sum(axis=1)
+            results.append(self._rank(query, rows, scores, top_k, per_query_filter[i], full))
+        return results
+
+    def _rank(
+        self,
+        query: np.ndarray,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        full: Optional[np.ndarray]
+    ) -> List[Dict[str, Any]]:
+        """Drop deleted / filtered rows, re-score with full vectors and take top k"""
+        keep = ~self._deleted[rows]
+        if filter:
+            keep &= np.fromiter((self._matches(int(r), filter) for r in rows), dtype=bool, count=len(rows))
+        rows, scores = rows[keep], scores[keep]
+
+        if full is not None and len(rows):
+            candidates = top_k_indices(scores, top_k * self.rescore_factor)
+            rows = rows[candidates]
+            order = np.argsort(rows)
+            exact = np.empty(len(rows), dtype=np.float32)
+            exact[order] = full[rows[order]] @ query
+            scores = exact
+
+        return [
+            {
+                'id': self.ids[int(rows[j])],
+                'text': self.texts[int(rows[j])],
+                'metadata': self.metadatas[int(rows[j])],
+                'score': float(scores[j])
+            }
+            for j in top_k_indices(scores, top_k)
+        ]
+
+    async def delete(self, ids: List[str]) -> bool:
+        """Tombstone rows by IDs"""
+        try:
+            deleted = 0
+            for id_ in ids:
+                row = self._id_to_row.pop(id_, None)
+                if row is not None:
+                    self._deleted[row] = True
+                    deleted += 1
+
+            logger.info(f"Deleted {deleted} vectors")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            return False
+
+    async def get_ids(self) -> List[str]:
+        """IDs of the live vectors"""
+        return list(self._id_to_row)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get statistics"""
+        code_bytes = self._size * (self.n_subvectors + 8) if self.is_trained else 0
+        full_bytes = self._size * self.dimension * 4 if self.rescore else 0
+        return {
+            'total_vectors': len(self._id_to_row),
+            'vector_dimension': self.dimension if self._id_to_row else 0,
+            'storage_type': 'ivfpq',
+            'trained': self.is_trained,
+            'deleted_vectors': int(self._deleted.sum()),
+            'parameters': {
+                'n_lists': self.n_lists,
+                'n_subvectors': self.n_subvectors,
+                'nprobe': self.nprobe,
+                'rescore': self.rescore
+            },
+            'code_bytes_per_vector': self.n_subvectors,
+            'index_memory_bytes': code_bytes,
+            'full_vectors_bytes': full_bytes,
+            'full_vectors_on_disk': bool(self.full_vectors_path)
+        }
@@ -0,0 +1,139 @@
+"""
+Keyword Index - incremental inverted index with Okapi BM25 scoring
+
+Each term maps to its postings (doc_id -> term frequency); document
+lengths are kept for length normalization. Adding or deleting a document
+touches only its own terms, and a query only walks the postings of its
+terms, so keyword search cost follows the postings touched rather than
+the corpus size. Updates and scoring are serialized by a lock, so queries
+may be scored in worker threads while documents are being indexed.
+"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import threading
+
+from utilities.text_analyzer import analyze
+
+
+class KeywordIndex:
+    """Inverted index (term -> {doc_id: tf}) scored with Okapi BM25"""
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        analyzer: Callable[[str], List[str]] = analyze
+    ):
+        """
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization (0 = none, 1 = full)
+            analyzer: Text -> terms, used for documents and queries alike
+        """
+        self.k1 = k1
+        self.b = b
+        self.analyzer = analyzer
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: str, text: str):
+        """Index a document (replacing an earlier version)"""
+        self.add_terms(doc_id, self.analyzer(text))
+
+    def add_terms(self, doc_id: str, terms: Iterable[str]):
+        """Index a document from terms analyzed at ingest (same analyzer as queries)"""
+        frequencies = Counter(terms)
+        length = sum(frequencies.values())
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in frequencies.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._lengths[doc_id] = length
+            self._terms[doc_id] = tuple(frequencies)
+            self._total_length += length
+
+    def remove(self, doc_id: str) -> bool:
+        """Drop a document's postings"""
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> bool:
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        for term in terms:
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        return True
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)"""
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self._lengths) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every document containing at least one query term"""
+        terms = set(self.analyzer(query))
+        k1, b = self.k1, self.b
+
+        scores: Dict[str, float] = {}
+        with self._lock:
+            if not self._lengths:
+                return {}
+            avg_length = self._total_length / len(self._lengths) or 1.0
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = self.idf(term)
+                for doc_id, tf in posting.items():
+                    norm = k1 * (1 - b + b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        accept: Optional[Callable[[str], bool]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k documents by BM25
+
+        Args:
+            query: Query text
+            top_k: Number of results
+            accept: Optional predicate on doc_id (e.g. a metadata filter)
+
+        Returns:
+            (doc_id, score) pairs, best first
+        """
+        scores = self.scores(query)
+        if accept is not None:
+            candidates = ((doc_id, score) for doc_id, score in scores.items() if accept(doc_id))
+        else:
+            candidates = scores.items()
+        return heapq.nlargest(top_k, candidates, key=lambda item: item[1])
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'documents': len(self._lengths),
+                'terms': len(self._postings),
+                'postings': sum(len(posting) for posting in self._postings.values()),
+                'avg_length': self._total_length / len(self._lengths) if self._lengths else 0.0
+            }
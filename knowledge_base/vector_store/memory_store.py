@@ -4,23 +4,47 @@
 في الإنتاج، استخدم Azure AI Search
 """
 
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass, field
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+from array import array
 from datetime import datetime
-import json
+import asyncio
 
+import numpy as np
+
+from knowledge_base.vector_store.metadata_index import (
+    DEFAULT_PREFILTER_RATIO,
+    MetadataIndex,
+    choose_filter_strategy,
+)
+from knowledge_base.vector_store.keyword_index import KeywordIndex
+from knowledge_base.vector_store.quantization import QuantizedMatrix
+from knowledge_base.vector_store.vector_math import normalize_rows, top_k_indices
 from utilities.logger import logger
 
 
-@dataclass
 class VectorDocument:
-    """مستند مع vector embedding"""
-    id: str
-    content: str
-    embedding: List[float]
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
-    
+    """مستند مع vector embedding (عرض خفيف يُنشأ للنتائج فقط)"""
+
+    __slots__ = ("id", "content", "embedding", "metadata", "created_at")
+
+    def __init__(
+        self,
+        id: str,
+        content: str,
+        embedding: Optional[List[float]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        created_at: Optional[str] = None
+    ):
+        self.id = id
+        self.content = content
+        self.embedding = embedding if embedding is not None else []
+        self.metadata = metadata if metadata is not None else {}
+        self.created_at = created_at or datetime.now().isoformat()
+
+    def __repr__(self) -> str:
+        return f"VectorDocument(id={self.id!r}, content={self.content[:30]!r})"
+
     def to_dict(self) -> Dict:
         """تحويل إلى قاموس"""
         return {
@@ -32,66 +56,250 @@ class VectorDocument:
         }
 
 
+class _ColumnarIndex:
+    """
+    أعمدة فهرس واحد
+
+    مصفوفة vectors مكممة، قائمة معرفات (None = محذوف)، ومخزن محتوى UTF-8
+    واحد مع جدول إزاحات بدل كائن لكل مستند، وفهرس كلمات مقلوب (BM25)
+    يُحدَّث مع كل إضافة وحذف
+    """
+
+    __slots__ = (
+        "matrix", "ids", "rows", "content", "offsets",
+        "metadatas", "created_at", "metadata_index", "keywords"
+    )
+
+    def __init__(self, precision: str, rescore: bool):
+        self.matrix = QuantizedMatrix(precision, keep_originals=rescore)
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.content = bytearray()
+        self.offsets = array("q", [0])
+        self.metadatas: List[Dict[str, Any]] = []
+        self.created_at: List[str] = []
+        self.metadata_index = MetadataIndex()
+        self.keywords = KeywordIndex()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(
+        self,
+        doc_id: str,
+        content: str,
+        vector: np.ndarray,
+        metadata: Dict[str, Any],
+        tokens: Optional[List[str]] = None
+    ) -> int:
+        """إضافة صف (يستبدل الصف السابق لنفس المعرف)"""
+        self.remove(doc_id)
+        row = self.matrix.append(vector)
+        self.ids.append(doc_id)
+        self.rows[doc_id] = row
+        self.content += content.encode("utf-8")
+        self.offsets.append(len(self.content))
+        self.metadatas.append(metadata)
+        self.created_at.append(datetime.now().isoformat())
+        self.metadata_index.add(row, metadata)
+        if tokens is None:
+            self.keywords.add(doc_id, content)
+        else:
+            self.keywords.add_terms(doc_id, tokens)
+        return row
+
+    def text(self, row: int) -> str:
+        """فك محتوى صف واحد من المخزن"""
+        return self.content[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def document(self, row: int, with_embedding: bool = False) -> VectorDocument:
+        """إنشاء عرض VectorDocument لصف واحد"""
+        embedding = self.matrix.decode(np.array([row]))[0].tolist() if with_embedding else None
+        return VectorDocument(
+            id=self.ids[row],
+            content=self.text(row),
+            embedding=embedding,
+            metadata=self.metadatas[row],
+            created_at=self.created_at[row]
+        )
+
+    def remove(self, doc_id: str) -> bool:
+        """تعليم صف كمحذوف وضغط الأعمدة عند تراكم المحذوفات"""
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+
+        self.ids[row] = None
+        self.keywords.remove(doc_id)
+        if len(self.ids) - len(self.rows) > len(self.rows):
+            self.compact()
+        return True
+
+    def compact(self):
+        """إعادة كتابة الأعمدة بدون الصفوف المحذوفة"""
+        keep = np.array([doc_id is not None for doc_id in self.ids], dtype=bool)
+        kept_rows = np.flatnonzero(keep).tolist()
+
+        self.matrix.compact(keep)
+        self.metadata_index.remove_rows(np.flatnonzero(~keep))
+
+        content = bytearray()
+        offsets = array("q", [0])
+        for row in kept_rows:
+            content += self.content[self.offsets[row]:self.offsets[row + 1]]
+            offsets.append(len(content))
+        self.content, self.offsets = content, offsets
+
+        self.ids = [self.ids[row] for row in kept_rows]
+        self.metadatas = [self.metadatas[row] for row in kept_rows]
+        self.created_at = [self.created_at[row] for row in kept_rows]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def memory_bytes(self) -> int:
+        """حجم الأعمدة الرقمية والمحتوى"""
+        vectors = self.matrix.stats()["memory_bytes"] if self.matrix.size else 0
+        return vectors + len(self.content) + self.offsets.itemsize * len(self.offsets)
+
+
+class _IndexView(Mapping):
+    """عرض dict (doc_id -> VectorDocument) لفهرس عمودي ينشئ المستندات عند الطلب"""
+
+    __slots__ = ("_index",)
+
+    def __init__(self, index: _ColumnarIndex):
+        self._index = index
+
+    def __getitem__(self, doc_id: str) -> VectorDocument:
+        return self._index.document(self._index.rows[doc_id])
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._index.rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index.rows))
+
+    def __len__(self) -> int:
+        return len(self._index.rows)
+
+
+class _DocumentsView(Mapping):
+    """عرض كل المستندات عبر الفهارس (doc_id -> VectorDocument)"""
+
+    __slots__ = ("_indexes",)
+
+    def __init__(self, indexes: Dict[str, _ColumnarIndex]):
+        self._indexes = indexes
+
+    def __getitem__(self, doc_id: str) -> VectorDocument:
+        for index in self._indexes.values():
+            if doc_id in index.rows:
+                return index.document(index.rows[doc_id])
+        raise KeyError(doc_id)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return any(doc_id in index.rows for index in self._indexes.values())
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for index in self._indexes.values():
+            for doc_id in list(index.rows):
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    yield doc_id
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
 class MemoryVectorStore:
-    """مخزن vectors في الذاكرة"""
-    
-    def __init__(self):
-        """تهيئة المخزن"""
-        self.documents: Dict[str, VectorDocument] = {}
-        self.indexes: Dict[str, Dict[str, VectorDocument]] = {
-            "general": {},
-            "financial": {},
-            "research": {}
+    """
+    مخزن vectors في الذاكرة
+
+    كل فهرس مخزن كأعمدة: مصفوفة embeddings مكممة (float32 / float16 / int8)،
+    معرفات، ومخزن محتوى بإزاحات. كائنات VectorDocument تُنشأ فقط للنتائج
+    المُرجعة أو عند القراءة عبر indexes / documents
+    """
+
+    def __init__(
+        self,
+        precision: str = "float32",
+        rescore: bool = False,
+        rescore_factor: int = 4,
+        prefilter_ratio: float = DEFAULT_PREFILTER_RATIO
+    ):
+        """
+        تهيئة المخزن
+
+        Args:
+            precision: دقة التخزين (float32, float16, int8)
+            rescore: الاحتفاظ بنسخة float32 لإعادة تقييم أفضل المرشحين
+            rescore_factor: عدد المرشحين المعاد تقييمهم = top_k * rescore_factor
+            prefilter_ratio: نسبة الصفوف المطابقة للفلتر التي يُفضّل دونها
+                حساب التشابه للصفوف المطابقة فقط بدل المصفوفة كاملة
+        """
+        self.precision = precision
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.prefilter_ratio = prefilter_ratio
+
+        # أعمدة لكل فهرس
+        self._indexes: Dict[str, _ColumnarIndex] = {
+            name: _ColumnarIndex(precision, rescore)
+            for name in ("general", "financial", "research")
         }
-        
-        logger.info("Initialized MemoryVectorStore")
-    
+
+        logger.info(f"Initialized MemoryVectorStore (precision={precision})")
+
+    @property
+    def indexes(self) -> Dict[str, _IndexView]:
+        """الفهارس كعروض dict (doc_id -> VectorDocument) للقراءة"""
+        return {name: _IndexView(index) for name, index in self._indexes.items()}
+
+    @property
+    def documents(self) -> _DocumentsView:
+        """كل المستندات عبر الفهارس للقراءة"""
+        return _DocumentsView(self._indexes)
+
+    def _index(self, index_name: str) -> _ColumnarIndex:
+        """أعمدة الفهرس (تُنشأ عند الحاجة)"""
+        if index_name not in self._indexes:
+            self._indexes[index_name] = _ColumnarIndex(self.precision, self.rescore)
+        return self._indexes[index_name]
+
     async def add_document(
         self,
         doc_id: str,
         content: str,
         embedding: List[float],
         metadata: Optional[Dict] = None,
-        index_name: str = "general"
+        index_name: str = "general",
+        tokens: Optional[List[str]] = None
     ) -> bool:
         """
         إضافة مستند
-        
+
         Args:
             doc_id: معرف المستند
             content: المحتوى
             embedding: Vector embedding
             metadata: بيانات وصفية
             index_name: اسم الفهرس
-            
+            tokens: الكلمات المحللة مسبقاً عند الإدخال (يُحلل المحتوى إن لم تُعطَ)
+
         Returns:
             bool: نجح أم لا
         """
         try:
-            # إنشاء المستند
-            doc = VectorDocument(
-                id=doc_id,
-                content=content,
-                embedding=embedding,
-                metadata=metadata or {}
-            )
-            
-            # حفظ في المخزن الرئيسي
-            self.documents[doc_id] = doc
-            
-            # حفظ في الفهرس المحدد
-            if index_name not in self.indexes:
-                self.indexes[index_name] = {}
-            
-            self.indexes[index_name][doc_id] = doc
-            
+            vector = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+            self._index(index_name).append(doc_id, content, vector, metadata or {}, tokens)
+
             logger.debug(f"Added document {doc_id} to {index_name}")
             return True
-        
+
         except Exception as e:
             logger.error(f"Failed to add document: {e}")
             return False
-    
+
     async def add_documents_batch(
         self,
         documents: List[Dict],
@@ -99,11 +307,12 @@ class MemoryVectorStore:
     ) -> int:
         """
         إضافة مجموعة مستندات
-        
+
         Args:
-            documents: قائمة مستندات (كل واحد dict بـ id, content, embedding, metadata)
+            documents: قائمة مستندات (كل واحد dict بـ id, content, embedding, metadata
+                و tokens اختيارياً)
             index_name: اسم الفهرس
-            
+
         Returns:
             int: عدد المستندات المضافة
         """
@@ -114,14 +323,15 @@ class MemoryVectorStore:
                 content=doc["content"],
                 embedding=doc["embedding"],
                 metadata=doc.get("metadata"),
-                index_name=index_name
+                index_name=index_name,
+                tokens=doc.get("tokens")
             )
             if success:
                 count += 1
-        
+
         logger.info(f"Added {count}/{len(documents)} documents to {index_name}")
         return count
-    
+
     async def search(
         self,
         query_embedding: List[float],
@@ -131,112 +341,223 @@ class MemoryVectorStore:
     ) -> List[Dict]:
         """
         البحث عن مستندات مشابهة
-        
+
         Args:
             query_embedding: Embedding الاستعلام
             top_k: عدد النتائج
             index_name: الفهرس
             filters: فلاتر إضافية
-            
+
         Returns:
             List[Dict]: المستندات المطابقة
         """
+        results = (await self.search_many([query_embedding], top_k, index_name, filters))[0]
+        logger.debug(f"Search returned {len(results)} results from {index_name}")
+        return results
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        index_name: str = "general",
+        filters: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        البحث لمجموعة استعلامات بضرب مصفوفتين واحد
+
+        Args:
+            query_embeddings: Embeddings الاستعلامات
+            top_k: عدد النتائج لكل استعلام
+            index_name: الفهرس
+            filters: فلاتر مشتركة لكل الاستعلامات
+
+        Returns:
+            List[List[Dict]]: نتائج كل استعلام بنفس الترتيب
+        """
         # الحصول على الفهرس
-        index = self.indexes.get(index_name, {})
-        
+        index = self._indexes.get(index_name)
+
         if not index:
             logger.warning(f"Index {index_name} is empty")
+            return [[] for _ in query_embeddings]
+
+        matrix = index.matrix
+
+        # الصفوف المرشحة (بعد الفلاتر)
+        if filters:
+            rows = self._filter_rows(index, filters)
+        else:
+            rows = np.fromiter(index.rows.values(), dtype=np.int64, count=len(index.rows))
+
+        if rows.size == 0 or not query_embeddings:
+            return [[] for _ in query_embeddings]
+
+        # حساب التشابه دفعة واحدة على القيم المكممة
+        queries = normalize_rows(
+            np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        )
+        if choose_filter_strategy(rows.size, matrix.size, self.prefilter_ratio) == "prefilter":
+            # فلتر انتقائي: حساب التشابه للصفوف المطابقة فقط
+            scores = matrix.scores_many(queries, rows)
+        else:
+            # فلتر واسع: مسح متصل للمصفوفة كاملة ثم اختيار الصفوف المطابقة
+            scores = matrix.scores_many(queries)[:, rows]
+
+        all_results = []
+        for query, query_scores in zip(queries, scores):
+            query_rows = rows
+
+            # إعادة التقييم بدقة float32 لأفضل المرشحين
+            if matrix.keep_originals:
+                query_rows = rows[top_k_indices(query_scores, top_k * self.rescore_factor)]
+                query_scores = matrix.exact_scores(query, query_rows)
+
+            # المحتوى يُفك فقط للنتائج المُرجعة
+            results = []
+            for j in top_k_indices(query_scores, top_k):
+                row = int(query_rows[j])
+                results.append({
+                    "id": index.ids[row],
+                    "content": index.text(row),
+                    "metadata": index.metadatas[row],
+                    "score": float(query_scores[j]),
+                    "created_at": index.created_at[row]
+                })
+            all_results.append(results)
+
+        return all_results
+
+    async def keyword_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        index_name: str = "general",
+        filters: Optional[Dict] = None,
+        executor: Optional[Executor] = None
+    ) -> List[Dict]:
+        """
+        البحث بالكلمات المفتاحية (BM25) من الفهرس المقلوب
+
+        التكلفة تتناسب مع قوائم المصطلحات التي يلمسها الاستعلام وليس مع
+        حجم الفهرس؛ الفلاتر تُطبّق على المرشحين فقط
+
+        Args:
+            executor: thread pool لحساب الدرجات خارج الـ event loop
+                (None = في نفس الـ thread)
+
+        Returns:
+            List[Dict]: المستندات المطابقة مع درجة BM25 في score
+        """
+        index = self._indexes.get(index_name)
+        if not index:
             return []
-        
-        # حساب التشابه لكل مستند
-        similarities = []
-        
-        for doc_id, doc in index.items():
-            # تطبيق الفلاتر
-            if filters:
-                if not self._apply_filters(doc, filters):
-                    continue
-            
-            # حساب التشابه
-            similarity = self._cosine_similarity(query_embedding, doc.embedding)
-            
-            similarities.append({
-                "id": doc.id,
-                "content": doc.content,
-                "metadata": doc.metadata,
-                "score": similarity,
-                "created_at": doc.created_at
+
+        accept = None
+        if filters:
+            def accept(doc_id: str) -> bool:
+                row = index.rows.get(doc_id)
+                return row is not None and self._matches(index.metadatas[row], filters)
+
+        if executor is None:
+            hits = index.keywords.search(query, top_k, accept)
+        else:
+            hits = await asyncio.get_running_loop().run_in_executor(
+                executor, index.keywords.search, query, top_k, accept
+            )
+
+        results = []
+        for doc_id, score in hits:
+            # قد يُحذف المستند أثناء حساب الدرجات في thread آخر
+            row = index.rows.get(doc_id)
+            if row is None:
+                continue
+            results.append({
+                "id": doc_id,
+                "content": index.text(row),
+                "metadata": index.metadatas[row],
+                "score": score,
+                "created_at": index.created_at[row]
             })
-        
-        # ترتيب حسب الدرجة
-        similarities.sort(key=lambda x: x["score"], reverse=True)
-        
-        # إرجاع أفضل k
-        results = similarities[:top_k]
-        
-        logger.debug(f"Search returned {len(results)} results from {index_name}")
         return results
-    
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """حساب التشابه"""
-        import math
-        
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = math.sqrt(sum(a * a for a in vec1))
-        norm2 = math.sqrt(sum(b * b for b in vec2))
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
-    
-    def _apply_filters(self, doc: VectorDocument, filters: Dict) -> bool:
-        """تطبيق الفلاتر"""
+
+    def _filter_rows(self, index: _ColumnarIndex, filters: Dict) -> np.ndarray:
+        """الصفوف الحية المطابقة للفلاتر (من الفهرس المقلوب)"""
+        rows = index.metadata_index.lookup(filters)
+
+        if rows is None:
+            # قيم غير مفهرسة (None أو قوائم): فحص البيانات الوصفية صفاً صفاً
+            candidates = [
+                row for row in index.rows.values()
+                if self._matches(index.metadatas[row], filters)
+            ]
+            return np.asarray(sorted(candidates), dtype=np.int64)
+
+        # استبعاد الصفوف المحذوفة التي لم تُضغط بعد
+        alive = np.fromiter((index.ids[row] is not None for row in rows), dtype=bool, count=rows.size)
+        return rows[alive]
+
+    @staticmethod
+    def _matches(metadata: Dict, filters: Dict) -> bool:
+        """مطابقة بيانات وصفية لكل الفلاتر"""
         for key, value in filters.items():
-            if key not in doc.metadata:
+            if key not in metadata:
                 return False
-            if doc.metadata[key] != value:
+            if metadata[key] != value:
                 return False
         return True
-    
+
+    def _apply_filters(self, doc: VectorDocument, filters: Dict) -> bool:
+        """تطبيق الفلاتر"""
+        return self._matches(doc.metadata, filters)
+
     async def get_document(self, doc_id: str) -> Optional[VectorDocument]:
-        """الحصول على مستند بالمعرف"""
-        return self.documents.get(doc_id)
-    
+        """الحصول على مستند بالمعرف (مع embedding مُعاد بناؤه)"""
+        for index in self._indexes.values():
+            row = index.rows.get(doc_id)
+            if row is not None:
+                return index.document(row, with_embedding=True)
+        return None
+
     async def delete_document(self, doc_id: str) -> bool:
         """حذف مستند"""
-        if doc_id not in self.documents:
-            return False
-        
-        # حذف من المخزن الرئيسي
-        del self.documents[doc_id]
-        
         # حذف من جميع الفهارس
-        for index in self.indexes.values():
-            if doc_id in index:
-                del index[doc_id]
-        
-        logger.debug(f"Deleted document {doc_id}")
-        return True
-    
+        deleted = False
+        for index in self._indexes.values():
+            deleted = index.remove(doc_id) or deleted
+
+        if deleted:
+            logger.debug(f"Deleted document {doc_id}")
+        return deleted
+
     def get_stats(self) -> Dict:
         """إحصائيات المخزن"""
         return {
             "total_documents": len(self.documents),
             "indexes": {
-                name: len(docs)
-                for name, docs in self.indexes.items()
+                name: len(index)
+                for name, index in self._indexes.items()
+            },
+            "vector_storage": {
+                name: index.matrix.stats()
+                for name, index in self._indexes.items()
+                if index.matrix.size
+            },
+            "metadata_indexes": {
+                name: index.metadata_index.stats()
+                for name, index in self._indexes.items()
+            },
+            "keyword_indexes": {
+                name: index.keywords.stats()
+                for name, index in self._indexes.items()
+            },
+            "memory_bytes": {
+                name: index.memory_bytes()
+                for name, index in self._indexes.items()
             }
         }
-    
+
     async def clear_index(self, index_name: str):
         """مسح فهرس"""
-        if index_name in self.indexes:
-            # حذف من المخزن الرئيسي
-            for doc_id in list(self.indexes[index_name].keys()):
-                if doc_id in self.documents:
-                    del self.documents[doc_id]
-            
-            # مسح الفهرس
-            self.indexes[index_name] = {}
-            logger.info(f"Cleared index: {index_name}")
\ No newline at end of file
+        if index_name in self._indexes:
+            self._indexes[index_name] = _ColumnarIndex(self.precision, self.rescore)
+            logger.info(f"Cleared index: {index_name}")
@@ -5,22 +5,80 @@ from typing import List, Dict, Any, Optional
 import numpy as np
 from datetime import datetime
 import logging
+import time
 
-from .base_vector_store import BaseVectorStore
+from .base_vector_store import BaseVectorStore, QueryFilters, group_queries_by_filter
+from .metadata_index import DEFAULT_PREFILTER_RATIO, MetadataIndex, choose_filter_strategy
+from .quantization import QuantizedMatrix
+from .vector_math import normalize_rows, top_k_indices, top_k_indices_batch
 
 logger = logging.getLogger(__name__)
 
 
 class MemoryVectorStore(BaseVectorStore):
-    """In-memory vector store using numpy for similarity search"""
-    
-    def __init__(self):
-        self.vectors: List[np.ndarray] = []
+    """
+    In-memory vector store using numpy for similarity search
+
+    Vectors live in one growable matrix whose rows are L2-normalized at
+    insert time, so cosine similarity is a single matrix-vector product.
+    Rows are stored as float32, float16 or int8 depending on precision.
+    Deletes only set a tombstone bit that search skips; the arrays are
+    rewritten once the tombstone ratio crosses compaction_threshold.
+    """
+
+    def __init__(
+        self,
+        precision: str = 'float32',
+        rescore: bool = False,
+        rescore_factor: int = 4,
+        prefilter_ratio: float = DEFAULT_PREFILTER_RATIO,
+        compaction_threshold: float = 0.25
+    ):
+        """
+        Args:
+            precision: Storage precision ('float32', 'float16', 'int8')
+            rescore: Keep float32 rows and re-score the top candidates
+            rescore_factor: Candidates re-scored = top_k * rescore_factor
+            prefilter_ratio: Filter selectivity below which only matching
+                rows are scored (above it the full matrix is scored and masked)
+            compaction_threshold: Tombstone ratio that triggers compaction
+        """
+        self._vectors = QuantizedMatrix(precision, keep_originals=rescore)
+        self._metadata_index = MetadataIndex()
+        self.rescore_factor = rescore_factor
+        self.prefilter_ratio = prefilter_ratio
+        self.compaction_threshold = compaction_threshold
         self.texts: List[str] = []
         self.metadatas: List[Dict[str, Any]] = []
-        self.ids: List[str] = []
-        logger.info("MemoryVectorStore initialized")
-    
+        # Row -> id (None once tombstoned) and the reverse map for O(1) deletes
+        self.ids: List[Optional[str]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._deleted = np.zeros(QuantizedMatrix.INITIAL_CAPACITY, dtype=bool)
+        self._deleted_count = 0
+        logger.info(f"MemoryVectorStore initialized (precision={precision})")
+
+    @property
+    def precision(self) -> str:
+        return self._vectors.precision
+
+    @property
+    def dimension(self) -> int:
+        """Vector dimension (0 until the first insert)"""
+        return self._vectors.dimension
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """Fraction of stored rows that are deleted but not yet compacted"""
+        return self._deleted_count / self._vectors.size if self._vectors.size else 0.0
+
+    def __len__(self) -> int:
+        return self._vectors.size - self._deleted_count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Active (normalized) rows as float32"""
+        return self._vectors.decode()
+
     async def add_embeddings(
         self,
         texts: List[str],
@@ -29,24 +87,115 @@ class MemoryVectorStore(BaseVectorStore):
         ids: Optional[List[str]] = None
     ) -> List[str]:
         """Add embeddings to memory store"""
-        
+
         if ids is None:
             import uuid
             ids = [str(uuid.uuid4()) for _ in texts]
-        
-        # Convert to numpy arrays
-        for i, (text, embedding, metadata, id_) in enumerate(zip(texts, embeddings, metadatas, ids)):
-            self.vectors.append(np.array(embedding))
-            self.texts.append(text)
-            self.metadatas.append({
-                **metadata,
-                'added_at': datetime.utcnow().isoformat()
-            })
-            self.ids.append(id_)
-        
+
+        if not texts:
+            return ids
+
+        # Normalize once at insert time
+        block = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        added_at = datetime.utcnow().isoformat()
+        self._append_rows(
+            block, texts, [{**metadata, 'added_at': added_at} for metadata in metadatas], ids
+        )
+
         logger.info(f"Added {len(texts)} embeddings to memory store")
         return ids
-    
+
+    def _append_rows(
+        self,
+        block: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ):
+        """Append normalized rows and keep the metadata index in step"""
+        # Re-adding an id replaces the previous row
+        self._delete_ids(ids, compact=False)
+
+        start = self._vectors.append(block)
+        if self._vectors.size > len(self._deleted):
+            grown = np.zeros(max(2 * len(self._deleted), self._vectors.size), dtype=bool)
+            grown[:start] = self._deleted[:start]
+            self._deleted = grown
+
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+        for row, id_ in enumerate(ids, start):
+            self._id_to_row[id_] = row
+        self._metadata_index.add_many(start, metadatas)
+
+    def _delete_ids(self, ids: List[str], compact: bool = True) -> int:
+        """Tombstone rows by id; returns the number of rows deleted"""
+        deleted = 0
+        for id_ in ids:
+            row = self._id_to_row.pop(id_, None)
+            if row is None:
+                continue
+            self._deleted[row] = True
+            self.ids[row] = None
+            deleted += 1
+
+        self._deleted_count += deleted
+        if compact and deleted and self.tombstone_ratio > self.compaction_threshold:
+            self.compact()
+        return deleted
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Rewrite the arrays without tombstoned rows
+
+        Returns:
+            Rows removed / kept, elapsed seconds and rows processed per second
+        """
+        started = time.perf_counter()
+        size = self._vectors.size
+        removed = self._deleted_count
+
+        if removed:
+            keep = ~self._deleted[:size]
+            self._vectors.compact(keep)
+            self._metadata_index.remove_rows(np.flatnonzero(~keep))
+
+            # One pass over each list instead of a del per deleted row
+            self.texts = [text for text, kept in zip(self.texts, keep) if kept]
+            self.metadatas = [metadata for metadata, kept in zip(self.metadatas, keep) if kept]
+            self.ids = [id_ for id_ in self.ids if id_ is not None]
+            self._id_to_row = {id_: row for row, id_ in enumerate(self.ids)}
+            self._deleted[:size] = False
+            self._deleted_count = 0
+
+        seconds = time.perf_counter() - started
+        result = {
+            'removed_rows': removed,
+            'remaining_rows': self._vectors.size,
+            'seconds': seconds,
+            'rows_per_second': size / seconds if seconds > 0 else float(size)
+        }
+        logger.info(f"Compacted vector store: {result}")
+        return result
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Row indices whose metadata matches every filter key"""
+        rows = self._metadata_index.lookup(filter)
+        if rows is None:
+            # None / non-scalar filter values are not indexed
+            rows = np.fromiter(
+                (
+                    i for i, metadata in enumerate(self.metadatas)
+                    if all(metadata.get(key) == value for key, value in filter.items())
+                ),
+                dtype=np.int64
+            )
+
+        if self._deleted_count:
+            rows = rows[~self._deleted[rows]]
+        return rows
+
     async def search(
         self,
         query_embedding: List[float],
@@ -54,83 +203,113 @@ class MemoryVectorStore(BaseVectorStore):
         filter: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """Search using cosine similarity"""
-        
-        if not self.vectors:
+        results = (await self.search_many([query_embedding], top_k, filter))[0]
+        logger.info(f"Search returned {len(results)} results")
+        return results
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: QueryFilters = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Score each filter group of queries with one matrix-matrix product"""
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        if not query_embeddings:
+            return results
+        if len(self) == 0:
             logger.warning("Vector store is empty")
-            return []
-        
-        # Convert query to numpy
-        query_vector = np.array(query_embedding)
-        
-        # Calculate cosine similarities
-        similarities = []
-        for i, vector in enumerate(self.vectors):
-            # Apply filter if provided
+            return results
+
+        # Normalize queries once
+        queries = normalize_rows(
+            np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        )
+
+        for filter, positions in group_queries_by_filter(len(queries), filters):
+            group = queries[positions]
+
             if filter:
-                match = all(
-                    self.metadatas[i].get(key) == value
-                    for key, value in filter.items()
-                )
-                if not match:
+                rows = self._filter_rows(filter)
+                if rows.size == 0:
                     continue
-            
-            # Cosine similarity
-            similarity = np.dot(query_vector, vector) / (
-                np.linalg.norm(query_vector) * np.linalg.norm(vector)
-            )
-            similarities.append((i, float(similarity)))
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Get top k
+                if choose_filter_strategy(rows.size, self._vectors.size, self.prefilter_ratio) == 'prefilter':
+                    # Selective filter: gather and score only matching rows
+                    scores = self._vectors.scores_many(group, rows)
+                else:
+                    # Broad filter: contiguous full scan, then keep matching rows
+                    scores = self._vectors.scores_many(group)[:, rows]
+            elif self._deleted_count:
+                # Skip tombstoned rows
+                rows = np.flatnonzero(~self._deleted[:self._vectors.size])
+                scores = self._vectors.scores_many(group)[:, rows]
+            else:
+                rows = np.arange(self._vectors.size)
+                scores = self._vectors.scores_many(group)
+
+            # Optional float32 pass over the best quantized candidates
+            if self._vectors.keep_originals:
+                candidates = top_k_indices_batch(scores, top_k * self.rescore_factor)
+                for query, position, best in zip(group, positions, candidates):
+                    candidate_rows = rows[best]
+                    exact = self._vectors.exact_scores(query, candidate_rows)
+                    results[position] = self._results(candidate_rows, exact, top_k_indices(exact, top_k))
+                continue
+
+            # Batched partial selection of top k
+            for position, query_scores, best in zip(positions, scores, top_k_indices_batch(scores, top_k)):
+                results[position] = self._results(rows, query_scores, best)
+
+        return results
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray, best: np.ndarray) -> List[Dict[str, Any]]:
         results = []
-        for i, score in similarities[:top_k]:
+        for j in best:
+            i = int(rows[j])
             results.append({
                 'id': self.ids[i],
                 'text': self.texts[i],
                 'metadata': self.metadatas[i],
-                'score': score
+                'score': float(scores[j])
             })
-        
-        logger.info(f"Search returned {len(results)} results")
         return results
-    
+
     async def delete(self, ids: List[str]) -> bool:
         """Delete by IDs"""
         try:
-            indices_to_remove = []
-            for id_ in ids:
-                if id_ in self.ids:
-                    idx = self.ids.index(id_)
-                    indices_to_remove.append(idx)
-            
-            # Remove in reverse order to maintain indices
-            for idx in sorted(indices_to_remove, reverse=True):
-                del self.vectors[idx]
-                del self.texts[idx]
-                del self.metadatas[idx]
-                del self.ids[idx]
-            
-            logger.info(f"Deleted {len(indices_to_remove)} vectors")
+            deleted = self._delete_ids(ids)
+            logger.info(f"Deleted {deleted} vectors")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error deleting vectors: {e}")
             return False
-    
+
+    async def get_ids(self) -> List[str]:
+        """IDs of the live vectors"""
+        return list(self._id_to_row)
+
     async def get_stats(self) -> Dict[str, Any]:
         """Get statistics"""
         return {
-            'total_vectors': len(self.vectors),
-            'vector_dimension': len(self.vectors[0]) if self.vectors else 0,
-            'storage_type': 'memory'
+            'total_vectors': len(self),
+            'vector_dimension': self.dimension if len(self) else 0,
+            'storage_type': 'memory',
+            'deleted_vectors': self._deleted_count,
+            'tombstone_ratio': self.tombstone_ratio,
+            'metadata_index': self._metadata_index.stats(),
+            **self._vectors.stats()
         }
-    
+
     def clear(self):
         """Clear all data"""
-        self.vectors = []
+        self._vectors.clear()
+        self._metadata_index.clear()
         self.texts = []
         self.metadatas = []
         self.ids = []
+        self._id_to_row = {}
+        self._deleted = np.zeros(QuantizedMatrix.INITIAL_CAPACITY, dtype=bool)
+        self._deleted_count = 0
         logger.info("Vector store cleared")
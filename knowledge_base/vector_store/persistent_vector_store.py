@@ -0,0 +1,687 @@
+"""
+Persistent Vector Store - memory-mapped segments + write-ahead log
+
+On-disk layout (one directory per store):
+
+    manifest.json            active segments, tombstones, last sequence
+    wal-000001.log           append-only JSON lines for recent adds/deletes
+    seg-000001/
+        segment.json         row count, dimension
+        vectors.f32          raw (count, dim) float32 matrix, L2-normalized
+        seqs.npy             per-row insert sequence numbers
+        ids.bin / ids.idx    utf-8 id buffer + int64 offset table
+        id_hashes.npy        sorted 64-bit id hashes + their rows (id_rows.npy)
+        texts.bin / texts.idx
+        metadata.bin / metadata.idx   (JSON per row)
+
+Segments are immutable and opened with np.memmap, so restarts only map
+files and replay the (small) WAL, and the OS page cache is shared by every
+process that opens the same directory. Recent writes live in an in-memory
+tail that merge() folds into a new segment in the background.
+Filtered searches answer equality filters from a per-segment MetadataIndex,
+built once the first time the segment is filtered.
+
+Deletes and upserts are tombstones keyed by id: a row is alive when its
+sequence number is >= the id's tombstone sequence.
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from .base_vector_store import BaseVectorStore, QueryFilters, group_queries_by_filter
+from .memory_vector_store import MemoryVectorStore
+from .metadata_index import MetadataIndex
+from .vector_math import normalize_rows, top_k_indices_batch
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # pragma: no cover - Windows
+    HAS_FCNTL = False
+
+logger = logging.getLogger(__name__)
+
+
+def _write_strings(path: Path, values: List[str]):
+    """Write a utf-8 buffer and its (n + 1) int64 offset table"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    path.with_suffix('.bin').write_bytes(b''.join(encoded))
+    with open(path.with_suffix('.idx'), 'wb') as f:
+        np.save(f, offsets)
+
+
+def _hash_ids(ids: List[str]) -> np.ndarray:
+    """Stable 64-bit hashes of ids (the segment id index is keyed by them)"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(id_.encode('utf-8'), digest_size=8).digest(), 'little') for id_ in ids),
+        dtype=np.uint64,
+        count=len(ids)
+    )
+
+
+def _id_index(ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(sorted id hashes, row of each hash)"""
+    hashes = _hash_ids(ids)
+    rows = np.argsort(hashes, kind='stable')
+    return hashes[rows], rows.astype(np.int64)
+
+
+class _StringTable:
+    """Memory-mapped utf-8 buffer + offset table"""
+
+    def __init__(self, path: Path):
+        self.offsets = np.load(path.with_suffix('.idx'), mmap_mode='r')
+        buffer_path = path.with_suffix('.bin')
+        self.buffer = (
+            np.memmap(buffer_path, dtype=np.uint8, mode='r')
+            if buffer_path.stat().st_size else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __getitem__(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.buffer[start:end].tobytes().decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class Segment:
+    """Immutable on-disk segment opened with np.memmap"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        info = json.loads((path / 'segment.json').read_text())
+        self.count = info['count']
+        self.dimension = info['dimension']
+        self.vectors = np.memmap(
+            path / 'vectors.f32', dtype=np.float32, mode='r', shape=(self.count, self.dimension)
+        ) if self.count else np.zeros((0, self.dimension), dtype=np.float32)
+        self.seqs = np.load(path / 'seqs.npy', mmap_mode='r')
+        self.ids = _StringTable(path / 'ids')
+        self.texts = _StringTable(path / 'texts')
+        self.metadata = _StringTable(path / 'metadata')
+        self.id_hashes = np.load(path / 'id_hashes.npy', mmap_mode='r')
+        self.id_rows = np.load(path / 'id_rows.npy', mmap_mode='r')
+        self._metadata_index: Optional[MetadataIndex] = None
+
+    @staticmethod
+    def write(
+        path: Path,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        seqs: np.ndarray
+    ):
+        """Write a segment atomically (temp directory + rename)"""
+        tmp = path.with_name(path.name + '.tmp')
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(tmp / 'vectors.f32')
+        np.save(tmp / 'seqs.npy', np.asarray(seqs, dtype=np.int64))
+        _write_strings(tmp / 'ids', ids)
+        id_hashes, id_rows = _id_index(ids)
+        np.save(tmp / 'id_hashes.npy', id_hashes)
+        np.save(tmp / 'id_rows.npy', id_rows)
+        _write_strings(tmp / 'texts', texts)
+        _write_strings(tmp / 'metadata', [json.dumps(m, ensure_ascii=False, default=str) for m in metadatas])
+        (tmp / 'segment.json').write_text(json.dumps({
+            'count': len(ids),
+            'dimension': int(vectors.shape[1]) if len(ids) else 0,
+            'created_at': datetime.utcnow().isoformat()
+        }))
+
+        for f in tmp.iterdir():
+            with open(f, 'rb') as fh:
+                os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+    def row_metadata(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.metadata[row])
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """Inverted metadata index, built once on the first filtered search"""
+        if self._metadata_index is None:
+            index = MetadataIndex()
+            for row in range(self.count):
+                index.add(row, self.row_metadata(row))
+            self._metadata_index = index
+        return self._metadata_index
+
+    def filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Sorted rows whose metadata matches every filter key"""
+        rows = self.metadata_index.lookup(filter)
+        if rows is None:
+            # None / non-scalar filter values are not indexed
+            rows = np.array([
+                row for row in range(self.count)
+                if all(self.row_metadata(row).get(key) == value for key, value in filter.items())
+            ], dtype=np.int64)
+        return rows
+
+    def rows_for(self, id_: str) -> List[int]:
+        """Rows holding an id (binary search over the stored id hashes)"""
+        key = _hash_ids([id_])[0]
+        start = int(np.searchsorted(self.id_hashes, key, side='left'))
+        end = int(np.searchsorted(self.id_hashes, key, side='right'))
+        return [int(row) for row in self.id_rows[start:end] if self.ids[int(row)] == id_]
+
+    def __contains__(self, id_: str) -> bool:
+        return bool(self.rows_for(id_))
+
+    def alive_mask(self, tombstones: Dict[str, int]) -> np.ndarray:
+        """Rows not superseded by a tombstone"""
+        alive = np.ones(self.count, dtype=bool)
+        if not tombstones or not self.count:
+            return alive
+        ids = list(tombstones)
+        keys = _hash_ids(ids)
+        starts = np.searchsorted(self.id_hashes, keys, side='left')
+        ends = np.searchsorted(self.id_hashes, keys, side='right')
+        # Only tombstones whose hash occurs in this segment are checked row by row
+        for i in np.flatnonzero(ends > starts):
+            id_, seq = ids[i], tombstones[ids[i]]
+            for row in self.id_rows[starts[i]:ends[i]]:
+                row = int(row)
+                if self.seqs[row] < seq and self.ids[row] == id_:
+                    alive[row] = False
+        return alive
+
+
+class PersistentVectorStore(BaseVectorStore):
+    """Memory-mapped segment store with a write-ahead log"""
+
+    _open_stores: Dict[str, 'PersistentVectorStore'] = {}
+
+    def __init__(
+        self,
+        path: str,
+        merge_threshold: int = 10000,
+        fsync: bool = False,
+        read_only: bool = False
+    ):
+        """
+        Args:
+            path: Store directory
+            merge_threshold: WAL rows that trigger a background merge
+            fsync: fsync the WAL after every write batch
+            read_only: Open without taking the writer lock
+        """
+        self.path = Path(path)
+        self.merge_threshold = merge_threshold
+        self.fsync = fsync
+        self.read_only = read_only
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = None
+        if not read_only:
+            self._acquire_writer_lock()
+
+        self.dimension = 0
+        self.segments: List[Segment] = []
+        self._tombstones: Dict[str, int] = {}
+        self._last_seq = 0
+        self._wal_generation = 1
+        self._next_segment = 1
+        self._manifest_mtime = 0.0
+
+        self._tail = MemoryVectorStore()
+        self._tail_seqs: Dict[str, int] = {}
+        self._frozen: Optional[MemoryVectorStore] = None
+        self._frozen_seqs: Dict[str, int] = {}
+        self._alive_cache: Dict[str, np.ndarray] = {}
+        self._merge_lock = asyncio.Lock()
+        self._merge_task: Optional[asyncio.Task] = None
+        self._wal = None
+
+        self._load()
+        logger.info(
+            f"PersistentVectorStore opened at {self.path} "
+            f"({len(self.segments)} segments, {len(self._tail_seqs)} WAL rows)"
+        )
+
+    @classmethod
+    def open(cls, path: str, **params: Any) -> 'PersistentVectorStore':
+        """Shared instance per directory within this process"""
+        key = str(Path(path).resolve())
+        store = cls._open_stores.get(key)
+        if store is None:
+            store = cls(path, **params)
+            cls._open_stores[key] = store
+        return store
+
+    # ------------------------------------------------------------------
+    # Loading / manifest / WAL
+    # ------------------------------------------------------------------
+
+    def _acquire_writer_lock(self):
+        if not HAS_FCNTL:
+            return
+        self._lock_file = open(self.path / 'LOCK', 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            self.read_only = True
+            logger.warning(f"{self.path} is locked by another writer - opening read-only")
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.path / 'manifest.json'
+
+    def _wal_path(self, generation: int) -> Path:
+        return self.path / f'wal-{generation:06d}.log'
+
+    def _load(self):
+        manifest = {}
+        if self._manifest_path.exists():
+            manifest = json.loads(self._manifest_path.read_text())
+            self._manifest_mtime = self._manifest_path.stat().st_mtime
+
+        self.dimension = manifest.get('dimension', 0)
+        self._tombstones = dict(manifest.get('tombstones', {}))
+        self._last_seq = manifest.get('last_seq', 0)
+        self._wal_generation = self._manifest_generation = manifest.get('wal_generation', 1)
+        self._next_segment = manifest.get('next_segment', 1)
+        self.segments = [Segment(self.path / name) for name in manifest.get('segments', [])]
+        self._alive_cache = {}
+
+        if not self.read_only:
+            # Segments written by an interrupted merge are not in the manifest
+            active = set(manifest.get('segments', []))
+            for entry in self.path.glob('seg-*'):
+                if entry.name not in active:
+                    shutil.rmtree(entry, ignore_errors=True)
+
+        self._tail = MemoryVectorStore()
+        self._tail_seqs = {}
+        self._frozen = None
+        self._frozen_seqs = {}
+        for wal in sorted(self.path.glob('wal-*.log')):
+            generation = int(wal.stem.split('-')[1])
+            if generation >= self._wal_generation:
+                self._replay(wal)
+                # Keep appending to the newest log so replay order matches write order
+                self._wal_generation = generation
+
+        if not self.read_only:
+            self._rotate_wal_files()
+
+    def _rotate_wal_files(self):
+        """Keep a single WAL file for the current generation"""
+        current = self._wal_path(self._wal_generation)
+        for wal in self.path.glob('wal-*.log'):
+            if int(wal.stem.split('-')[1]) < self._manifest_generation:
+                wal.unlink()
+        if self._wal:
+            self._wal.close()
+        self._wal = open(current, 'a', encoding='utf-8')
+
+    def _replay(self, wal: Path):
+        with open(wal, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write at the end of the log
+                    logger.warning(f"Skipping corrupt WAL record in {wal.name}")
+                    continue
+                self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]):
+        """Apply one WAL record to the in-memory state"""
+        seq = record['seq']
+        self._last_seq = max(self._last_seq, seq)
+
+        if record['op'] == 'delete':
+            self._tombstone(record['id'], seq)
+            return
+
+        vector = np.frombuffer(base64.b64decode(record['vector']), dtype=np.float32)
+        self.dimension = self.dimension or len(vector)
+        self._tombstone(record['id'], seq)
+        self._tail_add(record['id'], record['text'], record['metadata'], vector, seq)
+
+    def _tombstone(self, id_: str, seq: int):
+        # Only ids that may exist in a segment (or a segment being written) need a tombstone
+        if id_ in self._frozen_seqs or id_ in self._tombstones or any(
+            id_ in segment for segment in self.segments
+        ):
+            self._tombstones[id_] = seq
+            self._alive_cache = {}
+        if id_ in self._tail_seqs:
+            self._tail_seqs.pop(id_)
+            self._sync_delete(self._tail, id_)
+        if id_ in self._frozen_seqs:
+            self._frozen_seqs.pop(id_)
+            self._sync_delete(self._frozen, id_)
+
+    @staticmethod
+    def _sync_delete(store: MemoryVectorStore, id_: str):
+        store._delete_ids([id_])
+
+    def _tail_add(self, id_: str, text: str, metadata: Dict[str, Any], vector: np.ndarray, seq: int):
+        self._tail._append_rows(vector.reshape(1, -1), [text], [metadata], [id_])
+        self._tail_seqs[id_] = seq
+
+    def _write_manifest(self):
+        manifest = {
+            'version': 1,
+            'dimension': self.dimension,
+            'segments': [segment.path.name for segment in self.segments],
+            'tombstones': self._tombstones,
+            'last_seq': self._last_seq,
+            'wal_generation': self._manifest_generation,
+            'next_segment': self._next_segment
+        }
+        tmp = self._manifest_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self._manifest_path)
+        self._manifest_mtime = self._manifest_path.stat().st_mtime
+
+    def _log(self, records: List[Dict[str, Any]]):
+        if self.read_only:
+            raise PermissionError(f"Vector store at {self.path} is open read-only")
+        self._wal.write(''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records))
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+    def refresh(self):
+        """Reload segments if another process merged (read-only instances)"""
+        if self._manifest_path.exists() and self._manifest_path.stat().st_mtime != self._manifest_mtime:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # BaseVectorStore contract
+    # ------------------------------------------------------------------
+
+    async def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Append to the WAL and the in-memory tail"""
+
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        if not texts:
+            return ids
+
+        block = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        if self.dimension and block.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {block.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        added_at = datetime.utcnow().isoformat()
+        records = []
+        for text, vector, metadata, id_ in zip(texts, block, metadatas, ids):
+            self._last_seq += 1
+            records.append({
+                'op': 'add',
+                'seq': self._last_seq,
+                'id': id_,
+                'text': text,
+                'metadata': {**metadata, 'added_at': added_at},
+                'vector': base64.b64encode(vector.tobytes()).decode('ascii')
+            })
+
+        self._log(records)
+        for record in records:
+            self._apply(record)
+
+        logger.info(f"Added {len(texts)} embeddings to persistent store")
+        self._maybe_schedule_merge()
+        return ids
+
+    def _segment_alive(self, segment: Segment) -> np.ndarray:
+        alive = self._alive_cache.get(segment.path.name)
+        if alive is None:
+            alive = segment.alive_mask(self._tombstones)
+            self._alive_cache[segment.path.name] = alive
+        return alive
+
+    async def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search segments and the WAL tail, merging per-source top-k"""
+        results = (await self.search_many([query_embedding], top_k, filter))[0]
+        logger.info(f"Search returned {len(results)} results")
+        return results
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: QueryFilters = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Score each segment once per filter group with a matrix-matrix product"""
+
+        if self.read_only:
+            self.refresh()
+
+        candidates: List[List[Tuple[float, Dict[str, Any]]]] = [[] for _ in query_embeddings]
+        if not query_embeddings:
+            return []
+        queries = normalize_rows(
+            np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        )
+
+        for filter, positions in group_queries_by_filter(len(queries), filters):
+            group = queries[positions]
+
+            for segment in self.segments:
+                if segment.count == 0:
+                    continue
+                alive = self._segment_alive(segment)
+                if filter:
+                    rows = segment.filter_rows(filter)
+                    rows = rows[alive[rows]]
+                else:
+                    rows = np.flatnonzero(alive)
+                if rows.size == 0:
+                    continue
+                vectors = segment.vectors[rows] if rows.size < segment.count else segment.vectors
+                scores = group @ vectors.T
+                for position, query_scores, best in zip(positions, scores, top_k_indices_batch(scores, top_k)):
+                    for j in best:
+                        row = int(rows[j])
+                        candidates[position].append((float(query_scores[j]), {
+                            'id': segment.ids[row],
+                            'text': segment.texts[row],
+                            'metadata': segment.row_metadata(row),
+                            'score': float(query_scores[j])
+                        }))
+
+            for tail in (self._tail, self._frozen):
+                if tail is not None and len(tail):
+                    tail_results = await tail.search_many(group.tolist(), top_k=top_k, filters=filter)
+                    for position, results in zip(positions, tail_results):
+                        candidates[position].extend((result['score'], result) for result in results)
+
+        merged = []
+        for query_candidates in candidates:
+            query_candidates.sort(key=lambda c: c[0], reverse=True)
+            merged.append([result for _, result in query_candidates[:top_k]])
+        return merged
+
+    async def delete(self, ids: List[str]) -> bool:
+        """Log tombstones for IDs"""
+        try:
+            records = []
+            for id_ in ids:
+                self._last_seq += 1
+                records.append({'op': 'delete', 'seq': self._last_seq, 'id': id_})
+            self._log(records)
+            for record in records:
+                self._apply(record)
+
+            logger.info(f"Deleted {len(ids)} vectors")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            return False
+
+    async def get_ids(self) -> List[str]:
+        """IDs of the live vectors (segments + WAL tail)"""
+        ids = set(self._tail_seqs) | set(self._frozen_seqs)
+        for segment in self.segments:
+            alive = self._segment_alive(segment)
+            ids.update(segment.ids[int(row)] for row in np.flatnonzero(alive))
+        return list(ids)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get statistics"""
+        segment_rows = sum(int(self._segment_alive(s).sum()) for s in self.segments)
+        tail_rows = len(self._tail_seqs) + len(self._frozen_seqs)
+        return {
+            'total_vectors': segment_rows + tail_rows,
+            'vector_dimension': self.dimension,
+            'storage_type': 'persistent',
+            'path': str(self.path),
+            'segments': len(self.segments),
+            'segment_vectors': segment_rows,
+            'wal_vectors': tail_rows,
+            'tombstones': len(self._tombstones),
+            'read_only': self.read_only,
+            'merging': self._frozen is not None
+        }
+
+    # ------------------------------------------------------------------
+    # Merging
+    # ------------------------------------------------------------------
+
+    def _maybe_schedule_merge(self):
+        if len(self._tail_seqs) < self.merge_threshold or self._merge_lock.locked():
+            return
+        try:
+            self._merge_task = asyncio.get_running_loop().create_task(self.merge())
+        except RuntimeError:
+            pass
+
+    async def merge(self, compact: bool = False) -> Dict[str, Any]:
+        """
+        Fold the WAL tail into a new immutable segment
+
+        Args:
+            compact: Also rewrite existing segments without dead rows
+                and drop all tombstones
+
+        Returns:
+            Summary of the merge
+        """
+        if self.read_only:
+            raise PermissionError(f"Vector store at {self.path} is open read-only")
+
+        async with self._merge_lock:
+            # Freeze the tail; new writes go to a fresh WAL generation
+            self._frozen, self._frozen_seqs = self._tail, self._tail_seqs
+            self._tail, self._tail_seqs = MemoryVectorStore(), {}
+            self._wal_generation += 1
+            self._wal.close()
+            self._wal = open(self._wal_path(self._wal_generation), 'a', encoding='utf-8')
+
+            frozen = self._frozen
+            frozen.compact()
+            ids = list(frozen.ids)
+            texts = list(frozen.texts)
+            metadatas = list(frozen.metadatas)
+            vectors = frozen.vectors.copy()
+            seqs = np.array([self._frozen_seqs[id_] for id_ in ids], dtype=np.int64)
+            sources = list(self.segments) if compact else []
+            tombstones = dict(self._tombstones)
+
+            name = f'seg-{self._next_segment:06d}'
+            rows = await asyncio.to_thread(
+                self._write_merged, self.path / name, sources, tombstones, ids, texts, metadatas, vectors, seqs
+            )
+
+            # Deletes that hit the frozen rows while writing are kept as tombstones
+            self._next_segment += 1
+            kept = [s for s in self.segments if s not in sources]
+            self.segments = kept + ([Segment(self.path / name)] if rows else [])
+            if compact:
+                self._tombstones = {
+                    id_: seq for id_, seq in self._tombstones.items() if tombstones.get(id_) != seq
+                }
+            self._alive_cache = {}
+            self._frozen, self._frozen_seqs = None, {}
+            self._manifest_generation = self._wal_generation
+            self._write_manifest()
+            self._rotate_wal_files()
+
+            for segment in sources:
+                shutil.rmtree(segment.path, ignore_errors=True)
+
+            logger.info(f"Merged {len(ids)} WAL rows into {name} ({rows} rows, compact={compact})")
+            return {'segment': name, 'rows': rows, 'wal_rows': len(ids), 'compacted_segments': len(sources)}
+
+    @staticmethod
+    def _write_merged(
+        path: Path,
+        sources: List[Segment],
+        tombstones: Dict[str, int],
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        seqs: np.ndarray
+    ) -> int:
+        """Write one segment from compacted sources plus WAL rows"""
+        all_ids, all_texts, all_metadatas, blocks, all_seqs = [], [], [], [], []
+        for segment in sources:
+            rows = np.flatnonzero(segment.alive_mask(tombstones))
+            all_ids.extend(segment.ids[int(r)] for r in rows)
+            all_texts.extend(segment.texts[int(r)] for r in rows)
+            all_metadatas.extend(segment.row_metadata(int(r)) for r in rows)
+            blocks.append(np.asarray(segment.vectors[rows]))
+            all_seqs.append(np.asarray(segment.seqs[rows]))
+
+        all_ids.extend(ids)
+        all_texts.extend(texts)
+        all_metadatas.extend(metadatas)
+        blocks.append(vectors)
+        all_seqs.append(seqs)
+
+        if not all_ids:
+            return 0
+
+        Segment.write(path, all_ids, all_texts, all_metadatas, np.vstack(blocks), np.concatenate(all_seqs))
+        return len(all_ids)
+
+    def close(self):
+        """Close the WAL and release the writer lock"""
+        if self._wal:
+            self._wal.close()
+            self._wal = None
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+        self._open_stores.pop(str(self.path.resolve()), None)
@@ -0,0 +1,288 @@
+"""
+Scalar Quantization - reduced-precision vector storage
+
+ScalarQuantizer encodes normalized float32 vectors as float32, float16 or
+int8 (per-dimension scale/offset). QuantizedMatrix is the growable row
+store used by the in-memory vector stores: it scores queries directly on
+the quantized codes and can keep float32 originals for re-scoring.
+"""
+from typing import Any, Dict, Optional
+import logging
+
+import numpy as np
+
+from .vector_math import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+PRECISIONS = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8,
+}
+
+
+class ScalarQuantizer:
+    """Per-dimension scalar quantizer"""
+
+    INT8_LEVELS = 127
+    RANGE_MARGIN = 0.1
+
+    def __init__(self, precision: str = 'float32'):
+        if precision not in PRECISIONS:
+            raise ValueError(
+                f"Unknown precision '{precision}'. Available: {', '.join(PRECISIONS)}"
+            )
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self._low: Optional[np.ndarray] = None
+        self._high: Optional[np.ndarray] = None
+
+    @property
+    def bytes_per_value(self) -> int:
+        return np.dtype(self.dtype).itemsize
+
+    def covers(self, block: np.ndarray) -> bool:
+        """Whether a block lies inside the calibrated range (always true unless int8)"""
+        if self.precision != 'int8' or self._low is None:
+            return self.precision != 'int8'
+        return bool(np.all(block.min(axis=0) >= self._low) and np.all(block.max(axis=0) <= self._high))
+
+    def fit(self, block: np.ndarray) -> bool:
+        """
+        Extend the calibrated int8 range to cover a new block
+
+        Returns:
+            True when the range changed and existing codes must be re-encoded
+        """
+        if self.precision != 'int8' or len(block) == 0:
+            return False
+
+        if self.covers(block):
+            return False
+
+        low, high = block.min(axis=0), block.max(axis=0)
+        if self._low is not None:
+            low, high = np.minimum(low, self._low), np.maximum(high, self._high)
+
+        # Widen a little so slow drift does not re-encode on every insert
+        margin = (high - low) * self.RANGE_MARGIN
+        self._low, self._high = low - margin, high + margin
+        self.offset = ((self._high + self._low) / 2).astype(np.float32)
+        self.scale = np.maximum((self._high - self._low) / (2 * self.INT8_LEVELS), 1e-12).astype(np.float32)
+        return True
+
+    def encode(self, block: np.ndarray) -> np.ndarray:
+        if self.precision != 'int8':
+            return block.astype(self.dtype)
+        codes = np.rint((block - self.offset) / self.scale)
+        return np.clip(codes, -self.INT8_LEVELS, self.INT8_LEVELS).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.precision != 'int8':
+            return codes.astype(np.float32)
+        return self.offset + codes.astype(np.float32) * self.scale
+
+    def score(self, codes: np.ndarray, query: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        Dot products of a float32 query (or query matrix) with quantized rows
+
+        int8 uses q·(offset + scale*c) = q·offset + (q*scale)·c so the
+        per-dimension scale is folded into the query once. Rows are
+        up-cast in chunks to bound temporary memory.
+
+        Returns:
+            (rows,) for one query, (rows, queries) for a query matrix
+        """
+        if self.precision == 'float32':
+            return codes @ query.T
+
+        if self.precision == 'int8':
+            bias = query @ self.offset
+            query = query * self.scale
+        else:
+            bias = 0.0
+
+        scores = np.empty((len(codes),) + query.shape[:-1], dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            scores[start:start + chunk_size] = codes[start:start + chunk_size].astype(np.float32) @ query.T
+        return scores + bias
+
+
+class QuantizedMatrix:
+    """Growable matrix of quantized, L2-normalized rows"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(
+        self,
+        precision: str = 'float32',
+        keep_originals: bool = False,
+        calibration_size: int = 1000
+    ):
+        """
+        Args:
+            precision: 'float32', 'float16' or 'int8'
+            keep_originals: Keep float32 rows for exact re-scoring
+            calibration_size: float32 rows kept to estimate recall loss
+        """
+        self.quantizer = ScalarQuantizer(precision)
+        self.keep_originals = keep_originals and precision != 'float32'
+        self.calibration_size = calibration_size
+        self.size = 0
+        self._codes: Optional[np.ndarray] = None
+        self._originals: Optional[np.ndarray] = None
+        self._calibration: Optional[np.ndarray] = None
+        self._recall_loss: Optional[float] = None
+
+    @property
+    def precision(self) -> str:
+        return self.quantizer.precision
+
+    @property
+    def dimension(self) -> int:
+        return self._codes.shape[1] if self._codes is not None else 0
+
+    @property
+    def capacity(self) -> int:
+        """Rows allocated (grown by doubling)"""
+        return self._codes.shape[0] if self._codes is not None else 0
+
+    @property
+    def codes(self) -> np.ndarray:
+        """View of the active quantized rows"""
+        if self._codes is None:
+            return np.empty((0, 0), dtype=self.quantizer.dtype)
+        return self._codes[:self.size]
+
+    def _grow(self, matrix: Optional[np.ndarray], needed: int, dimension: int, dtype) -> np.ndarray:
+        if matrix is None:
+            return np.zeros((max(self.INITIAL_CAPACITY, needed), dimension), dtype=dtype)
+        if needed <= matrix.shape[0]:
+            return matrix
+        capacity = matrix.shape[0]
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, dimension), dtype=dtype)
+        grown[:self.size] = matrix[:self.size]
+        return grown
+
+    def append(self, block: np.ndarray) -> int:
+        """
+        Append normalized float32 rows
+
+        Returns:
+            Row index of the first appended row
+        """
+        if self._codes is not None and block.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {block.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        start = self.size
+        needed = self.size + len(block)
+
+        if not self.quantizer.covers(block):
+            # Range grows: re-encode existing rows under the new scale
+            if self._originals is not None:
+                previous = self._originals[:self.size]
+            else:
+                previous = self.decode() if self.size else None
+            self.quantizer.fit(block)
+            self._recall_loss = None
+            if previous is not None:
+                self._codes[:self.size] = self.quantizer.encode(previous)
+
+        self._codes = self._grow(self._codes, needed, block.shape[1], self.quantizer.dtype)
+        self._codes[start:needed] = self.quantizer.encode(block)
+
+        if self.keep_originals:
+            self._originals = self._grow(self._originals, needed, block.shape[1], np.float32)
+            self._originals[start:needed] = block
+
+        if self.precision != 'float32':
+            kept = 0 if self._calibration is None else len(self._calibration)
+            if kept < self.calibration_size:
+                sample = block[:self.calibration_size - kept]
+                self._calibration = sample.copy() if self._calibration is None else np.vstack([self._calibration, sample])
+                self._recall_loss = None
+
+        self.size = needed
+        return start
+
+    def decode(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate float32 rows"""
+        codes = self.codes if rows is None else self._codes[rows]
+        return self.quantizer.decode(codes)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Similarity of a normalized query to all (or selected) rows"""
+        codes = self.codes if rows is None else self._codes[rows]
+        return self.quantizer.score(codes, query)
+
+    def scores_many(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(queries, rows) similarity matrix from one matrix-matrix product"""
+        codes = self.codes if rows is None else self._codes[rows]
+        return self.quantizer.score(codes, queries).T
+
+    def exact_scores(self, query: np.ndarray, rows: np.ndarray) -> Optional[np.ndarray]:
+        """float32 re-scoring of selected rows (None when originals are not kept)"""
+        if self.precision == 'float32':
+            return self._codes[rows] @ query
+        if self._originals is None:
+            return None
+        return self._originals[rows] @ query
+
+    def compact(self, keep: np.ndarray):
+        """Drop rows where keep is False, preserving order"""
+        remaining = int(keep.sum())
+        self._codes[:remaining] = self._codes[:self.size][keep]
+        if self._originals is not None:
+            self._originals[:remaining] = self._originals[:self.size][keep]
+        self.size = remaining
+
+    def clear(self):
+        self.__init__(self.precision, self.keep_originals, self.calibration_size)
+
+    def measure_recall_loss(self, top_k: int = 10, n_queries: int = 100) -> float:
+        """
+        Estimate 1 - recall@top_k of quantized scoring vs float32
+
+        Uses the float32 calibration sample as both corpus and queries.
+        """
+        if self.precision == 'float32' or self._calibration is None or len(self._calibration) <= top_k:
+            return 0.0
+
+        sample = self._calibration
+        codes = self.quantizer.encode(sample)
+        queries = sample[:n_queries]
+        hits = 0
+        for query in queries:
+            expected = set(top_k_indices(sample @ query, top_k).tolist())
+            found = top_k_indices(self.quantizer.score(codes, query), top_k)
+            hits += len(expected.intersection(found.tolist()))
+
+        self._recall_loss = 1.0 - hits / (len(queries) * top_k)
+        return self._recall_loss
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory footprint and quality of the chosen precision"""
+        float32_bytes = self.size * self.dimension * 4
+        memory_bytes = self.size * self.dimension * self.quantizer.bytes_per_value
+        if self._originals is not None:
+            memory_bytes += float32_bytes
+
+        if self._recall_loss is None:
+            self.measure_recall_loss()
+
+        return {
+            'precision': self.precision,
+            'memory_bytes': memory_bytes,
+            'float32_bytes': float32_bytes,
+            'memory_saved_bytes': float32_bytes - memory_bytes,
+            'rescoring': self._originals is not None,
+            'recall_loss': self._recall_loss or 0.0
+        }
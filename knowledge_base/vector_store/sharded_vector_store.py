@@ -0,0 +1,554 @@
+"""
+Sharded Vector Store - exact search partitioned across worker processes
+
+Vectors are routed to shards by a stable hash of their id. Each shard's
+normalized float32 rows and tombstone flags live in shared memory; the
+parent process writes them and one worker process per shard scores
+queries against them. A query is broadcast to every shard and the
+per-shard top-k lists are merged, so a scan uses n_shards cores instead
+of one.
+
+Stores can share one ShardPool of workers (CollectionManager does, so a
+collection per dataset does not start n_shards processes per dataset).
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+import weakref
+import zlib
+
+import numpy as np
+
+from .base_vector_store import BaseVectorStore, QueryFilters, group_queries_by_filter
+from .metadata_index import MetadataIndex
+from .vector_math import normalize_rows, top_k_indices, top_k_indices_batch
+
+logger = logging.getLogger(__name__)
+
+
+# BLAS threads per worker; the shards themselves provide the parallelism
+_WORKER_THREAD_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _score(shard: tuple, queries: np.ndarray, top_k: int, size: int, rows: Optional[np.ndarray]) -> tuple:
+    _, vectors, deleted = shard
+    if rows is None:
+        rows = np.flatnonzero(~deleted[:size])
+        scores = queries @ vectors[:size].T
+        if rows.size < size:
+            scores = scores[:, rows]
+    else:
+        rows = rows[~deleted[rows]]
+        scores = queries @ vectors[rows].T
+    best = top_k_indices_batch(scores, top_k)
+    return ('ok', rows[best], np.take_along_axis(scores, best, axis=1))
+
+
+def _shard_worker(conn):
+    """
+    Worker loop: score queries against the shared-memory rows of the
+    shards attached to this worker (one per store using the pool)
+
+    Messages:
+        ('attach', key, vectors_name, deleted_name, capacity, dimension)
+        ('detach', key)
+        ('search', key, queries, top_k, size, rows or None)
+        ('close',)
+    """
+    shards: Dict[str, tuple] = {}
+
+    def detach(key: str):
+        shard = shards.pop(key, None)
+        if shard is not None:
+            blocks = shard[0]
+            # Drop array views before closing the mappings
+            shard = None
+            for block in blocks:
+                block.close()
+
+    while True:
+        message = conn.recv()
+        op = message[0]
+
+        if op == 'close':
+            break
+
+        if op == 'attach':
+            _, key, vectors_name, deleted_name, capacity, dimension = message
+            detach(key)
+            vectors_block, vectors = _attach(vectors_name, (capacity, dimension), np.float32)
+            deleted_block, deleted = _attach(deleted_name, (capacity,), np.bool_)
+            shards[key] = ([vectors_block, deleted_block], vectors, deleted)
+            vectors = deleted = None
+            conn.send(('ok',))
+            continue
+
+        if op == 'detach':
+            detach(message[1])
+            conn.send(('ok',))
+            continue
+
+        try:
+            _, key, queries, top_k, size, rows = message
+            conn.send(_score(shards[key], queries, top_k, size, rows))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+    for key in list(shards):
+        detach(key)
+    conn.close()
+
+
+@contextmanager
+def _single_threaded_blas():
+    previous = {name: os.environ.get(name) for name in _WORKER_THREAD_ENV}
+    os.environ.update({name: '1' for name in _WORKER_THREAD_ENV})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        # Workers must share the parent's tracker so unlinked blocks are not "leaked"
+        resource_tracker.ensure_running()
+        with _single_threaded_blas():
+            self.process = context.Process(target=_shard_worker, args=(child_conn,), daemon=True)
+            self.process.start()
+        child_conn.close()
+
+    def request(self, message: tuple) -> tuple:
+        self.conn.send(message)
+        reply = self.conn.recv()
+        if reply[0] == 'error':
+            raise RuntimeError(f"Shard worker failed: {reply[1]}")
+        return reply
+
+    def close(self):
+        try:
+            if self.process.is_alive():
+                self.conn.send(('close',))
+                self.process.join(timeout=5)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+def _close_workers(workers: List[_Worker]):
+    for worker in workers:
+        worker.close()
+
+
+class ShardPool:
+    """
+    Worker processes shared by sharded stores
+
+    Shard i of every store using the pool is scored by worker i, so many
+    collections (e.g. one per dataset) share n_workers processes instead of
+    starting their own.
+    """
+
+    def __init__(self, n_workers: int = 4, start_method: Optional[str] = None):
+        """
+        Args:
+            n_workers: Number of worker processes (e.g. CPU cores)
+            start_method: multiprocessing start method (platform default if None)
+        """
+        if n_workers < 1:
+            raise ValueError("n_workers must be at least 1")
+
+        context = multiprocessing.get_context(start_method)
+        self.workers = [_Worker(context) for _ in range(n_workers)]
+        # One request in flight per worker pipe
+        self.lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _close_workers, self.workers)
+        logger.info(f"ShardPool started ({n_workers} workers)")
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    def close(self):
+        """Stop the worker processes"""
+        self._finalizer()
+
+
+class _Shard:
+    """Parent-side state of one shard: shared rows plus texts / metadata"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, pool: ShardPool, index: int, key: str):
+        self.pool = pool
+        self.worker = pool.workers[index]
+        self.key = key
+
+        self.vectors_block: Optional[shared_memory.SharedMemory] = None
+        self.deleted_block: Optional[shared_memory.SharedMemory] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.deleted: Optional[np.ndarray] = None
+        self.capacity = 0
+        self.size = 0
+        self.deleted_count = 0
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[Optional[str]] = []
+        self.metadata_index = MetadataIndex()
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1] if self.vectors is not None else 0
+
+    def request(self, op: str, *args) -> tuple:
+        with self.pool.lock:
+            return self.worker.request((op, self.key, *args))
+
+    def _reallocate(self, capacity: int, dimension: int):
+        """Move rows into larger shared-memory blocks and re-attach the worker"""
+        vectors_block = shared_memory.SharedMemory(create=True, size=max(1, capacity * dimension * 4))
+        deleted_block = shared_memory.SharedMemory(create=True, size=max(1, capacity))
+        vectors = np.ndarray((capacity, dimension), dtype=np.float32, buffer=vectors_block.buf)
+        deleted = np.ndarray((capacity,), dtype=np.bool_, buffer=deleted_block.buf)
+        deleted[:] = False
+        if self.vectors is not None:
+            vectors[:self.size] = self.vectors[:self.size]
+            deleted[:self.size] = self.deleted[:self.size]
+
+        self.request('attach', vectors_block.name, deleted_block.name, capacity, dimension)
+        self._release_blocks()
+        self.vectors_block, self.deleted_block = vectors_block, deleted_block
+        self.vectors, self.deleted = vectors, deleted
+        self.capacity = capacity
+
+    def _release_blocks(self):
+        self.vectors = self.deleted = None
+        for block in (self.vectors_block, self.deleted_block):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.vectors_block = self.deleted_block = None
+
+    def append(self, block: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> int:
+        needed = self.size + len(block)
+        if needed > self.capacity:
+            capacity = max(self.capacity, self.INITIAL_CAPACITY)
+            while capacity < needed:
+                capacity *= 2
+            self._reallocate(capacity, block.shape[1])
+
+        start = self.size
+        self.vectors[start:needed] = block
+        self.size = needed
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+        self.metadata_index.add_many(start, metadatas)
+        return start
+
+    def compact(self):
+        """Drop tombstoned rows in place (the worker reads the same memory)"""
+        keep = ~self.deleted[:self.size]
+        kept_rows = np.flatnonzero(keep)
+        remaining = kept_rows.size
+        self.vectors[:remaining] = self.vectors[kept_rows]
+        self.deleted[:self.size] = False
+        self.metadata_index.remove_rows(np.flatnonzero(~keep))
+        self.texts = [self.texts[row] for row in kept_rows]
+        self.metadatas = [self.metadatas[row] for row in kept_rows]
+        self.ids = [self.ids[row] for row in kept_rows]
+        self.size = remaining
+        self.deleted_count = 0
+
+    def close(self):
+        """Detach from the worker (if it still runs) and release the shared memory"""
+        if self.vectors_block is not None and self.worker.process.is_alive():
+            try:
+                self.request('detach')
+            except (BrokenPipeError, EOFError, OSError, RuntimeError):
+                pass
+        self._release_blocks()
+
+
+def _close_shards(shards: List[_Shard], pool: Optional[ShardPool]):
+    for shard in shards:
+        shard.close()
+    if pool is not None:
+        pool.close()
+
+
+class ShardedVectorStore(BaseVectorStore):
+    """
+    Exact cosine search sharded across worker processes
+
+    Keeps the BaseVectorStore interface; results match MemoryVectorStore.
+    Call close() (or rely on interpreter exit) to release the shared memory
+    and stop the workers of a pool the store started itself.
+    """
+
+    # Searches already run in a worker thread (see search_many)
+    blocking_search = False
+
+    def __init__(
+        self,
+        n_shards: int = 4,
+        compaction_threshold: float = 0.25,
+        start_method: Optional[str] = None,
+        pool: Optional[ShardPool] = None
+    ):
+        """
+        Args:
+            n_shards: Number of shards / worker processes (e.g. CPU cores);
+                ignored when a pool is given (one shard per pool worker)
+            compaction_threshold: Per-shard tombstone ratio that triggers compaction
+            start_method: multiprocessing start method (platform default if None)
+            pool: Shared worker pool (default: a pool owned by this store)
+        """
+        owned = pool is None
+        if owned:
+            if n_shards < 1:
+                raise ValueError("n_shards must be at least 1")
+            pool = ShardPool(n_shards, start_method)
+
+        self.n_shards = pool.size
+        self.compaction_threshold = compaction_threshold
+        self.pool = pool
+        key = uuid.uuid4().hex
+        self._shards = [_Shard(pool, index, key) for index in range(pool.size)]
+        self._id_to_row: Dict[str, Tuple[int, int]] = {}
+        # Guards the shards' rows and id map; only taken off the event loop
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _close_shards, self._shards, pool if owned else None)
+        logger.info(f"ShardedVectorStore initialized ({self.n_shards} shards)")
+
+    @property
+    def dimension(self) -> int:
+        return max(shard.dimension for shard in self._shards)
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def shard_for(self, id_: str) -> int:
+        """Stable hash routing (identical across processes and restarts)"""
+        return zlib.crc32(id_.encode('utf-8')) % self.n_shards
+
+    async def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Route embeddings to shards by id hash"""
+
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        if not texts:
+            return ids
+
+        block = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        if self.dimension and block.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {block.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        added_at = datetime.utcnow().isoformat()
+        routed: Dict[int, List[int]] = {}
+        for position, id_ in enumerate(ids):
+            routed.setdefault(self.shard_for(id_), []).append(position)
+
+        # A search holds the lock across its round trip to the workers
+        await asyncio.to_thread(self._add_blocking, block, texts, metadatas, ids, routed, added_at)
+
+        logger.info(f"Added {len(texts)} embeddings across {len(routed)} shards")
+        return ids
+
+    def _add_blocking(
+        self,
+        block: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        routed: Dict[int, List[int]],
+        added_at: str
+    ):
+        with self._lock:
+            # Re-adding an id replaces the previous row
+            self._tombstone(ids)
+            for shard_id, positions in routed.items():
+                shard = self._shards[shard_id]
+                start = shard.append(
+                    block[positions],
+                    [texts[p] for p in positions],
+                    [{**metadatas[p], 'added_at': added_at} for p in positions],
+                    [ids[p] for p in positions]
+                )
+                for offset, position in enumerate(positions):
+                    self._id_to_row[ids[position]] = (shard_id, start + offset)
+
+    async def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Broadcast the query to every shard and merge the top-k lists"""
+        results = (await self.search_many([query_embedding], top_k, filter))[0]
+        logger.info(f"Search returned {len(results)} results")
+        return results
+
+    async def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: QueryFilters = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Broadcast a query batch to every shard and merge per query"""
+        if not query_embeddings:
+            return []
+        if not self._id_to_row:
+            logger.warning("Vector store is empty")
+            return [[] for _ in query_embeddings]
+
+        queries = normalize_rows(
+            np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        )
+        return await asyncio.to_thread(self._search_blocking, queries, top_k, filters)
+
+    def _search_blocking(self, queries: np.ndarray, top_k: int, filters: QueryFilters) -> List[List[Dict[str, Any]]]:
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+
+        with self._lock, self.pool.lock:
+            for filter, positions in group_queries_by_filter(len(queries), filters):
+                group = queries[positions]
+
+                # Send to every shard first so the workers score in parallel
+                pending = []
+                for shard_id, shard in enumerate(self._shards):
+                    if shard.size == 0:
+                        continue
+                    rows = shard.metadata_index.lookup(filter) if filter else None
+                    if filter and rows is None:
+                        rows = np.fromiter(
+                            (
+                                i for i, metadata in enumerate(shard.metadatas)
+                                if all(metadata.get(key) == value for key, value in filter.items())
+                            ),
+                            dtype=np.int64
+                        )
+                    if rows is not None and rows.size == 0:
+                        continue
+                    shard.worker.conn.send(('search', shard.key, group, top_k, shard.size, rows))
+                    pending.append(shard_id)
+
+                shard_hits = []
+                for shard_id in pending:
+                    reply = self._shards[shard_id].worker.conn.recv()
+                    if reply[0] == 'error':
+                        raise RuntimeError(f"Shard {shard_id} failed: {reply[1]}")
+                    shard_hits.append((shard_id, reply[1], reply[2]))
+
+                for i, position in enumerate(positions):
+                    results[position] = self._merge(shard_hits, i, top_k)
+
+        return results
+
+    def _merge(self, shard_hits: List[Tuple[int, np.ndarray, np.ndarray]], query: int, top_k: int) -> List[Dict[str, Any]]:
+        """Merge per-shard top-k lists for one query"""
+        if not shard_hits:
+            return []
+        shard_ids = np.concatenate([np.full(len(rows[query]), shard_id) for shard_id, rows, _ in shard_hits])
+        rows = np.concatenate([rows[query] for _, rows, _ in shard_hits])
+        scores = np.concatenate([scores[query] for _, _, scores in shard_hits])
+
+        results = []
+        for j in top_k_indices(scores, top_k):
+            shard, row = self._shards[int(shard_ids[j])], int(rows[j])
+            results.append({
+                'id': shard.ids[row],
+                'text': shard.texts[row],
+                'metadata': shard.metadatas[row],
+                'score': float(scores[j])
+            })
+        return results
+
+    def _tombstone(self, ids: List[str]) -> int:
+        deleted = 0
+        for id_ in ids:
+            location = self._id_to_row.pop(id_, None)
+            if location is None:
+                continue
+            shard = self._shards[location[0]]
+            shard.deleted[location[1]] = True
+            shard.ids[location[1]] = None
+            shard.deleted_count += 1
+            deleted += 1
+        return deleted
+
+    async def delete(self, ids: List[str]) -> bool:
+        """Tombstone rows by IDs, compacting shards past the threshold"""
+        try:
+            deleted = await asyncio.to_thread(self._delete_blocking, ids)
+            logger.info(f"Deleted {deleted} vectors")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            return False
+
+    def _delete_blocking(self, ids: List[str]) -> int:
+        with self._lock:
+            deleted = self._tombstone(ids)
+            for shard_id, shard in enumerate(self._shards):
+                if shard.size and shard.deleted_count / shard.size > self.compaction_threshold:
+                    shard.compact()
+                    for row, id_ in enumerate(shard.ids):
+                        self._id_to_row[id_] = (shard_id, row)
+            return deleted
+
+    async def get_ids(self) -> List[str]:
+        """IDs of the live vectors"""
+        return list(self._id_to_row)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get statistics"""
+        return {
+            'total_vectors': len(self._id_to_row),
+            'vector_dimension': self.dimension if self._id_to_row else 0,
+            'storage_type': 'sharded',
+            'shards': [
+                {
+                    'vectors': shard.size - shard.deleted_count,
+                    'deleted_vectors': shard.deleted_count,
+                    'capacity': shard.capacity,
+                    'worker_alive': shard.worker.process.is_alive()
+                }
+                for shard in self._shards
+            ]
+        }
+
+    def close(self):
+        """Release the shared memory (and stop the workers of an owned pool)"""
+        self._finalizer()
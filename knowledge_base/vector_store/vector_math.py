@@ -0,0 +1,85 @@
+"""
+Vector Math Helpers shared by the vector store backends
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows of a float32 matrix
+
+    Zero rows are left as zeros so they score 0 against any query.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k highest scores, best first
+
+    Uses argpartition (O(n)) and only sorts the selected k entries.
+    """
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def top_k_indices_batch(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Row-wise top_k of a (queries, n) score matrix, best first per row
+
+    Returns:
+        (queries, min(top_k, n)) index matrix
+    """
+    n = scores.shape[1]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    selected = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-selected, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+SCORE_NORMALIZATIONS = ('none', 'minmax', 'zscore')
+
+
+def normalize_scores(results: List[Dict[str, Any]], method: str = 'minmax') -> List[Dict[str, Any]]:
+    """
+    Rescale one hit list's scores so lists (collections, retrieval legs)
+    merge on one scale
+
+    The original score is kept as 'raw_score'. A list whose hits all
+    share one score (e.g. a single hit) keeps its raw scores, so a lone
+    weak hit is not promoted to the top of the merged ranking.
+
+    Args:
+        results: Hits of one collection or leg
+        method: 'minmax' (to [0, 1]), 'zscore' (mean 0, std 1) or 'none'
+    """
+    if method not in SCORE_NORMALIZATIONS:
+        raise ValueError(f"Unknown score normalization '{method}' (expected one of {SCORE_NORMALIZATIONS})")
+    scores = np.array([result['score'] for result in results], dtype=float)
+    if method == 'none' or scores.size < 2 or scores.max() == scores.min():
+        return [{**result, 'raw_score': result['score']} for result in results]
+
+    if method == 'minmax':
+        normalized = (scores - scores.min()) / (scores.max() - scores.min())
+    else:
+        normalized = (scores - scores.mean()) / scores.std()
+    return [
+        {**result, 'raw_score': result['score'], 'score': float(score)}
+        for result, score in zip(results, normalized)
+    ]
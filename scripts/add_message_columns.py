@@ -0,0 +1,51 @@
+"""
+Add model, usage and latency columns to the messages table
+
+Safe to run more than once: only missing columns are added.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, inspect, text
+from core.config import settings
+
+MESSAGE_COLUMNS = [
+    ("agent_id", "VARCHAR"),
+    ("agent_mode", "VARCHAR"),
+    ("model_provider", "VARCHAR"),
+    ("model_id", "VARCHAR"),
+    ("prompt_tokens", "INTEGER DEFAULT 0"),
+    ("completion_tokens", "INTEGER DEFAULT 0"),
+    ("total_tokens", "INTEGER DEFAULT 0"),
+    ("total_price", "FLOAT DEFAULT 0.0"),
+    ("retrieval_used", "BOOLEAN DEFAULT 0"),
+    ("retrieval_count", "INTEGER DEFAULT 0"),
+    ("created_by", "VARCHAR"),
+    ("time_to_first_token", "FLOAT"),
+    ("provider_response_latency", "FLOAT"),
+    ("total_latency", "FLOAT"),
+]
+
+
+def add_missing_columns(engine, table, columns):
+    """ALTER TABLE ... ADD COLUMN for each column the table lacks; returns the added names"""
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+    added = []
+    with engine.connect() as conn:
+        for name, definition in columns:
+            if name in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+            added.append(name)
+        conn.commit()
+    return added
+
+
+if __name__ == "__main__":
+    engine = create_engine(settings.database_url)
+    try:
+        added = add_missing_columns(engine, "messages", MESSAGE_COLUMNS)
+        print(f"✅ messages: added {', '.join(added) if added else 'nothing (up to date)'}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,26 @@
+"""
+Add the keywords column (terms analyzed at indexing) to document_segments
+
+Safe to run more than once. Existing segments get their terms the next
+time their dataset is indexed.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from core.config import settings
+from scripts.add_message_columns import add_missing_columns
+
+SEGMENT_COLUMNS = [
+    ("keywords", "JSON"),
+]
+
+
+if __name__ == "__main__":
+    engine = create_engine(settings.database_url)
+    try:
+        added = add_missing_columns(engine, "document_segments", SEGMENT_COLUMNS)
+        print(f"✅ document_segments: added {', '.join(added) if added else 'nothing (up to date)'}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,115 @@
+"""
+Benchmark vector store backends on synthetic embeddings
+
+Usage:
+    python scripts/benchmark_vector_search.py --vectors 100000 --dim 128
+    python scripts/benchmark_vector_search.py --backend sharded --vectors 500000 --shards 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from knowledge_base.vector_store.hnsw_vector_store import HNSWVectorStore
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.sharded_vector_store import ShardedVectorStore
+
+
+def make_corpus(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors (closer to real embeddings than pure noise)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 1000), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), n)
+    return centers[labels] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+async def benchmark_hnsw(args):
+    corpus = make_corpus(args.vectors, args.dim)
+    queries = make_corpus(args.queries, args.dim, seed=1)
+
+    store = HNSWVectorStore(M=args.M, ef_construction=args.ef_construction)
+    start = time.perf_counter()
+    for i in range(0, len(corpus), 1000):
+        block = corpus[i:i + 1000]
+        await store.add_embeddings(
+            texts=[''] * len(block),
+            embeddings=block,
+            metadatas=[{}] * len(block),
+            ids=[str(j) for j in range(i, i + len(block))]
+        )
+    build_seconds = time.perf_counter() - start
+    print(f"HNSW build: {args.vectors} vectors in {build_seconds:.1f}s")
+
+    report = store.measure_recall(queries, top_k=args.top_k, ef_values=args.ef_values)
+    print(f"{'ef_search':>10} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for ef, row in report.items():
+        print(f"{ef:>10} {row['recall']:>10.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+
+
+async def load(store, corpus: np.ndarray, block_size: int = 10000):
+    for i in range(0, len(corpus), block_size):
+        block = corpus[i:i + block_size]
+        await store.add_embeddings(
+            texts=[''] * len(block),
+            embeddings=block,
+            metadatas=[{}] * len(block),
+            ids=[str(j) for j in range(i, i + len(block))]
+        )
+
+
+async def time_queries(store, queries: np.ndarray, top_k: int) -> float:
+    """Queries per second for back-to-back single-query searches"""
+    start = time.perf_counter()
+    for query in queries:
+        await store.search(query, top_k=top_k)
+    return len(queries) / (time.perf_counter() - start)
+
+
+async def benchmark_sharded(args):
+    corpus = make_corpus(args.vectors, args.dim)
+    queries = make_corpus(args.queries, args.dim, seed=1)
+
+    baseline = MemoryVectorStore()
+    await load(baseline, corpus)
+    base_qps = await time_queries(baseline, queries, args.top_k)
+    print(f"MemoryVectorStore: {base_qps:.1f} queries/s ({args.vectors} vectors, dim {args.dim})")
+    baseline.clear()
+
+    print(f"{'shards':>8} {'queries/s':>10} {'speedup':>8}")
+    for n_shards in args.shards:
+        store = ShardedVectorStore(n_shards=n_shards)
+        try:
+            await load(store, corpus)
+            await time_queries(store, queries[:10], args.top_k)  # warm up
+            qps = await time_queries(store, queries, args.top_k)
+        finally:
+            store.close()
+        print(f"{n_shards:>8} {qps:>10.1f} {qps / base_qps:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', choices=['hnsw', 'sharded'], default='hnsw')
+    parser.add_argument('--vectors', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--M', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=200)
+    parser.add_argument('--ef-values', type=int, nargs='+', default=[16, 32, 64, 128, 256])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    if args.backend == 'sharded':
+        asyncio.run(benchmark_sharded(args))
+    else:
+        asyncio.run(benchmark_hnsw(args))
+
+
+if __name__ == '__main__':
+    main()
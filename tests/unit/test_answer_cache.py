@@ -0,0 +1,110 @@
+"""
+Unit Tests for the semantic answer cache
+"""
+
+import numpy as np
+import pytest
+
+from core.rag.answer_cache import SemanticAnswerCache
+from core.rag.rag_pipeline import RAGPipeline
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestSemanticAnswerCache:
+    """Test SemanticAnswerCache"""
+
+    def test_near_duplicates_hit_within_scope(self):
+        cache = SemanticAnswerCache(threshold=0.95)
+        question = _random_embeddings(1)[0]
+        paraphrase = question + 0.05 * _random_embeddings(1, seed=1)[0]
+        unrelated = _random_embeddings(1, seed=2)[0]
+
+        cache.store(question.tolist(), {'answer': 'A'}, 'ds-a', tenant_id='t1')
+        hit = cache.lookup(paraphrase.tolist(), 'ds-a', tenant_id='t1')
+        assert hit['answer'] == 'A' and hit['similarity'] > 0.95
+
+        assert cache.lookup(unrelated.tolist(), 'ds-a', tenant_id='t1') is None
+        assert cache.lookup(question.tolist(), 'ds-a', tenant_id='t2') is None
+        assert cache.lookup(question.tolist(), 'ds-b', tenant_id='t1') is None
+        assert cache.lookup(question.tolist(), 'ds-a', tenant_id='t1', top_k=10) is None
+        assert cache.stats()['hits'] == 1
+
+    def test_version_invalidation(self):
+        cache = SemanticAnswerCache()
+        question = _random_embeddings(1)[0].tolist()
+
+        version = cache.version('ds-a')
+        cache.store(question, {'answer': 'old'}, 'ds-a')
+        cache.store(question, {'answer': 'all'}, None)
+        assert cache.invalidate('ds-a') == version + 1
+        assert cache.lookup(question, 'ds-a') is None
+        assert cache.lookup(question, None) is None
+
+        # An answer computed against the previous version is never served
+        cache.store(question, {'answer': 'raced'}, 'ds-a', version=version)
+        assert cache.lookup(question, 'ds-a') is None
+
+
+class _FakeEmbeddingService:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def generate_embedding(self, text):
+        return self.vectors[text]
+
+    async def generate_embeddings(self, texts, use_cache=True):
+        return [self.vectors[text] for text in texts]
+
+
+class TestPipelineAnswerCache:
+    """Test RAGPipeline.answer with the answer cache"""
+
+    @pytest.mark.asyncio
+    async def test_cached_answers_skip_generation_until_dataset_changes(self, monkeypatch):
+        vectors = _random_embeddings(5)
+
+        async def index_dataset(retriever, dataset_id, tenant_id=None):
+            await retriever.get_vector_store(dataset_id, tenant_id).add_embeddings(
+                texts=[f"text {i}" for i in range(5)],
+                embeddings=vectors.tolist(),
+                metadatas=[{'segment_id': f"seg-{i}"} for i in range(5)],
+                ids=[f"seg-{i}" for i in range(5)]
+            )
+            return {'indexed': 5, 'dataset_id': dataset_id}
+
+        monkeypatch.setattr(DocumentRetriever, 'index_dataset', index_dataset)
+        embeddings = _FakeEmbeddingService({
+            'what is x?': vectors[2].tolist(),
+            'what is x': (vectors[2] * 1.01).tolist(),
+        })
+        registry = DatasetIndexRegistry(CollectionManager(), SemanticAnswerCache())
+        prompts = []
+
+        async def generate(prompt):
+            prompts.append(prompt)
+            return f"answer {len(prompts)}"
+
+        def pipeline():
+            rag = RAGPipeline(None, registry)
+            rag.embedding_service = rag.retriever.embedding_service = embeddings
+            return rag
+
+        first = await pipeline().answer('what is x?', generate, top_k=2, dataset_id='ds-a', tenant_id='t1')
+        assert (first['answer'], first['cached']) == ('answer 1', False)
+        assert first['sources'][0]['segment_id'] == 'seg-2'
+
+        second = await pipeline().answer('what is x', generate, top_k=2, dataset_id='ds-a', tenant_id='t1')
+        assert (second['answer'], second['cached']) == ('answer 1', True)
+        assert second['sources'] == first['sources']
+        assert len(prompts) == 1
+
+        await registry.remove_segments('ds-a', ['seg-0'], tenant_id='t1')
+        third = await pipeline().answer('what is x', generate, top_k=2, dataset_id='ds-a', tenant_id='t1')
+        assert (third['answer'], third['cached']) == ('answer 2', False)
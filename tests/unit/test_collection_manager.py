@@ -0,0 +1,125 @@
+"""
+Unit Tests for per-(tenant, dataset) vector collections
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+from knowledge_base.vector_store.hnsw_vector_store import HNSWVectorStore
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.persistent_vector_store import PersistentVectorStore
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+async def _fill(store, prefix, vectors):
+    await store.add_embeddings(
+        texts=[f"{prefix} {i}" for i in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        metadatas=[{'dataset_id': prefix} for _ in range(len(vectors))],
+        ids=[f"{prefix}-{i}" for i in range(len(vectors))]
+    )
+
+
+class TestCollectionManager:
+    """Test CollectionManager"""
+
+    @pytest.mark.asyncio
+    async def test_scoped_search_only_touches_target_collections(self):
+        collections = CollectionManager()
+        vectors = _random_embeddings(30)
+        await _fill(collections.get_or_create('t1', 'ds-a'), 'ds-a', vectors[:10])
+        await _fill(collections.get_or_create('t1', 'ds-b'), 'ds-b', vectors[10:20])
+        await _fill(collections.get_or_create('t2', 'ds-c'), 'ds-c', vectors[20:])
+
+        # Query closest to a ds-c vector, but scoped to tenant t1
+        results = await collections.search(vectors[25].tolist(), top_k=5, tenant_id='t1')
+        assert len(results) == 5
+        assert all(r['metadata']['dataset_id'] in ('ds-a', 'ds-b') for r in results)
+        assert results == sorted(results, key=lambda r: r['score'], reverse=True)
+
+        results = await collections.search(vectors[3].tolist(), top_k=3, dataset_ids=['ds-a'])
+        assert results[0]['id'] == 'ds-a-3'
+        assert all(r['metadata']['dataset_id'] == 'ds-a' for r in results)
+
+        results = await collections.search(vectors[25].tolist(), top_k=1)
+        assert results[0]['id'] == 'ds-c-5'
+
+    @pytest.mark.asyncio
+    async def test_stats_configure_and_drop(self, tmp_path):
+        collections = CollectionManager('persistent', path=str(tmp_path))
+        store = collections.get_or_create('t1', 'ds-a')
+        assert isinstance(store, PersistentVectorStore)
+        assert store.path == tmp_path / 't1' / 'ds-a'
+        await _fill(store, 'ds-a', _random_embeddings(4))
+
+        assert isinstance(collections.configure(None, 'ds-h', backend='hnsw', M=4), HNSWVectorStore)
+
+        stats = await collections.get_stats(tenant_id='t1')
+        assert stats['total_collections'] == 1
+        assert stats['total_vectors'] == 4
+        assert stats['collections'][0]['backend'] == 'persistent'
+        assert stats['collections'][0]['dataset_id'] == 'ds-a'
+
+        assert collections.drop(None, 'ds-h')
+        assert not collections.drop(None, 'ds-h')
+        assert collections.keys() == [('t1', 'ds-a')]
+
+
+    @pytest.mark.asyncio
+    async def test_sharded_collections_share_workers(self):
+        collections = CollectionManager('sharded', n_shards=2)
+        vectors = _random_embeddings(40)
+        stores = [collections.get_or_create('t1', f"ds-{i}") for i in range(3)]
+        for i, store in enumerate(stores):
+            await _fill(store, f"ds-{i}", vectors[i * 10:(i + 1) * 10])
+        assert len({id(store.pool) for store in stores}) == 1
+        assert stores[0].pool.size == 2
+
+        results = await collections.search(vectors[13].tolist(), top_k=3, dataset_ids=['ds-1'])
+        assert results[0]['id'] == 'ds-1-3'
+
+        # Dropping a collection keeps the shared workers running
+        pool = stores[0].pool
+        assert collections.drop('t1', 'ds-0')
+        assert all(worker.process.is_alive() for worker in pool.workers)
+        assert (await stores[2].search(vectors[25].tolist(), top_k=1))[0]['id'] == 'ds-2-5'
+
+        collections.close()
+        assert collections.keys() == []
+        assert not any(worker.process.is_alive() for worker in pool.workers)
+
+
+class _FakeEmbeddingService:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def generate_embedding(self, text):
+        return self.vectors[text]
+
+
+class TestRetrieverCollections:
+    """Test DocumentRetriever scoping"""
+
+    @pytest.mark.asyncio
+    async def test_retrieve_is_scoped_to_tenant(self):
+        retriever = DocumentRetriever(None, collections=CollectionManager())
+        vectors = _random_embeddings(10)
+        await _fill(retriever.get_vector_store('ds-a', tenant_id='t1'), 'ds-a', vectors[:5])
+        await _fill(retriever.get_vector_store('ds-b', tenant_id='t2'), 'ds-b', vectors[5:])
+
+        retriever.embedding_service = _FakeEmbeddingService({'q': vectors[7].tolist()})
+
+        results = await retriever.retrieve('q', top_k=3, tenant_id='t1')
+        assert all(r['metadata']['dataset_id'] == 'ds-a' for r in results)
+        assert await retriever.retrieve('q', top_k=3, dataset_id='ds-b', tenant_id='t1') == []
+        assert (await retriever.retrieve('q', top_k=1, dataset_id='ds-b'))[0]['segment_id'] == 'ds-b-2'
+
+        stats = await retriever.get_collection_stats(tenant_id='t2')
+        assert [c['dataset_id'] for c in stats['collections']] == ['ds-b']
+        assert isinstance(retriever.get_vector_store('ds-b'), MemoryVectorStore)
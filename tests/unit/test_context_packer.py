@@ -0,0 +1,112 @@
+"""
+Unit Tests for token-budgeted context packing
+"""
+
+import pytest
+
+from core.rag.context_packer import ContextPacker, estimate_tokens, overlap_length
+from core.rag.rag_pipeline import RAGPipeline
+from document_processing.chunking.text_splitter import TextSplitter
+from knowledge_base.retrieval.retriever import DocumentRetriever
+
+
+TEXT = " ".join(
+    f"Sentence {i} of the handbook explains policy number {i} in some detail."
+    for i in range(40)
+)
+
+
+def _chunks():
+    return TextSplitter(chunk_size=300, chunk_overlap=80).split_text(TEXT)
+
+
+def _hit(chunks, position, document_id='doc-1', score=0.5):
+    return {
+        'text': chunks[position],
+        'segment_id': f"{document_id}-{position}",
+        'document_id': document_id,
+        'position': position,
+        'score': score
+    }
+
+
+class TestContextPacker:
+    """Test ContextPacker"""
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("hello, world") == 5
+        assert estimate_tokens("مرحبا بالعالم") == 2 + 2
+
+    def test_overlap_length(self):
+        assert overlap_length("abcdef", "defxyz") == 3
+        assert overlap_length("abc", "xyz") == 0
+        assert overlap_length("aaaa", "aaab") == 3
+        assert overlap_length("abcdef", "defxyz", max_overlap=2) == 0
+
+    def test_adjacent_chunks_are_merged_without_overlap(self):
+        chunks = _chunks()
+        assert len(chunks) > 4
+        hits = [_hit(chunks, 2, score=0.9), _hit(chunks, 1, score=0.8), _hit(chunks, 3, score=0.7)]
+
+        contexts, report = ContextPacker(token_budget=10000).pack(hits)
+        assert len(contexts) == 1
+        assert [d['segment_id'] for d in contexts[0]['documents']] == ['doc-1-2', 'doc-1-1', 'doc-1-3']
+        merged = contexts[0]['text']
+        assert merged.startswith(chunks[1]) and merged.endswith(chunks[3])
+        assert len(merged) == sum(len(chunks[i]) for i in (1, 2, 3)) - overlap_length(
+            chunks[1], chunks[2]) - overlap_length(chunks[2], chunks[3])
+        assert report['merged'] == 2
+        assert report['tokens_saved'] > 0
+        assert report['tokens_out'] == estimate_tokens(merged)
+
+    def test_duplicates_and_other_documents(self):
+        chunks = _chunks()
+        hits = [
+            _hit(chunks, 0, score=0.9),
+            {**_hit(chunks, 0, document_id='doc-2'), 'position': None},
+            _hit(chunks, 4, document_id='doc-3')
+        ]
+        contexts, report = ContextPacker(token_budget=10000).pack(hits)
+        assert [c['documents'][0]['segment_id'] for c in contexts] == ['doc-1-0', 'doc-3-4']
+        assert report['duplicates'] == 1
+        assert report['merged'] == 0
+
+    def test_budget_is_packed_greedily(self):
+        chunks = _chunks()
+        hits = [_hit(chunks, 0, 'a'), _hit(chunks, 0, 'b'), {'text': 'short note', 'document_id': None}]
+        hits[1]['text'] = chunks[2]
+        budget = estimate_tokens(chunks[0]) + 5
+
+        contexts, report = ContextPacker(token_budget=budget).pack(hits)
+        assert [c['text'] for c in contexts] == [chunks[0], 'short note']
+        assert report['over_budget'] == 1
+        assert report['tokens_out'] <= budget
+
+        # A first passage over the whole budget is truncated, not dropped
+        contexts, report = ContextPacker(token_budget=10).pack(hits[:1])
+        assert chunks[0].startswith(contexts[0]['text'])
+        assert 0 < report['tokens_out'] <= 10
+
+
+class TestPipelinePacking:
+    """Test RAGPipeline context assembly"""
+
+    @pytest.mark.asyncio
+    async def test_sources_follow_packed_contexts(self, monkeypatch):
+        chunks = _chunks()
+
+        async def retrieve(self, query, top_k=5, **kwargs):
+            self.timings = {}
+            return [_hit(chunks, 1, score=0.9), _hit(chunks, 2, score=0.8), _hit(chunks, 4, score=0.7)]
+
+        monkeypatch.setattr(DocumentRetriever, 'retrieve', retrieve)
+        pipeline = RAGPipeline(None, packer=ContextPacker(token_budget=10000))
+
+        result = await pipeline.process_query('policy', top_k=3, use_reranking=False)
+        assert len(result['contexts']) == 2
+        assert result['sources'][0]['segment_ids'] == ['doc-1-1', 'doc-1-2']
+        assert result['sources'][0]['score'] == 0.9
+        assert result['sources'][1]['index'] == 2
+        assert result['context_packing']['tokens_saved'] > 0
+        assert result['total_retrieved'] == 3
@@ -0,0 +1,117 @@
+"""
+Unit Tests for the embedding LRU/TTL cache
+"""
+
+import asyncio
+
+import pytest
+
+from knowledge_base.embeddings.embedding_cache import EmbeddingCache
+from knowledge_base.embeddings.embedding_service import EmbeddingService
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEmbeddingCache:
+    """Test EmbeddingCache"""
+
+    def test_lru_eviction_and_ttl(self):
+        clock = _Clock()
+        cache = EmbeddingCache(max_size=2, ttl_seconds=10, clock=clock)
+        cache.set('a', [1.0])
+        cache.set('b', [2.0])
+        assert cache.get('a') == [1.0]
+        cache.set('c', [3.0])
+
+        # 'b' was least recently used
+        assert cache.get('b') is None
+        assert cache.get('a') == [1.0]
+
+        clock.now = 11
+        assert cache.get('c') is None
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions'], stats['expirations']) == (2, 2, 1, 1)
+
+    def test_key_normalizes_whitespace(self):
+        assert EmbeddingCache.make_key('  What is\n revenue? ', 'm', 8) == ('What is revenue?', 'm', 8)
+        assert EmbeddingCache.make_key('x', 'm', 8) != EmbeddingCache.make_key('x', 'other', 8)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_one_call(self):
+        cache = EmbeddingCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [0.5]
+
+        results = await asyncio.gather(*[cache.get_or_compute('q', compute) for _ in range(5)])
+        assert results == [[0.5]] * 5
+        assert len(calls) == 1
+        assert cache.stats()['shared_inflight'] == 4
+        assert await cache.get_or_compute('q', compute) == [0.5]
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self):
+        cache = EmbeddingCache()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError('boom')
+
+        async def compute():
+            return [1.0]
+
+        outcomes = await asyncio.gather(
+            cache.get_or_compute('q', fail), cache.get_or_compute('q', fail), return_exceptions=True
+        )
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert len(cache) == 0
+        assert await cache.get_or_compute('q', compute) == [1.0]
+
+
+class TestEmbeddingServiceCache:
+    """Test EmbeddingService caching"""
+
+    @pytest.mark.asyncio
+    async def test_only_misses_are_requested(self, monkeypatch):
+        service = EmbeddingService(cache=EmbeddingCache(max_size=100))
+        requested = []
+
+        async def request(texts, batch_size):
+            requested.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        monkeypatch.setattr(service, '_request_embeddings', request)
+
+        assert await service.generate_embedding('faq') == [3.0]
+        embeddings = await service.generate_embeddings(['faq ', 'new question', 'new question'])
+        assert embeddings == [[3.0], [12.0], [12.0]]
+        assert requested == [['faq'], ['new question']]
+        assert service.get_cache_stats()['hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_uncached_path_leaves_cache_alone(self, monkeypatch):
+        service = EmbeddingService(cache=EmbeddingCache(max_size=2))
+        requested = []
+
+        async def request(texts, batch_size):
+            requested.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        monkeypatch.setattr(service, '_request_embeddings', request)
+
+        await service.generate_embedding('hot query')
+        embeddings = await service.generate_embeddings(['doc one', 'doc two', 'hot query'], use_cache=False)
+        assert embeddings == [[7.0], [7.0], [9.0]]
+        assert len(service.cache) == 1
+        assert await service.generate_embedding('hot query') == [9.0]
+        assert requested == [['hot query'], ['doc one', 'doc two', 'hot query']]
@@ -0,0 +1,165 @@
+"""
+Unit Tests for hybrid search rank fusion
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.fusion import FusionConfig, FusionLeg, fuse
+from knowledge_base.retrieval.hybrid_search import HybridSearchEngine
+from knowledge_base.vector_store.memory_store import MemoryVectorStore
+
+
+def _leg(name, scored, weight=1.0, exhausted=True):
+    return FusionLeg(name, [{'id': doc_id, 'score': score, 'search_type': name} for doc_id, score in scored],
+                     weight, exhausted)
+
+
+def _random_legs(seed, n=40, exhausted=True):
+    rng = np.random.default_rng(seed)
+    legs = []
+    for name, weight in (('vector', 0.7), ('keyword', 0.3)):
+        ids = rng.choice(n, size=n // 2, replace=False)
+        scores = np.sort(rng.random(n // 2))[::-1]
+        legs.append(_leg(name, [(f"d{i}", float(s)) for i, s in zip(ids, scores)], weight, exhausted))
+    return legs
+
+
+class _FakeEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def generate(self, text):
+        if isinstance(text, str):
+            return self.vectors[text]
+        return [self.vectors[t] for t in text]
+
+
+class TestFuse:
+    """Test fuse strategies and the early cutoff"""
+
+    def test_rrf(self):
+        legs = [_leg('vector', [('a', 0.9), ('b', 0.8)]), _leg('keyword', [('b', 7.0), ('c', 2.0)])]
+        results, report = fuse(legs, 3, FusionConfig(strategy='rrf', rrf_k=60, early_cutoff=False))
+        assert [r['id'] for r in results] == ['b', 'a', 'c']
+        assert results[0]['combined_score'] == pytest.approx(1 / 62 + 1 / 61)
+        assert results[0]['search_types'] == ['vector', 'keyword']
+        assert results[0]['score'] == 0.8  # the first leg's hit is kept
+        assert report['strategy'] == 'rrf' and report['complete']
+
+    def test_normalization_balances_legs(self):
+        # Raw cosines ~0.8 would drown a strong keyword match under 'weighted'
+        legs = [
+            _leg('vector', [('a', 0.92), ('b', 0.88), ('c', 0.80)], 0.7),
+            _leg('keyword', [('c', 9.0), ('b', 1.0)], 0.3)
+        ]
+        weighted, _ = fuse(legs, 3, FusionConfig(strategy='weighted'))
+        assert weighted[0]['id'] == 'c'  # BM25's raw scale dominates instead
+        # The engine's weighted_score puts BM25 on [0, 1] first
+        for result in legs[0].results:
+            result['weighted_score'] = result['score'] * 0.7
+        for result in legs[1].results:
+            result['weighted_score'] = result['score'] / 9.0 * 0.3
+        weighted, _ = fuse(legs, 3, FusionConfig(strategy='weighted'))
+        assert [r['combined_score'] for r in weighted] == pytest.approx([0.56 + 0.3, 0.616 + 0.3 / 9, 0.644])
+        minmax, _ = fuse(legs, 3, FusionConfig(strategy='minmax'))
+        assert [r['id'] for r in minmax] == ['a', 'b', 'c']
+        assert minmax[0]['combined_score'] == pytest.approx(0.7)
+        zscore, _ = fuse(legs, 3, FusionConfig(strategy='zscore'))
+        assert {r['id'] for r in zscore} == {'a', 'b', 'c'}
+
+    @pytest.mark.parametrize('strategy', ['rrf', 'minmax', 'zscore', 'weighted'])
+    def test_early_cutoff_matches_full_merge(self, strategy):
+        for seed in range(20):
+            legs = _random_legs(seed)
+            full, _ = fuse(legs, 5, FusionConfig(strategy=strategy, early_cutoff=False))
+            early, report = fuse(legs, 5, FusionConfig(strategy=strategy))
+            assert [r['id'] for r in early] == [r['id'] for r in full]
+            assert report['complete']
+
+    @pytest.mark.parametrize('strategy', ['rrf', 'minmax', 'zscore', 'weighted'])
+    def test_partial_fetch_matches_full_depth(self, strategy):
+        # A settled top-k over a prefix of each leg is the full-depth top-k
+        shared = [_leg(name, [(f"d{i}", 1 - i / 100) for i in range(20)]) for name in ('vector', 'keyword')]
+        settled = 0
+        for legs in [shared] + [_random_legs(seed) for seed in range(20)]:
+            full, _ = fuse(legs, 5, FusionConfig(strategy=strategy))
+            for depth in (5, 10):
+                prefix = [FusionLeg(leg.name, leg.results[:depth], leg.weight, False) for leg in legs]
+                early, report = fuse(prefix, 5, FusionConfig(strategy=strategy))
+                if report['complete']:
+                    settled += 1
+                    assert [r['id'] for r in early] == [r['id'] for r in full]
+        if strategy in ('minmax', 'zscore'):
+            assert settled == 0 and FusionConfig(strategy=strategy).fetch_multiplier == 4
+        else:
+            assert settled > 0
+
+    def test_cutoff_stops_early(self):
+        legs = [
+            _leg('vector', [(f"d{i}", 1 - i / 100) for i in range(50)]),
+            _leg('keyword', [(f"d{i}", 1 - i / 100) for i in range(50)])
+        ]
+        results, report = fuse(legs, 3, FusionConfig(strategy='rrf'))
+        assert [r['id'] for r in results] == ['d0', 'd1', 'd2']
+        assert report['complete'] and report['depth'] == 3 and report['candidates'] == 3
+
+    def test_unsettled_when_legs_may_go_deeper(self):
+        # 'b' might sit just below the keyword leg's last hit
+        legs = [
+            _leg('vector', [('a', 0.9), ('b', 0.89)], exhausted=False),
+            _leg('keyword', [('a', 3.0), ('c', 2.9)], exhausted=False)
+        ]
+        _, report = fuse(legs, 2, FusionConfig(strategy='rrf'))
+        assert not report['complete']
+
+    def test_empty_and_invalid(self):
+        assert fuse([_leg('vector', [])], 3, FusionConfig()) == (
+            [], {'strategy': 'minmax', 'depth': 0, 'candidates': 0, 'complete': True}
+        )
+        with pytest.raises(ValueError):
+            FusionConfig(strategy='borda')
+        with pytest.raises(ValueError):
+            FusionConfig(candidate_multiplier=5, max_candidate_multiplier=4)
+
+
+class TestHybridFusion:
+    """Test fusion settings in HybridSearchEngine"""
+
+    async def _engine(self):
+        store = MemoryVectorStore()
+        vectors = np.random.default_rng(0).standard_normal((60, 16)).astype(np.float32)
+        for i in range(60):
+            await store.add_document(f"doc{i}", f"report section{i} revenue", vectors[i].tolist())
+        return HybridSearchEngine(_FakeEmbeddings({'revenue section4': vectors[4].tolist()}), store)
+
+    @pytest.mark.asyncio
+    async def test_per_index_config(self):
+        engine = await self._engine()
+        config = engine.configure_index('general', strategy='rrf', rrf_k=10)
+        assert engine.fusion_config('general') is config
+        assert engine.fusion_config('other') is engine.fusion
+        assert config.candidate_multiplier == engine.fusion.candidate_multiplier
+
+        results, report = await engine.search('revenue section4', top_k=3, return_report=True)
+        assert results[0]['id'] == 'doc4'
+        assert results[0]['search_types'] == ['vector', 'keyword']
+        assert report['strategy'] == 'rrf'
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('strategy', ['rrf', 'minmax', 'zscore'])
+    async def test_shallow_fetch_matches_deep_fetch(self, strategy):
+        engine = await self._engine()
+        engine.configure_index('general', strategy=strategy, candidate_multiplier=4, early_cutoff=False)
+        deep = await engine.search('revenue section4', top_k=5)
+
+        engine.configure_index('general', strategy=strategy, candidate_multiplier=1)
+        shallow, report = await engine.search('revenue section4', top_k=5, return_report=True)
+        assert report['fetched'] <= 20
+        assert shallow[0]['id'] == deep[0]['id'] == 'doc4'
+        if strategy == 'rrf':
+            # Rank contributions do not depend on the fetch depth
+            assert {r['id'] for r in shallow} == {r['id'] for r in deep}
+
+        batched = await engine.search_many(['revenue section4'], top_k=5)
+        assert [r['id'] for r in batched[0]] == [r['id'] for r in shallow]
@@ -0,0 +1,157 @@
+"""
+Unit Tests for the HNSW vector store backend
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.factory import create_vector_store
+from knowledge_base.vector_store.hnsw_vector_store import HNSWVectorStore
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+
+
+def _corpus(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+async def _build(n=500, **params):
+    store = HNSWVectorStore(seed=42, **params)
+    vectors = _corpus(n)
+    await store.add_embeddings(
+        texts=[f"t{i}" for i in range(n)],
+        embeddings=vectors.tolist(),
+        metadatas=[{'dataset_id': 'a' if i % 4 == 0 else 'b'} for i in range(n)],
+        ids=[f"id{i}" for i in range(n)]
+    )
+    return store, vectors
+
+
+class TestHNSWVectorStore:
+    """Test HNSWVectorStore"""
+
+    @pytest.mark.asyncio
+    async def test_finds_exact_match(self):
+        store, vectors = await _build()
+        results = await store.search(vectors[123].tolist(), top_k=3)
+        assert results[0]['id'] == 'id123'
+        assert results[0]['score'] == pytest.approx(1.0, abs=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_recall_report(self):
+        store, _ = await _build(M=8, ef_construction=100)
+        report = store.measure_recall(_corpus(20, seed=3), top_k=10, ef_values=[10, 200])
+        assert set(report) == {10, 200}
+        assert report[200]['recall'] >= 0.9
+        assert report[200]['recall'] >= report[10]['recall']
+        assert (await store.get_stats())['recall'] == report
+
+    @pytest.mark.asyncio
+    async def test_tombstone_delete_and_reinsert(self):
+        store, vectors = await _build()
+        assert await store.delete(['id7'])
+
+        results = await store.search(vectors[7].tolist(), top_k=5)
+        assert 'id7' not in [r['id'] for r in results]
+
+        stats = await store.get_stats()
+        assert stats['total_vectors'] == 499
+        assert stats['deleted_vectors'] == 1
+
+        await store.add_embeddings(['again'], [vectors[7].tolist()], [{}], ids=['id7'])
+        results = await store.search(vectors[7].tolist(), top_k=1)
+        assert results[0]['id'] == 'id7'
+        assert results[0]['text'] == 'again'
+
+    @pytest.mark.asyncio
+    async def test_tombstones_do_not_shrink_results(self):
+        store, vectors = await _build(ef_search=8, compaction_threshold=1.0)
+        # Tombstone the query's whole neighbourhood
+        neighbours = np.argsort(-(vectors @ vectors[0]))[:40]
+        await store.delete([f"id{i}" for i in neighbours])
+
+        results = await store.search(vectors[0].tolist(), top_k=10)
+        assert len(results) == 10
+        assert not {r['id'] for r in results} & {f"id{i}" for i in neighbours}
+
+    @pytest.mark.asyncio
+    async def test_compaction_rebuilds_graph(self):
+        store, vectors = await _build(n=200)
+        await store.delete([f"id{i}" for i in range(40)])
+        assert (await store.get_stats())['deleted_vectors'] == 40
+
+        # Crossing compaction_threshold rebuilds from the live nodes
+        await store.delete([f"id{i}" for i in range(40, 60)])
+        stats = await store.get_stats()
+        assert stats['deleted_vectors'] == 0
+        assert stats['total_vectors'] == 140
+        assert store._size == 140
+        results = await store.search(vectors[100].tolist(), top_k=1)
+        assert results[0]['id'] == 'id100'
+        assert results[0]['metadata']['dataset_id'] == 'a'
+        assert sorted(await store.get_ids()) == sorted(f"id{i}" for i in range(60, 200))
+
+    @pytest.mark.asyncio
+    async def test_search_with_filter(self):
+        store, vectors = await _build()
+        results = await store.search(vectors[8].tolist(), top_k=10, filter={'dataset_id': 'a'})
+        assert len(results) == 10
+        assert results[0]['id'] == 'id8'
+        assert all(r['metadata']['dataset_id'] == 'a' for r in results)
+
+
+    @pytest.mark.asyncio
+    async def test_selective_filter_scans_matching_rows(self, monkeypatch):
+        store, vectors = await _build()
+        await store.delete(['id8'])
+        reference = vectors[[i for i in range(0, 500, 4) if i != 8]]
+        expected = [f"id{i}" for i in range(0, 500, 4) if i != 8]
+
+        knn_calls = []
+        knn = store._knn
+        monkeypatch.setattr(store, '_knn', lambda *args: knn_calls.append(args) or knn(*args))
+
+        results = await store.search(vectors[8].tolist(), top_k=5, filter={'dataset_id': 'a'})
+        scores = (reference / np.linalg.norm(reference, axis=1, keepdims=True)) @ (vectors[8] / np.linalg.norm(vectors[8]))
+        assert [r['id'] for r in results] == [expected[j] for j in np.argsort(-scores)[:5]]
+        assert knn_calls == []
+
+        # A broad filter still walks the graph
+        await store.search(vectors[9].tolist(), top_k=5, filter={'dataset_id': 'b'})
+        assert knn_calls
+
+    @pytest.mark.asyncio
+    async def test_clear_keeps_seed(self):
+        store, vectors = await _build(n=200)
+        links = [list(map(list, node)) for node in store._links]
+        store.clear()
+        assert store.seed == 42 and (await store.get_stats())['total_vectors'] == 0
+
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(200)],
+            embeddings=vectors[:200].tolist(),
+            metadatas=[{} for _ in range(200)],
+            ids=[f"id{i}" for i in range(200)]
+        )
+        assert [list(map(list, node)) for node in store._links] == links
+
+
+class TestVectorStoreFactory:
+    """Test backend selection"""
+
+    def test_create_backends(self):
+        assert isinstance(create_vector_store(), MemoryVectorStore)
+        store = create_vector_store('hnsw', M=4, ef_search=32)
+        assert isinstance(store, HNSWVectorStore)
+        assert store.ef_search == 32
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_vector_store('faiss')
+
+    def test_retriever_selects_backend_per_dataset(self):
+        from knowledge_base.retrieval.retriever import DocumentRetriever
+
+        retriever = DocumentRetriever(None, dataset_backends={'ds-1': {'backend': 'hnsw', 'M': 8}})
+        assert isinstance(retriever.get_vector_store('ds-1'), HNSWVectorStore)
+        assert isinstance(retriever.get_vector_store('ds-2'), MemoryVectorStore)
+        assert retriever.get_vector_store('ds-2') is retriever.get_vector_store('ds-2')
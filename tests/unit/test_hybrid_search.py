@@ -0,0 +1,136 @@
+"""
+Unit Tests for concurrent hybrid search legs
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.hybrid_search import HybridSearchEngine
+from knowledge_base.vector_store.keyword_index import KeywordIndex
+from knowledge_base.vector_store.memory_store import MemoryVectorStore
+
+
+class _SlowEmbeddings:
+    def __init__(self, vector, delay=0.0, error=None):
+        self.vector = vector
+        self.delay = delay
+        self.error = error
+
+    async def generate(self, text):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        if isinstance(text, str):
+            return self.vector
+        return [self.vector for _ in text]
+
+
+async def _store():
+    store = MemoryVectorStore()
+    vectors = np.random.default_rng(0).standard_normal((20, 8)).astype(np.float32)
+    for i in range(20):
+        await store.add_document(f"doc{i}", f"policy section{i}", vectors[i].tolist())
+    return store, vectors
+
+
+@pytest.fixture
+def slow_keyword_scoring(monkeypatch):
+    threads = []
+    search = KeywordIndex.search
+
+    def slow_search(self, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.1)
+        return search(self, *args, **kwargs)
+
+    monkeypatch.setattr(KeywordIndex, 'search', slow_search)
+    return threads
+
+
+class TestConcurrentLegs:
+    """Test HybridSearchEngine running its legs concurrently"""
+
+    @pytest.mark.asyncio
+    async def test_legs_overlap_off_the_event_loop(self, slow_keyword_scoring):
+        store, vectors = await _store()
+        engine = HybridSearchEngine(_SlowEmbeddings(vectors[3].tolist(), delay=0.1), store)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        results, report = await engine.search('policy section3', top_k=3, return_report=True)
+        elapsed = time.perf_counter() - started
+        task.cancel()
+
+        assert results[0]['id'] == 'doc3'
+        assert elapsed < 0.18  # embedding and keyword scoring overlapped
+        assert ticks >= 5  # the loop kept running while keywords were scored
+        assert all(name.startswith('hybrid-scoring') for name in slow_keyword_scoring)
+        assert report['degraded'] == {}
+
+    @pytest.mark.asyncio
+    async def test_slow_vector_leg_degrades_to_keywords(self):
+        store, vectors = await _store()
+        engine = HybridSearchEngine(_SlowEmbeddings(vectors[3].tolist(), delay=1.0), store, vector_timeout=0.05)
+
+        started = time.perf_counter()
+        results, report = await engine.search('policy section7', top_k=3, return_report=True)
+        assert time.perf_counter() - started < 0.5
+        assert results[0]['id'] == 'doc7'
+        assert {t for r in results for t in r['search_types']} == {'keyword'}
+        assert report['degraded'] == {'vector': 'timeout'}
+
+    @pytest.mark.asyncio
+    async def test_slow_keyword_leg_degrades_to_vectors(self, slow_keyword_scoring):
+        store, vectors = await _store()
+        engine = HybridSearchEngine(_SlowEmbeddings(vectors[5].tolist()), store, keyword_timeout=0.02)
+
+        results, report = await engine.search('policy section3', top_k=3, return_report=True)
+        assert results[0]['id'] == 'doc5'
+        assert results[0]['search_types'] == ['vector']
+        assert report['degraded'] == {'keyword': 'timeout'}
+
+    @pytest.mark.asyncio
+    async def test_zero_timeout_is_not_the_default(self, slow_keyword_scoring):
+        store, vectors = await _store()
+        engine = HybridSearchEngine(_SlowEmbeddings(vectors[5].tolist()), store, keyword_timeout=0)
+        assert engine.keyword_timeout == 0
+
+        results, report = await engine.search('policy section3', top_k=3, return_report=True)
+        assert results[0]['search_types'] == ['vector']
+        assert report['degraded'] == {'keyword': 'timeout'}
+
+    @pytest.mark.asyncio
+    async def test_failed_embedding_in_batch(self):
+        store, vectors = await _store()
+        engine = HybridSearchEngine(_SlowEmbeddings(None, error=RuntimeError("quota")), store)
+
+        batched, reports = await engine.search_many(
+            ['policy section1', 'policy section2'], top_k=2, return_report=True
+        )
+        assert [results[0]['id'] for results in batched] == ['doc1', 'doc2']
+        assert [report['degraded'] for report in reports] == [{'vector': 'failed'}] * 2
+
+        _, report = await engine.search('policy section1', top_k=2, return_report=True)
+        assert report['degraded'] == {'vector': 'failed'}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_keep_their_reports(self):
+        store, vectors = await _store()
+        slow = HybridSearchEngine(_SlowEmbeddings(vectors[3].tolist(), delay=1.0), store, vector_timeout=0.05)
+        searches = [slow.search(f'policy section{i}', top_k=2, return_report=True) for i in range(3)]
+        searches.append(slow.search('policy section4', top_k=2, use_vector=False, return_report=True))
+
+        reports = [report for _, report in await asyncio.gather(*searches)]
+        assert [report['degraded'] for report in reports] == [{'vector': 'timeout'}] * 3 + [{}]
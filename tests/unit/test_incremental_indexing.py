@@ -0,0 +1,103 @@
+"""
+Unit Tests for incremental dataset indexing
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Document, DocumentSegment
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+
+
+class _CountingEmbeddingService:
+    def __init__(self):
+        self.embedded = []
+
+    async def generate_embeddings(self, texts, use_cache=True):
+        self.embedded.extend(texts)
+        return [
+            np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)[:16].astype(float).tolist()
+            for text in texts
+        ]
+
+    def get_embedding_dimension(self):
+        return 16
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    Document.metadata.create_all(engine, tables=[Document.__table__, DocumentSegment.__table__])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _add_document(db, document_id, dataset_id, texts):
+    db.add(Document(id=document_id, name=f"{document_id}.txt", type='txt', dataset_id=dataset_id))
+    for i, text in enumerate(texts):
+        db.add(DocumentSegment(id=f"{document_id}-{i}", document_id=document_id, content=text, position=i))
+    db.commit()
+
+
+def _diff(result):
+    return {key: result[key] for key in ('added', 'updated', 'removed', 'skipped')}
+
+
+class TestIncrementalIndexing:
+    """Test DocumentRetriever.index_dataset diffs"""
+
+    @pytest.mark.asyncio
+    async def test_only_changes_are_embedded(self, db):
+        _add_document(db, 'doc-1', 'ds-a', ['alpha', 'beta', 'gamma'])
+        _add_document(db, 'doc-x', 'ds-other', ['elsewhere'])
+        retriever = DocumentRetriever(db, collections=CollectionManager())
+        embeddings = retriever.embedding_service = _CountingEmbeddingService()
+
+        result = await retriever.index_dataset('ds-a', tenant_id='t1')
+        assert _diff(result) == {'added': 3, 'updated': 0, 'removed': 0, 'skipped': 0}
+        segment = db.get(DocumentSegment, 'doc-1-0')
+        assert segment.index_node_id == 'doc-1-0'
+        assert segment.index_node_hash == hashlib.sha256(b'alpha').hexdigest()
+
+        # New document, one edit, one deletion and one disabled segment
+        _add_document(db, 'doc-2', 'ds-a', ['delta'])
+        db.get(DocumentSegment, 'doc-1-1').content = 'beta v2'
+        db.delete(db.get(DocumentSegment, 'doc-1-2'))
+        db.get(DocumentSegment, 'doc-1-0').enabled = False
+        db.commit()
+
+        embeddings.embedded.clear()
+        result = await retriever.index_dataset('ds-a', tenant_id='t1')
+        assert _diff(result) == {'added': 1, 'updated': 1, 'removed': 2, 'skipped': 0}
+        assert sorted(embeddings.embedded) == ['beta v2', 'delta']
+        store = retriever.get_vector_store('ds-a', 't1')
+        assert sorted(await store.get_ids()) == ['doc-1-1', 'doc-2-0']
+        assert db.get(DocumentSegment, 'doc-1-0').index_node_hash is None
+
+        embeddings.embedded.clear()
+        result = await retriever.index_dataset('ds-a', tenant_id='t1')
+        assert _diff(result) == {'added': 0, 'updated': 0, 'removed': 0, 'skipped': 2}
+        assert embeddings.embedded == []
+
+        result = await retriever.index_dataset('ds-a', tenant_id='t1', full=True)
+        assert _diff(result) == {'added': 0, 'updated': 2, 'removed': 0, 'skipped': 0}
+
+    @pytest.mark.asyncio
+    async def test_empty_store_is_rebuilt_despite_recorded_hashes(self, db):
+        _add_document(db, 'doc-1', 'ds-a', ['alpha', 'beta'])
+        embeddings = _CountingEmbeddingService()
+        first = DocumentRetriever(db, collections=CollectionManager())
+        first.embedding_service = embeddings
+        await first.index_dataset('ds-a', tenant_id='t1')
+
+        # A new process starts with an empty in-memory collection
+        restarted = DocumentRetriever(db, collections=CollectionManager())
+        restarted.embedding_service = embeddings
+        result = await restarted.index_dataset('ds-a', tenant_id='t1')
+        assert _diff(result) == {'added': 2, 'updated': 0, 'removed': 0, 'skipped': 0}
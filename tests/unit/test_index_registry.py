@@ -0,0 +1,145 @@
+"""
+Unit Tests for the process-wide dataset index registry
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Dataset, Document, DocumentSegment
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry, DatasetNotFoundError
+from knowledge_base.retrieval import retriever as retriever_module
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestDatasetIndexRegistry:
+    """Test DatasetIndexRegistry"""
+
+    @pytest.fixture
+    def loads(self, monkeypatch):
+        """Replace database indexing with a fake that records each load"""
+        calls = []
+        vectors = _random_embeddings(4)
+
+        async def index_dataset(retriever, dataset_id, tenant_id=None):
+            calls.append(dataset_id)
+            await asyncio.sleep(0)
+            await retriever.get_vector_store(dataset_id, tenant_id).add_embeddings(
+                texts=[f"{dataset_id} {i}" for i in range(4)],
+                embeddings=vectors.tolist(),
+                metadatas=[{'segment_id': f"{dataset_id}-{i}"} for i in range(4)],
+                ids=[f"{dataset_id}-{i}" for i in range(4)]
+            )
+            return {'indexed': 4, 'dataset_id': dataset_id}
+
+        monkeypatch.setattr(DocumentRetriever, 'index_dataset', index_dataset)
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_use_loads_once(self, loads):
+        registry = DatasetIndexRegistry(CollectionManager())
+
+        loaded = await asyncio.gather(*[
+            registry.ensure_loaded(None, 'ds-a', tenant_id='t1') for _ in range(5)
+        ])
+        assert sum(loaded) == 1
+        assert loads == ['ds-a']
+        assert not await registry.ensure_loaded(None, 'ds-a', tenant_id='t1')
+
+        # Requests share the loaded collection
+        store = registry.retriever(None).get_vector_store('ds-a', 't1')
+        assert (await store.get_stats())['total_vectors'] == 4
+
+        assert await registry.remove_segments('ds-a', ['ds-a-0', 'ds-a-1'], tenant_id='t1')
+        assert (await store.get_stats())['total_vectors'] == 2
+        assert not await registry.remove_segments('ds-b', ['ds-b-0'], tenant_id='t1')
+
+        assert registry.drop('ds-a', tenant_id='t1')
+        assert not registry.is_loaded('ds-a')
+        await registry.ensure_loaded(None, 'ds-a', tenant_id='t1')
+        assert loads == ['ds-a', 'ds-a']
+
+    @pytest.mark.asyncio
+    async def test_datasets_are_scoped_by_tenant(self, loads):
+        engine = create_engine('sqlite://')
+        Dataset.metadata.create_all(engine, tables=[Dataset.__table__])
+        db = sessionmaker(bind=engine)()
+        db.add(Dataset(id='ds-a', name='a', tenant_id='t1'))
+        db.commit()
+        registry = DatasetIndexRegistry(CollectionManager())
+
+        # Another tenant can neither load nor index the dataset
+        with pytest.raises(DatasetNotFoundError):
+            await registry.ensure_loaded(db, 'ds-a', tenant_id='t2')
+        with pytest.raises(DatasetNotFoundError):
+            await registry.reload(db, 'ds-a', tenant_id='t2')
+        with pytest.raises(DatasetNotFoundError):
+            await registry.ensure_loaded(db, 'missing', tenant_id='t1')
+        assert loads == [] and registry.collections.keys() == []
+
+        assert await registry.ensure_loaded(db, 'ds-a', tenant_id='t1')
+        assert registry.is_loaded('ds-a', 't1') and not registry.is_loaded('ds-a', 't2')
+        assert registry.collections.keys() == [('t1', 'ds-a')]
+
+        # Nor remove or drop the owner's index
+        assert not await registry.remove_segments('ds-a', ['ds-a-0'], tenant_id='t2')
+        assert not registry.drop('ds-a', tenant_id='t2')
+        assert registry.is_loaded('ds-a', 't1')
+        store = registry.collections.get('t1', 'ds-a')
+        assert (await store.get_stats())['total_vectors'] == 4
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_synced_with_database(self, tmp_path, monkeypatch):
+        engine = create_engine('sqlite://')
+        Dataset.metadata.create_all(
+            engine, tables=[Dataset.__table__, Document.__table__, DocumentSegment.__table__]
+        )
+        db = sessionmaker(bind=engine)()
+        db.add(Dataset(id='ds-a', name='a', tenant_id='t1'))
+        db.add(Document(id='doc-1', name='doc-1.txt', type='txt', dataset_id='ds-a'))
+        for i, text in enumerate(['alpha', 'beta', 'gamma']):
+            db.add(DocumentSegment(id=f"doc-1-{i}", document_id='doc-1', content=text, position=i))
+        db.commit()
+        embedded = []
+
+        class Embeddings:
+            async def generate_embeddings(self, texts, use_cache=True):
+                embedded.extend(texts)
+                return _random_embeddings(len(texts)).tolist()
+
+            def get_embedding_dimension(self):
+                return 16
+
+        monkeypatch.setattr(retriever_module, 'embedding_service', Embeddings())
+
+        first = DatasetIndexRegistry(CollectionManager('persistent', path=str(tmp_path)))
+        assert await first.ensure_loaded(db, 'ds-a', tenant_id='t1')
+        first.close()
+
+        # The database moves on while the snapshot stays as written
+        db.get(DocumentSegment, 'doc-1-1').content = 'beta v2'
+        db.delete(db.get(DocumentSegment, 'doc-1-2'))
+        db.add(DocumentSegment(id='doc-1-3', document_id='doc-1', content='delta', position=3))
+        db.commit()
+
+        embedded.clear()
+        registry = DatasetIndexRegistry(CollectionManager('persistent', path=str(tmp_path)))
+        assert await registry.ensure_loaded(db, 'ds-a', tenant_id='t1')
+        assert sorted(embedded) == ['beta v2', 'delta']
+        store = registry.collections.get('t1', 'ds-a')
+        assert sorted(await store.get_ids()) == ['doc-1-0', 'doc-1-1', 'doc-1-3']
+        stats = registry.get_stats()
+        assert stats['loaded_datasets'] == ['ds-a']
+        assert stats['collections'] == 1
+        registry.close()
+        db.close()
@@ -0,0 +1,118 @@
+"""
+Unit Tests for the IVF-PQ vector store backend
+"""
+
+import gc
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.ivfpq_vector_store import IVFPQVectorStore, kmeans, nearest_centroid
+
+
+def _corpus(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((8, dim)).astype(np.float32)
+    return centers[rng.integers(0, 8, n)] + 0.2 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+async def _build(n=2000, **params):
+    store = IVFPQVectorStore(n_lists=16, n_subvectors=8, train_size=1000, **params)
+    vectors = _corpus(n)
+    await store.add_embeddings(
+        texts=[f"t{i}" for i in range(n)],
+        embeddings=vectors.tolist(),
+        metadatas=[{'dataset_id': 'a' if i % 2 else 'b'} for i in range(n)],
+        ids=[f"id{i}" for i in range(n)]
+    )
+    return store, vectors
+
+
+class TestKMeans:
+    """Test k-means helpers"""
+
+    def test_recovers_separated_clusters(self):
+        data = np.concatenate([
+            np.full((50, 2), -5.0, dtype=np.float32),
+            np.full((50, 2), 5.0, dtype=np.float32)
+        ])
+        centroids = kmeans(data, 2, iterations=5)
+        assignments = nearest_centroid(data, centroids)
+        assert len(set(assignments[:50])) == 1
+        assert assignments[0] != assignments[-1]
+
+
+class TestIVFPQVectorStore:
+    """Test IVFPQVectorStore"""
+
+    @pytest.mark.asyncio
+    async def test_untrained_buffer_is_searchable(self):
+        store, vectors = await _build(n=100)
+        assert not store.is_trained
+        results = await store.search(vectors[10].tolist(), top_k=1)
+        assert results[0]['id'] == 'id10'
+
+    @pytest.mark.asyncio
+    async def test_trains_and_finds_neighbours(self):
+        store, vectors = await _build(nprobe=16)
+        assert store.is_trained
+
+        results = await store.search(vectors[42].tolist(), top_k=5)
+        assert results[0]['id'] == 'id42'
+        assert results[0]['score'] == pytest.approx(1.0, abs=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_adc_scores_without_rescoring(self):
+        store, vectors = await _build(nprobe=16, rescore=False)
+        results = await store.search(vectors[42].tolist(), top_k=10)
+        assert 'id42' in [r['id'] for r in results]
+
+        stats = await store.get_stats()
+        assert stats['code_bytes_per_vector'] == 8
+        assert stats['full_vectors_bytes'] == 0
+
+    @pytest.mark.asyncio
+    async def test_filter_and_delete(self):
+        store, vectors = await _build(nprobe=16)
+        results = await store.search(vectors[43].tolist(), top_k=5, filter={'dataset_id': 'a'})
+        assert results[0]['id'] == 'id43'
+        assert all(r['metadata']['dataset_id'] == 'a' for r in results)
+
+        assert await store.delete(['id43'])
+        results = await store.search(vectors[43].tolist(), top_k=5)
+        assert 'id43' not in [r['id'] for r in results]
+        assert (await store.get_stats())['total_vectors'] == 1999
+
+    @pytest.mark.asyncio
+    async def test_full_vectors_on_disk(self, tmp_path):
+        path = tmp_path / 'full.f32'
+        path.write_bytes(b'\x00' * 64)  # left over from a previous run
+        store, vectors = await _build(nprobe=16, full_vectors_path=str(path))
+        assert path.stat().st_size == 2000 * 32 * 4
+
+        # Reopening does not grow the file with dead rows
+        store, vectors = await _build(nprobe=16, full_vectors_path=str(path))
+        assert path.stat().st_size == 2000 * 32 * 4
+
+        results = await store.search(vectors[7].tolist(), top_k=1)
+        assert results[0]['id'] == 'id7'
+        assert results[0]['score'] == pytest.approx(1.0, abs=1e-5)
+        assert (await store.get_stats())['full_vectors_on_disk']
+
+    @pytest.mark.asyncio
+    async def test_default_rescoring_is_memory_mapped(self):
+        store, vectors = await _build(nprobe=16)
+        path = store.full_vectors_path
+        assert path.stat().st_size == 2000 * 32 * 4
+        assert isinstance(store._full_vectors(), np.memmap)
+        assert (await store.get_stats())['full_vectors_on_disk']
+
+        # Tombstone flags grow geometrically, not per add
+        assert len(store._deleted) == 2048
+        await store.add_embeddings(['x'], [vectors[0].tolist()], [{}], ids=['id0'])
+        assert len(store._deleted) == 2048
+        assert (await store.search(vectors[0].tolist(), top_k=1))[0]['text'] == 'x'
+
+        del store
+        gc.collect()
+        assert not path.exists()
@@ -0,0 +1,120 @@
+"""
+Unit Tests for the BM25 keyword index
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.hybrid_search import HybridSearchEngine
+from knowledge_base.vector_store.keyword_index import KeywordIndex, analyze
+from knowledge_base.vector_store.memory_store import MemoryVectorStore
+
+
+class _FakeEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    async def generate(self, text):
+        if isinstance(text, str):
+            return self.vector
+        return [self.vector for _ in text]
+
+
+class TestKeywordIndex:
+    """Test KeywordIndex"""
+
+    def test_precomputed_terms_match_analyzed_queries(self):
+        index = KeywordIndex()
+        index.add_terms('a', analyze("الشركات والمدارس"))
+        index.add('b', "الشركة")
+        index.add('c', "The revenue, in Q3 is UP!")
+        assert {doc_id for doc_id, _ in index.search("شركة", top_k=5)} == {'a', 'b'}
+        assert [doc_id for doc_id, _ in index.search("revenues", top_k=5)] == ['c']
+
+    def test_bm25_ranking(self):
+        index = KeywordIndex()
+        index.add('tf2', "revenue revenue growth")
+        index.add('tf1', "revenue growth")
+        index.add('long', "revenue " + " ".join(f"filler{i}" for i in range(30)))
+        index.add('other', "shipping delays")
+
+        ranked = [doc_id for doc_id, _ in index.search("revenue", top_k=10)]
+        assert ranked == ['tf2', 'tf1', 'long']
+
+        # A rarer term weighs more than a common one
+        assert index.idf('shipping') > index.idf('revenue') > 0
+        scores = index.scores("revenue shipping")
+        assert scores['other'] > scores['tf1']
+
+    def test_add_replace_remove(self):
+        index = KeywordIndex()
+        index.add('a', "alpha beta")
+        index.add('b', "beta gamma")
+        assert index.stats() == {'documents': 2, 'terms': 3, 'postings': 4, 'avg_length': 2.0}
+
+        index.add('a', "delta")
+        assert index.search("alpha", top_k=5) == []
+        assert [doc_id for doc_id, _ in index.search("delta", top_k=5)] == ['a']
+
+        assert index.remove('b')
+        assert not index.remove('b')
+        assert 'b' not in index and len(index) == 1
+        assert index.stats() == {'documents': 1, 'terms': 1, 'postings': 1, 'avg_length': 1.0}
+        assert index.scores("beta gamma") == {}
+
+    def test_search_walks_only_query_postings(self):
+        index = KeywordIndex()
+        for i in range(1000):
+            index.add(f"d{i}", f"common text{i}")
+        index.add('needle', "needle common")
+
+        seen = []
+        results = index.search("needle", top_k=5, accept=lambda doc_id: seen.append(doc_id) or True)
+        assert [doc_id for doc_id, _ in results] == ['needle']
+        assert seen == ['needle']
+
+    def test_accept_predicate(self):
+        index = KeywordIndex()
+        index.add('a', "invoice paid")
+        index.add('b', "invoice overdue invoice")
+        results = index.search("invoice", top_k=5, accept=lambda doc_id: doc_id != 'b')
+        assert [doc_id for doc_id, _ in results] == ['a']
+
+
+class TestStoreKeywordSearch:
+    """Test keyword search through MemoryVectorStore and HybridSearchEngine"""
+
+    @pytest.mark.asyncio
+    async def test_store_keeps_index_in_sync(self):
+        store = MemoryVectorStore()
+        vector = np.ones(8, dtype=np.float32).tolist()
+        await store.add_document('a', "quarterly revenue report", vector, {'dept': 'finance'})
+        await store.add_document('b', "revenue forecast", vector, {'dept': 'sales'})
+        await store.add_document('c', "holiday calendar", vector, {'dept': 'hr'})
+
+        results = await store.keyword_search("revenue", top_k=5)
+        assert {r['id'] for r in results} == {'a', 'b'}
+        assert results[0]['content'] in ("quarterly revenue report", "revenue forecast")
+
+        filtered = await store.keyword_search("revenue", top_k=5, filters={'dept': 'finance'})
+        assert [r['id'] for r in filtered] == ['a']
+        assert filtered[0]['metadata'] == {'dept': 'finance'}
+
+        await store.delete_document('b')
+        assert [r['id'] for r in await store.keyword_search("revenue", top_k=5)] == ['a']
+        assert store.get_stats()['keyword_indexes']['general']['documents'] == 2
+        assert await store.keyword_search("revenue", index_name="missing") == []
+
+    @pytest.mark.asyncio
+    async def test_hybrid_keyword_leg(self):
+        store = MemoryVectorStore()
+        vector = np.ones(8, dtype=np.float32).tolist()
+        await store.add_document('a', "refund policy refund window", vector)
+        await store.add_document('b', "refund", vector)
+        await store.add_document('c', "shipping", vector)
+
+        engine = HybridSearchEngine(_FakeEmbeddings(vector), store)
+        results = await engine.search("refund", top_k=3, use_vector=False)
+        assert [r['search_type'] for r in results] == ['keyword', 'keyword']
+        assert results[0]['weighted_score'] == pytest.approx(engine.keyword_weight)
+        assert results[1]['weighted_score'] < results[0]['weighted_score']
@@ -0,0 +1,62 @@
+"""
+Unit Tests for the columnar document memory store
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.memory_store import MemoryVectorStore, VectorDocument
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestColumnarMemoryStore:
+    """Test the columnar MemoryVectorStore"""
+
+    @pytest.mark.asyncio
+    async def test_views_materialize_documents(self):
+        store = MemoryVectorStore()
+        vectors = _random_embeddings(3)
+        await store.add_document("a", "إيرادات الربع الأول", vectors[0].tolist(), {"year": 2024})
+        await store.add_document("b", "second", vectors[1].tolist(), index_name="financial")
+
+        doc = store.indexes["general"]["a"]
+        assert isinstance(doc, VectorDocument)
+        assert doc.content == "إيرادات الربع الأول"
+        assert doc.metadata == {"year": 2024}
+        assert not hasattr(doc, "__dict__")
+        assert "b" in store.documents and len(store.documents) == 2
+        assert set(store.indexes["financial"]) == {"b"}
+
+        full = await store.get_document("b")
+        assert np.allclose(full.embedding, vectors[1] / np.linalg.norm(vectors[1]), atol=1e-6)
+
+    @pytest.mark.asyncio
+    async def test_upsert_delete_and_compaction(self):
+        store = MemoryVectorStore()
+        vectors = _random_embeddings(20)
+        for i in range(20):
+            await store.add_document(f"d{i}", f"text {i}", vectors[i].tolist(), {"parity": i % 2})
+
+        await store.add_document("d3", "replaced", vectors[3].tolist(), {"parity": 1})
+        results = await store.search(vectors[3].tolist(), top_k=1)
+        assert results[0]["id"] == "d3" and results[0]["content"] == "replaced"
+
+        for i in range(0, 20, 2):
+            assert await store.delete_document(f"d{i}")
+        assert not await store.delete_document("d0")
+        # Dead rows outnumbered live ones, so the columns were rewritten
+        assert len(store._indexes["general"].ids) == 10
+        assert await store.delete_document("d1")
+
+        results = await store.search(vectors[5].tolist(), top_k=20, filters={"parity": 1})
+        assert results[0]["id"] == "d5"
+        assert {r["id"] for r in results} == {f"d{i}" for i in range(3, 20, 2)}
+        assert store.indexes["general"]["d7"].content == "text 7"
+        assert store.get_stats()["indexes"]["general"] == 9
+
+        await store.clear_index("general")
+        assert len(store.documents) == 0
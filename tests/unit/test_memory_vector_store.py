@@ -0,0 +1,151 @@
+"""
+Unit Tests for the in-memory vector store
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.vector_math import normalize_rows, top_k_indices
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestVectorMath:
+    """Test matrix helpers"""
+
+    def test_normalize_rows_keeps_zero_rows(self):
+        matrix = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+        normalized = normalize_rows(matrix)
+        assert np.allclose(normalized[0], [0.6, 0.8])
+        assert np.allclose(normalized[1], [0.0, 0.0])
+
+    def test_top_k_indices_matches_full_sort(self):
+        scores = np.random.default_rng(1).random(1000)
+        expected = np.argsort(-scores)[:10]
+        assert list(top_k_indices(scores, 10)) == list(expected)
+
+    def test_top_k_indices_larger_than_input(self):
+        scores = np.array([0.1, 0.9, 0.5])
+        assert list(top_k_indices(scores, 10)) == [1, 2, 0]
+
+
+class TestMemoryVectorStore:
+    """Test MemoryVectorStore"""
+
+    @pytest.mark.asyncio
+    async def test_search_matches_brute_force_cosine(self):
+        store = MemoryVectorStore()
+        vectors = _random_embeddings(2000)
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(2000)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'dataset_id': 'a' if i % 2 else 'b'} for i in range(2000)],
+            ids=[f"id{i}" for i in range(2000)]
+        )
+
+        query = _random_embeddings(1, seed=7)[0]
+        cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        expected = [f"id{i}" for i in np.argsort(-cosine)[:5]]
+
+        results = await store.search(query.tolist(), top_k=5)
+        assert [r['id'] for r in results] == expected
+        assert results[0]['score'] == pytest.approx(float(cosine.max()), rel=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_search_with_filter(self):
+        store = MemoryVectorStore()
+        vectors = _random_embeddings(50)
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(50)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'dataset_id': 'a' if i % 2 else 'b'} for i in range(50)],
+            ids=[f"id{i}" for i in range(50)]
+        )
+
+        results = await store.search(vectors[3].tolist(), top_k=10, filter={'dataset_id': 'a'})
+        assert len(results) == 10
+        assert results[0]['id'] == 'id3'
+        assert all(r['metadata']['dataset_id'] == 'a' for r in results)
+
+    @pytest.mark.asyncio
+    async def test_growth_delete_and_stats(self):
+        store = MemoryVectorStore()
+        store._vectors.INITIAL_CAPACITY = 4
+        vectors = _random_embeddings(10)
+        capacities = []
+        for start in range(0, 10, 3):
+            await store.add_embeddings(
+                texts=[f"t{i}" for i in range(start, min(start + 3, 10))],
+                embeddings=vectors[start:start + 3].tolist(),
+                metadatas=[{} for _ in range(start, min(start + 3, 10))],
+                ids=[f"id{i}" for i in range(start, min(start + 3, 10))]
+            )
+            capacities.append(store._vectors.capacity)
+        assert capacities == [4, 8, 16, 16]
+        assert await store.delete(['id2', 'id5', 'missing'])
+
+        stats = await store.get_stats()
+        assert stats['total_vectors'] == 8
+        assert stats['vector_dimension'] == 16
+        assert stats['storage_type'] == 'memory'
+
+        results = await store.search(vectors[6].tolist(), top_k=1)
+        assert results[0]['id'] == 'id6'
+        assert 'id2' not in store.ids
+
+    @pytest.mark.asyncio
+    async def test_delete_tombstones_until_compaction(self):
+        store = MemoryVectorStore(compaction_threshold=0.5)
+        vectors = _random_embeddings(10)
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(10)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'dataset_id': 'a'} for _ in range(10)],
+            ids=[f"id{i}" for i in range(10)]
+        )
+        await store.delete(['id1', 'id4', 'id7'])
+
+        # Rows stay in place and search skips them
+        assert store._vectors.size == 10
+        assert store.tombstone_ratio == pytest.approx(0.3)
+        for filter in (None, {'dataset_id': 'a'}):
+            results = await store.search(vectors[4].tolist(), top_k=10, filter=filter)
+            assert len(results) == 7
+            assert {'id1', 'id4', 'id7'}.isdisjoint(r['id'] for r in results)
+
+        result = store.compact()
+        assert result['removed_rows'] == 3
+        assert result['remaining_rows'] == 7
+        assert result['rows_per_second'] > 0
+        assert store.ids == ['id0', 'id2', 'id3', 'id5', 'id6', 'id8', 'id9']
+
+        results = await store.search(vectors[8].tolist(), top_k=1, filter={'dataset_id': 'a'})
+        assert results[0]['id'] == 'id8'
+
+    @pytest.mark.asyncio
+    async def test_threshold_triggers_compaction_and_readd_replaces(self):
+        store = MemoryVectorStore(compaction_threshold=0.25)
+        vectors = _random_embeddings(8)
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(8)],
+            embeddings=vectors.tolist(),
+            metadatas=[{} for _ in range(8)],
+            ids=[f"id{i}" for i in range(8)]
+        )
+        await store.delete(['id0', 'id1'])
+        assert store._vectors.size == 8
+        await store.delete(['id2'])
+        assert store._vectors.size == 5
+        assert store.tombstone_ratio == 0.0
+
+        await store.add_embeddings(['new'], [vectors[0].tolist()], [{}], ids=['id3'])
+        stats = await store.get_stats()
+        assert stats['total_vectors'] == 5
+        assert stats['deleted_vectors'] == 1
+        results = await store.search(vectors[0].tolist(), top_k=1)
+        assert results[0]['id'] == 'id3'
+        assert results[0]['text'] == 'new'
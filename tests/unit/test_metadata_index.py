@@ -0,0 +1,99 @@
+"""
+Unit Tests for the inverted metadata index
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.memory_store import MemoryVectorStore as DocumentMemoryStore
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.metadata_index import MetadataIndex, choose_filter_strategy
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestMetadataIndex:
+    """Test MetadataIndex"""
+
+    def test_lookup_intersects_postings(self):
+        index = MetadataIndex()
+        index.add_many(0, [
+            {'dataset_id': 'a', 'lang': 'ar'},
+            {'dataset_id': 'b', 'lang': 'ar'},
+            {'dataset_id': 'a', 'lang': 'en'},
+            {'dataset_id': 'a', 'lang': 'ar', 'tags': ['x']},
+        ])
+
+        assert index.lookup({'dataset_id': 'a'}).tolist() == [0, 2, 3]
+        assert index.lookup({'dataset_id': 'a', 'lang': 'ar'}).tolist() == [0, 3]
+        assert index.lookup({'dataset_id': 'missing'}).tolist() == []
+        # Unindexable values fall back to a scan
+        assert index.lookup({'tags': ['x']}) is None
+        assert index.lookup({'lang': None}) is None
+
+    def test_remove_rows_shifts_later_rows(self):
+        index = MetadataIndex()
+        index.add_many(0, [{'k': i % 2} for i in range(6)])
+
+        index.remove_rows(np.array([1, 2]))
+
+        # Old rows 0, 4 -> 0, 2 ; old rows 3, 5 -> 1, 3
+        assert index.lookup({'k': 0}).tolist() == [0, 2]
+        assert index.lookup({'k': 1}).tolist() == [1, 3]
+
+    def test_filter_strategy_switch(self):
+        assert choose_filter_strategy(10, 1000) == 'prefilter'
+        assert choose_filter_strategy(900, 1000) == 'postfilter'
+        assert choose_filter_strategy(500, 1000, prefilter_ratio=0.6) == 'prefilter'
+
+
+class TestFilteredSearch:
+    """Test filtered search in both in-memory stores"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('prefilter_ratio', [0.0, 1.0])
+    async def test_both_strategies_match_brute_force(self, prefilter_ratio):
+        store = MemoryVectorStore(prefilter_ratio=prefilter_ratio)
+        vectors = _random_embeddings(1000)
+        datasets = [f"ds{i % 7}" for i in range(1000)]
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(1000)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'dataset_id': d} for d in datasets],
+            ids=[f"id{i}" for i in range(1000)]
+        )
+        await store.delete(['id3', 'id10'])
+
+        query = _random_embeddings(1, seed=5)[0]
+        cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        expected = [
+            f"id{i}" for i in np.argsort(-cosine)
+            if datasets[i] == 'ds3' and i not in (3, 10)
+        ][:5]
+
+        results = await store.search(query.tolist(), top_k=5, filter={'dataset_id': 'ds3'})
+        assert [r['id'] for r in results] == expected
+
+    @pytest.mark.asyncio
+    async def test_document_store_filters_skip_deleted_rows(self):
+        store = DocumentMemoryStore()
+        vectors = _random_embeddings(20)
+        for i in range(20):
+            await store.add_document(
+                f"doc{i}", f"content {i}", vectors[i].tolist(),
+                metadata={'dataset_id': 'a' if i < 5 else 'b'}
+            )
+        await store.delete_document('doc2')
+
+        results = await store.search(vectors[2].tolist(), top_k=10, filters={'dataset_id': 'a'})
+        assert sorted(r['id'] for r in results) == ['doc0', 'doc1', 'doc3', 'doc4']
+
+        # Deleting most rows triggers compaction; the index must follow it
+        for i in range(5, 18):
+            await store.delete_document(f"doc{i}")
+        results = await store.search(vectors[18].tolist(), top_k=10, filters={'dataset_id': 'b'})
+        assert [r['id'] for r in results][0] == 'doc18'
+        assert sorted(r['id'] for r in results) == ['doc18', 'doc19']
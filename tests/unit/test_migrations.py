@@ -0,0 +1,44 @@
+"""
+Unit Tests for the column migration scripts
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from api.models import DocumentSegment, Message
+from scripts.add_message_columns import MESSAGE_COLUMNS, add_missing_columns
+from scripts.add_segment_keywords import SEGMENT_COLUMNS
+
+
+class TestAddColumns:
+    """Test idempotent ALTER TABLE scripts against an old schema"""
+
+    def test_messages(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with engine.connect() as conn:
+            conn.execute(text(
+                "CREATE TABLE messages (id VARCHAR PRIMARY KEY, conversation_id VARCHAR NOT NULL, "
+                "query TEXT NOT NULL, answer TEXT, message_metadata JSON, created_at DATETIME, updated_at DATETIME)"
+            ))
+            conn.execute(text("INSERT INTO messages (id, conversation_id, query) VALUES ('m1', 'c1', 'q')"))
+            conn.commit()
+
+        assert add_missing_columns(engine, "messages", MESSAGE_COLUMNS) == [name for name, _ in MESSAGE_COLUMNS]
+        assert add_missing_columns(engine, "messages", MESSAGE_COLUMNS) == []
+        assert {c["name"] for c in inspect(engine).get_columns("messages")} >= {c.name for c in Message.__table__.columns}
+
+        db = sessionmaker(bind=engine)()
+        message = db.query(Message).one()
+        assert (message.agent_id, message.total_tokens, message.total_latency) == (None, 0, None)
+        db.close()
+
+    def test_document_segments(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        DocumentSegment.metadata.create_all(engine, tables=[DocumentSegment.__table__])
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE document_segments DROP COLUMN keywords"))
+            conn.commit()
+
+        assert add_missing_columns(engine, "document_segments", SEGMENT_COLUMNS) == ["keywords"]
+        assert add_missing_columns(engine, "document_segments", SEGMENT_COLUMNS) == []
+        assert sessionmaker(bind=engine)().query(DocumentSegment).count() == 0
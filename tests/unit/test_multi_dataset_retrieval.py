@@ -0,0 +1,186 @@
+"""
+Unit Tests for concurrent multi-dataset retrieval
+"""
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from core.rag.rag_pipeline import RAGPipeline
+from knowledge_base.retrieval.index_registry import DatasetIndexRegistry
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+from knowledge_base.vector_store.vector_math import normalize_scores
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class _FakeEmbeddingService:
+    def __init__(self, vector):
+        self.vector = vector
+        self.calls = 0
+
+    async def generate_embedding(self, text):
+        self.calls += 1
+        return self.vector
+
+
+class _SlowStore(MemoryVectorStore):
+    def __init__(self, delay, log=None, name=None):
+        super().__init__()
+        self.delay = delay
+        self.log = log
+        self.name = name
+
+    async def search(self, query_embedding, top_k=5, filter=None):
+        if self.log is not None:
+            self.log.append(('start', self.name))
+        await asyncio.sleep(self.delay)
+        if self.log is not None:
+            self.log.append(('end', self.name))
+        return await super().search(query_embedding, top_k, filter)
+
+
+class _BlockingStore(MemoryVectorStore):
+    """Scores without yielding to the event loop, like the real backends"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    async def search(self, query_embedding, top_k=5, filter=None):
+        time.sleep(self.delay)
+        return await super().search(query_embedding, top_k, filter)
+
+
+async def _fill(store, dataset_id, vectors):
+    await store.add_embeddings(
+        texts=[f"{dataset_id} {i}" for i in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        metadatas=[{'segment_id': f"{dataset_id}-{i}", 'dataset_id': dataset_id} for i in range(len(vectors))],
+        ids=[f"{dataset_id}-{i}" for i in range(len(vectors))]
+    )
+
+
+class TestNormalizeScores:
+    """Test normalize_scores"""
+
+    def test_methods(self):
+        results = [{'score': 0.9}, {'score': 0.7}, {'score': 0.5}]
+        assert [r['score'] for r in normalize_scores(results, 'minmax')] == pytest.approx([1.0, 0.5, 0.0])
+        zscores = [r['score'] for r in normalize_scores(results, 'zscore')]
+        assert zscores == pytest.approx([1.2247, 0.0, -1.2247], abs=1e-4)
+        assert [r['raw_score'] for r in normalize_scores(results, 'none')] == [0.9, 0.7, 0.5]
+
+        # A lone hit keeps its raw score
+        assert normalize_scores([{'score': 0.3}], 'minmax')[0]['score'] == 0.3
+        with pytest.raises(ValueError):
+            normalize_scores(results, 'rank')
+
+
+class TestSearchFanout:
+    """Test CollectionManager.search_fanout"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap_and_merge(self):
+        log = []
+        collections = CollectionManager()
+        for i, dataset_id in enumerate(['a', 'b', 'c']):
+            store = collections._collections[('t1', dataset_id)] = _SlowStore(0.01, log, dataset_id)
+            collections._backends[('t1', dataset_id)] = 'memory'
+            await _fill(store, dataset_id, _random_embeddings(5, seed=i))
+
+        query = _random_embeddings(1, seed=9)[0].tolist()
+        results, report = await collections.search_fanout(
+            query, top_k=4, tenant_id='t1', max_concurrency=2, normalization='minmax'
+        )
+        assert len(results) == 4
+        assert results == sorted(results, key=lambda r: r['score'], reverse=True)
+        assert all('raw_score' in r for r in results)
+        assert report['datasets'] == 3 and not report['partial']
+        assert set(report['latency_ms']) == {'a', 'b', 'c'}
+
+        # Never more than two searches in flight
+        in_flight = peak = 0
+        for event, _ in log:
+            in_flight += 1 if event == 'start' else -1
+            peak = max(peak, in_flight)
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_slow_dataset_yields_partial_results(self):
+        collections = CollectionManager()
+        await _fill(collections.get_or_create('t1', 'fast'), 'fast', _random_embeddings(3))
+        slow = collections._collections[('t1', 'slow')] = _SlowStore(1.0)
+        collections._backends[('t1', 'slow')] = 'memory'
+        await _fill(slow, 'slow', _random_embeddings(3, seed=1))
+
+        results, report = await collections.search_fanout(
+            _random_embeddings(1, seed=2)[0].tolist(), top_k=5, tenant_id='t1', timeout_seconds=0.05
+        )
+        assert {r['metadata']['dataset_id'] for r in results} == {'fast'}
+        assert report['timed_out'] == ['slow']
+        assert report['partial']
+
+
+    @pytest.mark.asyncio
+    async def test_blocking_searches_run_off_the_event_loop(self):
+        collections = CollectionManager()
+        for i, (dataset_id, delay) in enumerate([('a', 0.1), ('b', 0.1), ('c', 0.1), ('stuck', 1.0)]):
+            store = collections._collections[('t1', dataset_id)] = _BlockingStore(delay)
+            collections._backends[('t1', dataset_id)] = 'memory'
+            await _fill(store, dataset_id, _random_embeddings(3, seed=i))
+
+        started = time.perf_counter()
+        results, report = await collections.search_fanout(
+            _random_embeddings(1, seed=7)[0].tolist(), top_k=9, tenant_id='t1', timeout_seconds=0.3
+        )
+        elapsed = time.perf_counter() - started
+        assert elapsed < 0.5  # the three 0.1s searches overlapped and the stuck one was dropped
+        assert {r['metadata']['dataset_id'] for r in results} == {'a', 'b', 'c'}
+        assert report['timed_out'] == ['stuck'] and report['partial']
+
+
+class TestMultiDatasetRetrieval:
+    """Test multi-dataset retrieve and pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_query_is_embedded_once(self):
+        collections = CollectionManager()
+        for i, dataset_id in enumerate(['a', 'b', 'c']):
+            await _fill(collections.get_or_create('t1', dataset_id), dataset_id, _random_embeddings(4, seed=i))
+
+        retriever = DocumentRetriever(None, collections=collections)
+        retriever.embedding_service = _FakeEmbeddingService(_random_embeddings(1, seed=5)[0].tolist())
+
+        results = await retriever.retrieve('q', top_k=6, tenant_id='t1', dataset_ids=['a', 'b'])
+        assert retriever.embedding_service.calls == 1
+        assert len(results) == 6
+        assert {r['dataset_id'] for r in results} <= {'a', 'b'}
+        assert retriever.timings['fanout']['datasets'] == 2
+
+    @pytest.mark.asyncio
+    async def test_pipeline_loads_every_dataset(self, monkeypatch):
+        loaded = []
+
+        async def ensure_loaded(self, db, dataset_id, tenant_id=None):
+            loaded.append(dataset_id)
+            return True
+
+        async def retrieve(self, query, top_k=5, dataset_id=None, tenant_id=None, dataset_ids=None, **kwargs):
+            self.timings = {'fanout': {'datasets': len(dataset_ids)}}
+            return [{'text': 'x', 'segment_id': 's', 'document_id': 'd', 'score': 1.0}]
+
+        monkeypatch.setattr(DatasetIndexRegistry, 'ensure_loaded', ensure_loaded)
+        monkeypatch.setattr(DocumentRetriever, 'retrieve', retrieve)
+        pipeline = RAGPipeline(None, registry=DatasetIndexRegistry(CollectionManager()))
+
+        result = await pipeline.process_query('q', dataset_id='a', dataset_ids=['b', 'a', 'c'], use_reranking=False)
+        assert sorted(loaded) == ['a', 'b', 'c']
+        assert result['timings']['fanout']['datasets'] == 3
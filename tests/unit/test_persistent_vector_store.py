@@ -0,0 +1,151 @@
+"""
+Unit Tests for the persistent (memory-mapped + WAL) vector store
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.persistent_vector_store import PersistentVectorStore, Segment, _StringTable
+
+
+def _corpus(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+async def _add(store, vectors, start=0, dataset_id='a'):
+    await store.add_embeddings(
+        texts=[f"text {i}" for i in range(start, start + len(vectors))],
+        embeddings=vectors.tolist(),
+        metadatas=[{'dataset_id': dataset_id} for _ in vectors],
+        ids=[f"id{i}" for i in range(start, start + len(vectors))]
+    )
+
+
+class TestPersistentVectorStore:
+    """Test PersistentVectorStore"""
+
+    @pytest.mark.asyncio
+    async def test_wal_replay_after_restart(self, tmp_path):
+        vectors = _corpus(20)
+        store = PersistentVectorStore(str(tmp_path))
+        await _add(store, vectors)
+        await store.delete(['id3'])
+        store.close()
+
+        reopened = PersistentVectorStore(str(tmp_path))
+        stats = await reopened.get_stats()
+        assert stats['total_vectors'] == 19
+        assert stats['segments'] == 0
+
+        results = await reopened.search(vectors[5].tolist(), top_k=1)
+        assert results[0]['id'] == 'id5'
+        assert results[0]['text'] == 'text 5'
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_merge_into_memory_mapped_segment(self, tmp_path):
+        vectors = _corpus(30)
+        store = PersistentVectorStore(str(tmp_path))
+        await _add(store, vectors[:20])
+        summary = await store.merge()
+        assert summary['rows'] == 20
+        await _add(store, vectors[20:], start=20, dataset_id='b')
+        store.close()
+
+        reopened = PersistentVectorStore(str(tmp_path))
+        assert isinstance(reopened.segments[0].vectors, np.memmap)
+        assert len(list(tmp_path.glob('wal-*.log'))) == 1
+
+        results = await reopened.search(vectors[4].tolist(), top_k=3)
+        assert results[0]['id'] == 'id4'
+        assert results[0]['metadata']['dataset_id'] == 'a'
+
+        results = await reopened.search(vectors[4].tolist(), top_k=3, filter={'dataset_id': 'b'})
+        assert all(r['metadata']['dataset_id'] == 'b' for r in results)
+        assert (await reopened.get_stats())['total_vectors'] == 30
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_tombstones_and_upserts_across_segments(self, tmp_path):
+        vectors = _corpus(10)
+        store = PersistentVectorStore(str(tmp_path))
+        await _add(store, vectors)
+        await store.merge()
+
+        await store.delete(['id1'])
+        await store.add_embeddings(['replaced'], [vectors[9].tolist()], [{}], ids=['id2'])
+        results = await store.search(vectors[1].tolist(), top_k=10)
+        assert 'id1' not in [r['id'] for r in results]
+        assert [r['text'] for r in results if r['id'] == 'id2'] == ['replaced']
+
+        await store.merge(compact=True)
+        stats = await store.get_stats()
+        assert stats['segments'] == 1
+        assert stats['tombstones'] == 0
+        assert stats['total_vectors'] == 9
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_id_index_is_stored_with_the_segment(self, tmp_path, monkeypatch):
+        vectors = _corpus(500)
+        store = PersistentVectorStore(str(tmp_path))
+        await _add(store, vectors)
+        await store.merge()
+        store.close()
+
+        decoded = []
+        getitem = _StringTable.__getitem__
+        monkeypatch.setattr(_StringTable, '__getitem__', lambda table, row: decoded.append(row) or getitem(table, row))
+
+        # Opening, tombstoning and masking read only the rows of the touched ids
+        reopened = PersistentVectorStore(str(tmp_path))
+        assert isinstance(reopened.segments[0].id_hashes, np.memmap)
+        await reopened.delete(['id7', 'missing'])
+        await reopened.add_embeddings(['new'], [vectors[3].tolist()], [{}], ids=['id3'])
+        alive = reopened._segment_alive(reopened.segments[0])
+        assert len(decoded) < 10
+        assert np.flatnonzero(~alive).tolist() == [3, 7]
+        assert 'id3' in reopened.segments[0] and 'missing' not in reopened.segments[0]
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_filtered_search_uses_segment_metadata_index(self, tmp_path, monkeypatch):
+        vectors = _corpus(200)
+        store = PersistentVectorStore(str(tmp_path))
+        await _add(store, vectors[:100])
+        await _add(store, vectors[100:], start=100, dataset_id='b')
+        await store.merge()
+        await store.delete(['id150'])
+
+        decoded = []
+        row_metadata = Segment.row_metadata
+        monkeypatch.setattr(Segment, 'row_metadata', lambda segment, row: decoded.append(row) or row_metadata(segment, row))
+
+        # Metadata is decoded once to build the index, then only for hits
+        for _ in range(3):
+            results = await store.search(vectors[150].tolist(), top_k=5, filter={'dataset_id': 'b'})
+            assert len(results) == 5
+            assert all(r['metadata']['dataset_id'] == 'b' for r in results)
+            assert 'id150' not in [r['id'] for r in results]
+        assert len(decoded) == 200 + 3 * 5
+        assert store.segments[0].metadata_index.lookup({'dataset_id': 'b'}).tolist() == list(range(100, 200))
+
+        # Filters the index cannot answer fall back to a scan
+        assert await store.search(vectors[0].tolist(), top_k=5, filter={'dataset_id': None}) == []
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_background_merge_threshold(self, tmp_path):
+        store = PersistentVectorStore(str(tmp_path), merge_threshold=5)
+        await _add(store, _corpus(6))
+        await store._merge_task
+        assert (await store.get_stats())['segments'] == 1
+        store.close()
+
+    def test_second_writer_opens_read_only(self, tmp_path):
+        writer = PersistentVectorStore(str(tmp_path))
+        reader = PersistentVectorStore(str(tmp_path))
+        assert not writer.read_only
+        assert reader.read_only
+        reader.close()
+        writer.close()
@@ -0,0 +1,96 @@
+"""
+Unit Tests for scalar-quantized vector storage
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.memory_store import MemoryVectorStore as DocumentVectorStore
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.quantization import QuantizedMatrix, ScalarQuantizer
+from knowledge_base.vector_store.vector_math import normalize_rows
+
+
+def _normalized(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return normalize_rows(rng.standard_normal((n, dim)).astype(np.float32))
+
+
+class TestScalarQuantizer:
+    """Test ScalarQuantizer"""
+
+    @pytest.mark.parametrize('precision,tolerance', [('float16', 1e-3), ('int8', 2e-2)])
+    def test_score_close_to_float32(self, precision, tolerance):
+        rows = _normalized(200)
+        query = rows[0]
+        quantizer = ScalarQuantizer(precision)
+        quantizer.fit(rows)
+        codes = quantizer.encode(rows)
+
+        assert codes.dtype == np.dtype(precision)
+        assert np.allclose(quantizer.score(codes, query), rows @ query, atol=tolerance)
+
+    def test_unknown_precision(self):
+        with pytest.raises(ValueError):
+            ScalarQuantizer('int4')
+
+    def test_int8_range_growth_reencodes(self):
+        matrix = QuantizedMatrix('int8')
+        first = _normalized(50, seed=1) * 0.1
+        matrix.append(first)
+        matrix.append(_normalized(50, seed=2))
+        assert np.allclose(matrix.decode()[:50], first, atol=2e-2)
+
+
+class TestQuantizedStores:
+    """Test precision option on both in-memory stores"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('precision', ['float16', 'int8'])
+    async def test_memory_vector_store_precision(self, precision):
+        store = MemoryVectorStore(precision=precision, rescore=True)
+        rows = _normalized(500)
+        await store.add_embeddings(
+            texts=[str(i) for i in range(500)],
+            embeddings=rows.tolist(),
+            metadatas=[{} for _ in range(500)],
+            ids=[str(i) for i in range(500)]
+        )
+
+        results = await store.search(rows[10].tolist(), top_k=3)
+        assert results[0]['id'] == '10'
+        assert results[0]['score'] == pytest.approx(1.0, abs=1e-5)
+
+        stats = await store.get_stats()
+        assert stats['precision'] == precision
+        assert stats['rescoring'] is True
+        assert 0.0 <= stats['recall_loss'] < 0.2
+
+    @pytest.mark.asyncio
+    async def test_int8_saves_memory(self):
+        store = MemoryVectorStore(precision='int8')
+        rows = _normalized(100)
+        await store.add_embeddings(['x'] * 100, rows.tolist(), [{}] * 100, [str(i) for i in range(100)])
+
+        stats = await store.get_stats()
+        assert stats['memory_bytes'] == 100 * 64
+        assert stats['memory_saved_bytes'] == 100 * 64 * 3
+
+    @pytest.mark.asyncio
+    async def test_document_store_precision(self):
+        store = DocumentVectorStore(precision='int8')
+        rows = _normalized(20)
+        for i, row in enumerate(rows):
+            await store.add_document(f"doc{i}", f"content {i}", row.tolist(), {'n': i % 2})
+
+        results = await store.search(rows[4].tolist(), top_k=2, filters={'n': 0})
+        assert results[0]['id'] == 'doc4'
+        assert all(r['metadata']['n'] == 0 for r in results)
+
+        assert await store.delete_document('doc4')
+        results = await store.search(rows[4].tolist(), top_k=2)
+        assert 'doc4' not in [r['id'] for r in results]
+
+        doc = await store.get_document('doc5')
+        assert np.allclose(doc.embedding, rows[5], atol=2e-2)
+        assert store.get_stats()['vector_storage']['general']['precision'] == 'int8'
@@ -0,0 +1,149 @@
+"""
+Unit Tests for the CPU reranking stage
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from core.config import settings
+from core.rag import reranker as reranker_module
+from core.rag.rag_pipeline import RAGPipeline
+from core.rag.reranker import BM25Scorer, CosineScorer, CPUReranker, RerankScorer, create_default_reranker
+from knowledge_base.retrieval.retriever import DocumentRetriever
+
+
+def _candidates():
+    return [
+        {'segment_id': 's0', 'text': 'weather report for the coast', 'score': 0.82},
+        {'segment_id': 's1', 'text': 'refund policy: refunds within 30 days', 'score': 0.80},
+        {'segment_id': 's2', 'text': 'shipping times and costs', 'score': 0.79},
+        {'segment_id': 's3', 'text': 'contact the refund team', 'score': 0.60},
+    ]
+
+
+class _CountingScorer(RerankScorer):
+    name = 'counting'
+
+    def __init__(self, delay_ms=0.0):
+        self.delay_ms = delay_ms
+        self.scored = 0
+
+    def score(self, query, candidates):
+        time.sleep(self.delay_ms / 1000)
+        self.scored += len(candidates)
+        return np.arange(len(candidates), dtype=float)
+
+
+class TestCPUReranker:
+    """Test CPUReranker"""
+
+    def test_bm25_promotes_term_matches(self):
+        scores = BM25Scorer().score('refund policy', _candidates())
+        assert int(np.argmax(scores)) == 1
+        assert scores[0] == 0 and scores[2] == 0
+
+        reranker = CPUReranker()
+        ranked, report = reranker.rerank('refund policy', _candidates(), top_k=2)
+        assert [c['segment_id'] for c in ranked] == ['s1', 's0']
+        assert ranked[0]['rerank_score'] >= ranked[1]['rerank_score']
+        assert set(report['scorers']) == {'cosine', 'bm25'}
+        assert report['skipped'] == []
+
+    def test_candidates_are_capped(self):
+        scorer = _CountingScorer()
+        reranker = CPUReranker(scorers=[(scorer, 1.0)], max_candidates=3)
+        ranked, report = reranker.rerank('q', _candidates(), top_k=4)
+        assert report['candidates'] == 3
+        assert scorer.scored == 3
+        assert len(ranked) == 3
+
+    def test_budget_skips_later_scorers(self):
+        slow = _CountingScorer(delay_ms=5)
+        reranker = CPUReranker(scorers=[(slow, 1.0), (BM25Scorer(), 1.0)], latency_budget_ms=1.0)
+        ranked, report = reranker.rerank('refund', _candidates(), top_k=2)
+        assert report['skipped'] == ['bm25']
+        assert 'counting' in report['scorers']
+        assert len(ranked) == 2
+
+    def test_scores_are_cached_per_pair(self):
+        scorer = _CountingScorer()
+        reranker = CPUReranker(scorers=[(scorer, 1.0)])
+        reranker.rerank('refund policy', _candidates(), top_k=2)
+        reranker.rerank('  Refund   POLICY ', _candidates(), top_k=2)
+        assert scorer.scored == 4
+        assert reranker.stats()['cache_hit_rate'] == 0.5
+
+        # Only the new segment is scored
+        reranker.rerank('refund policy', _candidates() + [{'segment_id': 's4', 'text': 'x'}], top_k=2)
+        assert scorer.scored == 5
+
+        # Same analyzed terms, different query: not a cache hit
+        reranker.rerank('policy refund', _candidates(), top_k=2)
+        assert scorer.scored == 9
+
+    def test_cosine_is_not_cached(self):
+        reranker = CPUReranker(scorers=[(CosineScorer(), 1.0)])
+        reranker.rerank('refund', _candidates(), top_k=2)
+        rescored = [{**candidate, 'score': 1.0 - candidate['score']} for candidate in _candidates()]
+        ranked, _ = reranker.rerank('refund', rescored, top_k=1)
+        assert ranked[0]['segment_id'] == 's3'
+        assert reranker.stats()['cache_hit_rate'] == 0.0
+
+    def test_onnx_model_from_settings(self, tmp_path, monkeypatch):
+        model = tmp_path / 'reranker.onnx'
+        model.write_bytes(b'onnx')
+        built = []
+
+        class _FakeOnnxScorer(_CountingScorer):
+            name = 'onnx'
+
+            def __init__(self, model_path, encode):
+                super().__init__()
+                built.append((model_path, encode('q', ['p'])))
+
+        monkeypatch.setattr(reranker_module, 'HAS_ONNXRUNTIME', True)
+        monkeypatch.setattr(reranker_module, 'OnnxScorer', _FakeOnnxScorer)
+        monkeypatch.setattr(reranker_module, 'tokenizer_encoder', lambda path: lambda q, p: {'tokenizer': path})
+        monkeypatch.setattr(settings, 'rerank_onnx_weight', 0.5)
+
+        monkeypatch.setattr(settings, 'rerank_onnx_model_path', None)
+        assert [scorer.name for scorer, _ in create_default_reranker().scorers] == ['cosine', 'bm25']
+
+        monkeypatch.setattr(settings, 'rerank_onnx_model_path', str(model))
+        scorers = create_default_reranker().scorers
+        assert [(scorer.name, weight) for scorer, weight in scorers][-1] == ('onnx', 0.5)
+        assert built == [(str(model), {'tokenizer': str(tmp_path)})]
+
+    def test_evaluate_reports_each_stage(self):
+        reranker = CPUReranker(scorers=[(CosineScorer(), 0.7), (BM25Scorer(), 0.3)], latency_budget_ms=0.0)
+        rows = reranker.evaluate([('refund policy', _candidates(), {'s1'})], top_k=1)
+        assert [row['stage'] for row in rows] == ['retrieval', 'cosine', 'cosine+bm25']
+        assert [row['recall'] for row in rows] == [0.0, 0.0, 1.0]
+        assert reranker.latency_budget_ms == 0.0
+
+
+class TestPipelineReranking:
+    """Test RAGPipeline reranking stage"""
+
+    @pytest.mark.asyncio
+    async def test_process_query_reranks_and_reports_latency(self, monkeypatch):
+        async def retrieve(self, query, top_k=5, dataset_id=None, tenant_id=None, **kwargs):
+            self.timings = {'search_ms': 1.0}
+            return [
+                {**candidate, 'document_id': 'd1'}
+                for candidate in _candidates()
+            ][:top_k]
+
+        monkeypatch.setattr(DocumentRetriever, 'retrieve', retrieve)
+        pipeline = RAGPipeline(None, reranker=CPUReranker())
+
+        result = await pipeline.process_query('refund policy', top_k=2)
+        assert [s['segment_id'] for s in result['sources']] == ['s1', 's0']
+        assert result['timings']['search_ms'] == 1.0
+        assert result['timings']['rerank_ms'] >= 0
+        assert set(result['timings']['rerank']['scorers']) == {'cosine', 'bm25'}
+
+        result = await pipeline.process_query('refund policy', top_k=2, use_reranking=False)
+        assert 'rerank_ms' not in result['timings']
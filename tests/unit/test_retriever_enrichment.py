@@ -0,0 +1,89 @@
+"""
+Unit Tests for batched retrieval enrichment
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Document, DocumentSegment
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class _FakeEmbeddingService:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def generate_embedding(self, text):
+        return self.vectors[text]
+
+    async def generate_embeddings(self, texts, use_cache=True):
+        return [self.vectors[text] for text in texts]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    tables = [Document.__table__, DocumentSegment.__table__]
+    Document.metadata.create_all(engine, tables=tables)
+    session = sessionmaker(bind=engine)()
+    session.statements = []
+    event.listen(
+        engine, 'before_cursor_execute',
+        lambda conn, cursor, statement, *args: session.statements.append(statement)
+    )
+    yield session
+    session.close()
+
+
+class TestRetrieverEnrichment:
+    """Test DocumentRetriever enrichment"""
+
+    @pytest.mark.asyncio
+    async def test_hits_are_enriched_with_one_query(self, db):
+        db.add(Document(id='doc-1', name='report.pdf', type='pdf', dataset_id='ds-a'))
+        for i in range(10):
+            db.add(DocumentSegment(id=f"seg-{i}", document_id='doc-1', content=f"text {i}",
+                                   position=i, meta_data={'chunk_index': i}))
+        db.commit()
+
+        vectors = _random_embeddings(11)
+        retriever = DocumentRetriever(db, collections=CollectionManager())
+        await retriever.get_vector_store('ds-a', tenant_id='t1').add_embeddings(
+            texts=[f"text {i}" for i in range(11)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'segment_id': f"seg-{i}", 'dataset_id': 'ds-a', 'position': i} for i in range(11)],
+            ids=[f"seg-{i}" for i in range(11)]
+        )
+        retriever.embedding_service = _FakeEmbeddingService({'q': vectors[4].tolist(), 'r': vectors[10].tolist()})
+
+        db.statements.clear()
+        results = await retriever.retrieve('q', top_k=11, tenant_id='t1')
+        assert len(db.statements) == 1
+        assert retriever.timings['enrich_db_queries'] == 1
+        assert {'embedding_ms', 'search_ms', 'enrich_db_ms'} <= set(retriever.timings)
+
+        # seg-10 has no database row; ranking order is kept
+        assert len(results) == 10
+        assert results[0]['segment_id'] == 'seg-4'
+        assert results == sorted(results, key=lambda r: r['score'], reverse=True)
+        assert results[0]['document_name'] == 'report.pdf'
+        assert results[0]['metadata'] == {'chunk_index': 4}
+
+        db.statements.clear()
+        batched = await retriever.retrieve_many(['q', 'r'], top_k=3, tenant_id='t1')
+        assert len(db.statements) == 1
+        assert [r['segment_id'] for r in batched[0]] == [r['segment_id'] for r in results[:3]]
+
+        db.statements.clear()
+        payload = await retriever.retrieve('r', top_k=1, tenant_id='t1', enrich_from_db=False)
+        assert db.statements == []
+        assert payload[0]['segment_id'] == 'seg-10'
+        assert payload[0]['position'] == 10
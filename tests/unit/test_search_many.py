@@ -0,0 +1,107 @@
+"""
+Unit Tests for batched multi-query search
+"""
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.hybrid_search import HybridSearchEngine
+from knowledge_base.vector_store.base_vector_store import group_queries_by_filter
+from knowledge_base.vector_store.factory import create_vector_store
+from knowledge_base.vector_store.memory_store import MemoryVectorStore as DocumentMemoryStore
+from knowledge_base.vector_store.vector_math import top_k_indices, top_k_indices_batch
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestBatchHelpers:
+    """Test batch helpers"""
+
+    def test_top_k_indices_batch_matches_single(self):
+        scores = np.random.default_rng(3).random((4, 500))
+        batch = top_k_indices_batch(scores, 7)
+        for row, expected in zip(scores, batch):
+            assert list(top_k_indices(row, 7)) == list(expected)
+        assert top_k_indices_batch(scores[:, :3], 7).shape == (4, 3)
+
+    def test_group_queries_by_filter(self):
+        assert group_queries_by_filter(3, None) == [(None, [0, 1, 2])]
+        assert group_queries_by_filter(2, {'a': 1}) == [({'a': 1}, [0, 1])]
+        groups = group_queries_by_filter(4, [{'a': 1}, None, {'a': 1}, {'a': 2}])
+        assert groups == [({'a': 1}, [0, 2]), (None, [1]), ({'a': 2}, [3])]
+        with pytest.raises(ValueError):
+            group_queries_by_filter(2, [None])
+
+
+class TestSearchMany:
+    """Test search_many against per-query search"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('backend, params', [
+        ('memory', {}),
+        ('memory', {'precision': 'int8', 'rescore': True}),
+        ('hnsw', {'seed': 0}),
+        ('ivfpq', {'n_lists': 4, 'n_subvectors': 4, 'nprobe': 4, 'train_size': 200}),
+        ('persistent', {}),
+    ])
+    async def test_matches_single_search(self, backend, params, tmp_path):
+        if backend == 'persistent':
+            params = {'path': str(tmp_path / 'store')}
+        store = create_vector_store(backend, **params)
+        vectors = _random_embeddings(300)
+        await store.add_embeddings(
+            texts=[f"t{i}" for i in range(300)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'dataset_id': f"ds{i % 3}"} for i in range(300)],
+            ids=[f"id{i}" for i in range(300)]
+        )
+        if backend == 'persistent':
+            await store.merge()
+            await store.add_embeddings(['extra'], [vectors[0].tolist()], [{'dataset_id': 'ds0'}], ids=['extra'])
+
+        queries = _random_embeddings(5, seed=9).tolist()
+        filters = [None, {'dataset_id': 'ds1'}, None, {'dataset_id': 'ds2'}, {'dataset_id': 'ds1'}]
+        batched = await store.search_many(queries, top_k=4, filters=filters)
+
+        assert len(batched) == 5
+        for query, filter, results in zip(queries, filters, batched):
+            expected = await store.search(query, top_k=4, filter=filter)
+            assert [r['id'] for r in results] == [r['id'] for r in expected]
+            assert [r['score'] for r in results] == pytest.approx([r['score'] for r in expected], rel=1e-5)
+
+
+class _FakeEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def generate(self, text):
+        if isinstance(text, str):
+            return self.vectors[text]
+        return [self.vectors[t] for t in text]
+
+
+class TestHybridSearchMany:
+    """Test HybridSearchEngine.search_many"""
+
+    @pytest.mark.asyncio
+    async def test_matches_single_search(self):
+        store = DocumentMemoryStore()
+        vectors = _random_embeddings(30)
+        for i in range(30):
+            await store.add_document(f"doc{i}", f"report number{i} revenue", vectors[i].tolist())
+
+        embeddings = _FakeEmbeddings({
+            'revenue report': vectors[3].tolist(),
+            'number7 figures': vectors[7].tolist(),
+        })
+        engine = HybridSearchEngine(embeddings, store)
+        queries = ['revenue report', 'number7 figures']
+
+        batched = await engine.search_many(queries, top_k=3)
+        for query, results in zip(queries, batched):
+            expected = await engine.search(query, top_k=3)
+            assert [r['id'] for r in results] == [r['id'] for r in expected]
+        assert batched[1][0]['id'] == 'doc7'
@@ -0,0 +1,102 @@
+"""
+Unit Tests for the process-sharded vector store
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from knowledge_base.vector_store.memory_vector_store import MemoryVectorStore
+from knowledge_base.vector_store.sharded_vector_store import ShardedVectorStore
+
+
+def _random_embeddings(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+@pytest.fixture
+def sharded_store():
+    store = ShardedVectorStore(n_shards=3)
+    yield store
+    store.close()
+
+
+async def _load(store, vectors):
+    await store.add_embeddings(
+        texts=[f"t{i}" for i in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        metadatas=[{'dataset_id': f"ds{i % 4}"} for i in range(len(vectors))],
+        ids=[f"id{i}" for i in range(len(vectors))]
+    )
+
+
+class TestShardedVectorStore:
+    """Test ShardedVectorStore"""
+
+    def test_hash_routing_is_stable(self, sharded_store):
+        assert sharded_store.shard_for('segment-1') == sharded_store.shard_for('segment-1')
+        assert {sharded_store.shard_for(f"id{i}") for i in range(100)} == {0, 1, 2}
+
+    @pytest.mark.asyncio
+    async def test_matches_memory_store(self, sharded_store):
+        vectors = _random_embeddings(1500)
+        reference = MemoryVectorStore()
+        await _load(reference, vectors)
+        await _load(sharded_store, vectors)
+
+        queries = _random_embeddings(4, seed=3).tolist()
+        filters = [None, {'dataset_id': 'ds1'}, {'dataset_id': 'ds1'}, None]
+        batched = await sharded_store.search_many(queries, top_k=6, filters=filters)
+        for query, filter, results in zip(queries, filters, batched):
+            expected = await reference.search(query, top_k=6, filter=filter)
+            assert [r['id'] for r in results] == [r['id'] for r in expected]
+            assert [r['score'] for r in results] == pytest.approx([r['score'] for r in expected], rel=1e-5)
+
+        stats = await sharded_store.get_stats()
+        assert stats['total_vectors'] == 1500
+        assert sum(shard['vectors'] for shard in stats['shards']) == 1500
+        assert all(shard['worker_alive'] for shard in stats['shards'])
+
+    @pytest.mark.asyncio
+    async def test_delete_compaction_and_readd(self, sharded_store):
+        vectors = _random_embeddings(300)
+        await _load(sharded_store, vectors)
+
+        assert await sharded_store.delete([f"id{i}" for i in range(0, 300, 2)])
+        results = await sharded_store.search(vectors[7].tolist(), top_k=200)
+        assert len(results) == 150
+        assert results[0]['id'] == 'id7'
+        assert all(int(r['id'][2:]) % 2 for r in results)
+
+        await sharded_store.add_embeddings(['again'], [vectors[7].tolist()], [{}], ids=['id7'])
+        results = await sharded_store.search(vectors[7].tolist(), top_k=2)
+        assert results[0]['text'] == 'again'
+        assert results[1]['id'] != 'id7'
+        assert (await sharded_store.get_stats())['total_vectors'] == 150
+
+    @pytest.mark.asyncio
+    async def test_writers_wait_off_the_event_loop(self, sharded_store):
+        vectors = _random_embeddings(20)
+        await _load(sharded_store, vectors)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        # A search in another thread holds the store lock
+        sharded_store._lock.acquire()
+        threading.Timer(0.15, sharded_store._lock.release).start()
+        task = asyncio.create_task(ticker())
+        await sharded_store.add_embeddings(['new'], [vectors[0].tolist()], [{}], ids=['new'])
+        assert await sharded_store.delete(['id1'])
+        task.cancel()
+
+        assert ticks >= 5
+        assert (await sharded_store.get_stats())['total_vectors'] == 20
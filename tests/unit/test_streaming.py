@@ -0,0 +1,110 @@
+"""
+Unit Tests for streamed answers (SSE) and time-to-first-token
+"""
+
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Message
+from core.rag.answer_cache import SemanticAnswerCache
+from core.rag.rag_pipeline import RAGPipeline
+from core.rag.streaming import FakeStreamingProvider, format_sse
+from knowledge_base.retrieval.retriever import DocumentRetriever
+
+
+def _hits():
+    return [
+        {'text': 'Refunds are issued within 30 days.', 'segment_id': 's1', 'document_id': 'd1', 'score': 0.9},
+        {'text': 'Shipping takes 5 days.', 'segment_id': 's2', 'document_id': 'd2', 'score': 0.8}
+    ]
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+class _FakeEmbeddingService:
+    async def generate_embedding(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+class TestFakeStreamingProvider:
+    """Test FakeStreamingProvider"""
+
+    @pytest.mark.asyncio
+    async def test_streams_deltas_and_usage(self):
+        provider = FakeStreamingProvider("Hello streamed world")
+        deltas = [delta async for delta in provider.stream("prompt text")]
+        assert deltas == ["Hello ", "streamed ", "world"]
+        assert provider.usage['completion_tokens'] > 0
+        assert provider.usage['total_tokens'] == provider.usage['prompt_tokens'] + provider.usage['completion_tokens']
+
+        provider = FakeStreamingProvider(lambda prompt: prompt.upper())
+        assert "".join([delta async for delta in provider.stream("a b")]) == "A B"
+
+    def test_format_sse(self):
+        frame = format_sse('delta', {'text': 'مرحبا'})
+        assert frame == 'event: delta\ndata: {"text": "مرحبا"}\n\n'
+        assert json.loads(frame.split('data: ')[1]) == {'text': 'مرحبا'}
+
+
+class TestAnswerStream:
+    """Test RAGPipeline.answer_stream"""
+
+    @pytest.fixture
+    def pipeline(self, monkeypatch):
+        async def retrieve(self, query, top_k=5, **kwargs):
+            self.timings = {'search_ms': 1.0}
+            return _hits() if query != 'nothing' else []
+
+        monkeypatch.setattr(DocumentRetriever, 'retrieve', retrieve)
+        pipeline = RAGPipeline(None, answer_cache=SemanticAnswerCache())
+        pipeline.embedding_service = _FakeEmbeddingService()
+        return pipeline
+
+    @pytest.mark.asyncio
+    async def test_sources_then_deltas_then_done(self, pipeline):
+        provider = FakeStreamingProvider("Within thirty days.", first_token_delay=0.02)
+        events = await _collect(pipeline.answer_stream('refunds?', provider, top_k=2, use_reranking=False))
+
+        names = [name for name, _ in events]
+        assert names[0] == 'sources' and names[-1] == 'done'
+        assert set(names[1:-1]) == {'delta'}
+        assert [s['segment_id'] for s in events[0][1]['sources']] == ['s1', 's2']
+
+        done = events[-1][1]
+        assert done['answer'] == "".join(data['text'] for name, data in events if name == 'delta')
+        assert done['usage']['completion_tokens'] > 0
+        latency = done['latency']
+        assert 0.02 <= latency['time_to_first_token'] <= latency['total_latency']
+        assert latency['provider_response_latency'] <= latency['total_latency']
+
+        # The streamed answer is cached for near-duplicate questions
+        events = await _collect(pipeline.answer_stream('refunds?', provider, top_k=2, use_reranking=False))
+        assert events[0][1]['cached'] and events[-1][1]['cached']
+        assert events[1] == ('delta', {'text': "Within thirty days."})
+
+    @pytest.mark.asyncio
+    async def test_nothing_retrieved(self, pipeline):
+        events = await _collect(pipeline.answer_stream('nothing', FakeStreamingProvider(), use_reranking=False))
+        assert [name for name, _ in events] == ['sources', 'done']
+        assert events[-1][1]['answer'] is None
+
+
+class TestMessageLatency:
+    """Test Message latency fields"""
+
+    def test_latency_fields_are_persisted(self):
+        engine = create_engine('sqlite://')
+        Message.metadata.create_all(engine, tables=[Message.__table__])
+        db = sessionmaker(bind=engine)()
+        db.add(Message(conversation_id='c1', query='q', answer='a', retrieval_used=True, retrieval_count=2,
+                       time_to_first_token=0.25, provider_response_latency=1.5, total_latency=1.75))
+        db.commit()
+
+        message = db.query(Message).filter(Message.total_latency.isnot(None)).one()
+        assert (message.time_to_first_token, message.total_latency) == (0.25, 1.75)
+        db.close()
@@ -0,0 +1,115 @@
+"""
+Unit Tests for the Arabic/English text analyzer
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Document, DocumentSegment
+from core.rag.reranker import BM25Scorer
+from document_processing.chunking.multilingual_splitter import MultilingualTextSplitter
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+from utilities.text_analyzer import TextAnalyzer, analyze, light_stem, normalize_arabic
+
+
+class _FakeEmbeddingService:
+    async def generate_embeddings(self, texts, use_cache=True):
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    async def generate_embedding(self, text):
+        return [float(len(text)), 1.0, 0.0]
+
+    def get_embedding_dimension(self):
+        return 3
+
+
+class TestTextAnalyzer:
+    """Test normalization, stop words and light stemming"""
+
+    def test_normalize_arabic(self):
+        assert normalize_arabic("أحمد إلى آخر مكتبة مستشفى") == "احمد الي اخر مكتبه مستشفي"
+        assert normalize_arabic("مُدَرِّسَةٌ كـــبير") == "مدرسه كبير"
+
+    def test_light_stem(self):
+        assert light_stem('والمكتبات') == 'مكتب'
+        assert light_stem('بالمدرسه') == 'مدرس'
+        assert light_stem('policies') == 'policy'
+        assert light_stem('classes') == 'class'
+        assert light_stem('status') == 'status'
+
+    def test_analyze(self):
+        assert analyze("The revenue, in Q3 is UP!") == ['revenue']
+        assert analyze("التقرير المالي في الربع") == ['تقرير', 'مال', 'ربع']
+        # Spelling variants and diacritics meet on one term
+        assert analyze("الشَّرِكَة") == analyze("الشركه") == analyze("والشركات")
+
+    def test_configurable_stop_words(self):
+        analyzer = TextAnalyzer(stop_words=['تقرير', 'Quarterly'], stem=False)
+        assert analyzer("التقرير تقرير quarterly results هذا") == ['التقرير', 'results', 'هذا']
+        assert TextAnalyzer(min_length=2)("Q3 is up") == ['q3', 'up']
+
+    def test_splitter_stores_text_unnormalized(self):
+        # Stored chunks keep ى and tatweel; only the terms are normalized
+        splitter = MultilingualTextSplitter(chunk_size=100, chunk_overlap=0)
+        cleaned = splitter._clean_arabic_text("  مُدَرِّسَةٌ   إلى\nالمكتـــبة ")
+        assert cleaned == "مدرسه الى المكتـــبه"
+        assert analyze(cleaned) == analyze("مدرسة إلي المكتبة")
+
+
+class TestIngestTerms:
+    """Test that segments are analyzed once, at indexing"""
+
+    @pytest.fixture
+    def db(self):
+        engine = create_engine('sqlite://')
+        Document.metadata.create_all(engine, tables=[Document.__table__, DocumentSegment.__table__])
+        session = sessionmaker(bind=engine)()
+        session.add(Document(id='d1', name='d1.txt', type='txt', dataset_id='ds-a'))
+        session.add(DocumentSegment(id='s1', document_id='d1', content='Refund policies of the company', position=0))
+        session.add(DocumentSegment(id='s2', document_id='d1', content='سياسة الاسترداد للعملاء', position=1))
+        session.commit()
+        yield session
+        session.close()
+
+    @pytest.mark.asyncio
+    async def test_terms_stored_and_reused(self, db, monkeypatch):
+        retriever = DocumentRetriever(db, collections=CollectionManager())
+        retriever.embedding_service = _FakeEmbeddingService()
+
+        await retriever.index_dataset('ds-a', tenant_id='t1')
+        db.expire_all()
+        assert db.get(DocumentSegment, 's1').keywords == ['refund', 'policy', 'company']
+        assert db.get(DocumentSegment, 's2').keywords == analyze('سياسة الاسترداد للعملاء')
+
+        hits = await retriever.retrieve('refund', top_k=2, tenant_id='t1', dataset_id='ds-a')
+        assert {hit['segment_id']: hit['tokens'] for hit in hits}['s1'] == ['refund', 'policy', 'company']
+
+        # Reranking analyzes the query only
+        analyzed = []
+        monkeypatch.setattr('core.rag.reranker.analyze', lambda text: analyzed.append(text) or analyze(text))
+        scores = BM25Scorer().score('refunds', hits)
+        assert analyzed == ['refunds']
+        assert scores[[hit['segment_id'] for hit in hits].index('s1')] > 0
+
+    @pytest.mark.asyncio
+    async def test_skipped_segments_are_backfilled(self, db):
+        retriever = DocumentRetriever(db, collections=CollectionManager())
+        retriever.embedding_service = _FakeEmbeddingService()
+        await retriever.index_dataset('ds-a', tenant_id='t1')
+
+        # Segment indexed before keywords were stored
+        db.get(DocumentSegment, 's1').keywords = None
+        db.commit()
+        result = await retriever.index_dataset('ds-a', tenant_id='t1')
+        assert (result['skipped'], result['indexed'], result['keywords_backfilled']) == (2, 0, 1)
+        db.expire_all()
+        assert db.get(DocumentSegment, 's1').keywords == ['refund', 'policy', 'company']
+
+        result = await retriever.index_dataset('ds-a', tenant_id='t1')
+        assert result['keywords_backfilled'] == 0
+
+    def test_bm25_falls_back_to_text(self):
+        scores = BM25Scorer().score('policy', [{'text': 'Our policies'}, {'text': 'unrelated', 'tokens': ['policy']}])
+        assert scores[0] > 0 and scores[1] > 0
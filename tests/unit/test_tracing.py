@@ -0,0 +1,137 @@
+"""
+Unit Tests for request tracing spans
+"""
+
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+
+from knowledge_base.retrieval.retriever import DocumentRetriever
+from knowledge_base.vector_store.collection_manager import CollectionManager
+from utilities.tracing import (
+    TraceFileWriter, current_trace, record_span, span, stage_breakdown, start_trace
+)
+
+
+class _FakeEmbeddingService:
+    def __init__(self, vector):
+        self.vector = vector
+
+    async def generate_embedding(self, text):
+        with span('embedding', texts=1):
+            return self.vector
+
+
+class TestTracing:
+    """Test spans and traces"""
+
+    def test_span_is_noop_outside_trace(self):
+        assert current_trace() is None
+        with span('orphan') as orphan:
+            orphan.set(ignored=True)
+
+    def test_nested_spans(self, tmp_path):
+        writer = TraceFileWriter(str(tmp_path / 'traces.jsonl'))
+        with start_trace('chat', writer=writer, user_id='u1') as trace:
+            with span('retrieve', top_k=5) as retrieve:
+                with span('embedding'):
+                    time.sleep(0.002)
+                retrieve.set(hits=3)
+            started = time.perf_counter()
+            record_span('generate', started - 0.01, started, provider='fake')
+        writer.close()
+
+        names = [s.name for s in trace.spans]
+        assert names == ['chat', 'retrieve', 'embedding', 'generate']
+        root, retrieve, embedding, generate = trace.spans
+        assert retrieve.parent_id == root.span_id
+        assert embedding.parent_id == retrieve.span_id
+        assert retrieve.attributes == {'top_k': 5, 'hits': 3}
+        assert embedding.duration_ms <= retrieve.duration_ms <= trace.duration_ms
+        assert generate.duration_ms == pytest.approx(10, abs=0.01)
+        assert set(trace.stages()) == {'retrieve', 'embedding', 'generate'}
+
+        lines = (tmp_path / 'traces.jsonl').read_text(encoding='utf-8').splitlines()
+        saved = json.loads(lines[0])
+        assert saved['trace_id'] == trace.trace_id
+        assert saved['spans'][0]['attributes'] == {'user_id': 'u1'}
+        assert current_trace() is None
+
+    def test_error_is_recorded(self, tmp_path):
+        writer = TraceFileWriter(str(tmp_path / 'traces.jsonl'))
+        with pytest.raises(ValueError):
+            with start_trace('chat', writer=writer) as trace:
+                with span('generate'):
+                    raise ValueError("boom")
+        assert trace.spans[1].attributes == {'error': 'ValueError'}
+        assert trace.root.attributes == {'error': 'ValueError'}
+        writer.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_tasks_attach_to_parent(self, tmp_path):
+        async def search(name):
+            with span('vector_search', dataset=name):
+                await asyncio.sleep(0.001)
+
+        writer = TraceFileWriter(str(tmp_path / 'traces.jsonl'))
+        with start_trace('chat', writer=writer) as trace:
+            with span('retrieve') as retrieve:
+                await asyncio.gather(search('a'), search('b'))
+        writer.close()
+
+        searches = [s for s in trace.spans if s.name == 'vector_search']
+        assert len(searches) == 2
+        assert {s.parent_id for s in searches} == {retrieve.span_id}
+
+    def test_trace_file_rotates(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        writer = TraceFileWriter(str(path), max_bytes=2000, backup_count=2)
+        for _ in range(30):
+            with start_trace('chat', writer=writer, padding='x' * 200):
+                pass
+        writer.close()
+        assert (tmp_path / 'traces.jsonl.1').exists()
+        assert not (tmp_path / 'traces.jsonl.3').exists()
+        assert path.stat().st_size <= 2000
+
+    def test_stage_breakdown(self):
+        traces = [
+            {'stages': {'embedding': 10.0, 'generate': 100.0}},
+            {'stages': {'embedding': 20.0}},
+            None,
+            {}
+        ]
+        breakdown = stage_breakdown(traces)
+        assert breakdown['embedding']['count'] == 2
+        assert breakdown['embedding']['average'] == 15.0
+        assert breakdown['embedding']['max'] == 20.0
+        assert breakdown['generate']['p50'] == 100.0
+
+
+class TestRetrievalTrace:
+    """Test spans on the retrieval path"""
+
+    @pytest.mark.asyncio
+    async def test_retrieve_records_stages(self, tmp_path):
+        vectors = np.random.default_rng(0).standard_normal((4, 8)).astype(np.float32)
+        collections = CollectionManager()
+        await collections.get_or_create('t1', 'ds-a').add_embeddings(
+            texts=[f"text {i}" for i in range(4)],
+            embeddings=vectors.tolist(),
+            metadatas=[{'segment_id': f"s{i}"} for i in range(4)],
+            ids=[f"s{i}" for i in range(4)]
+        )
+        retriever = DocumentRetriever(None, collections=collections)
+        retriever.embedding_service = _FakeEmbeddingService(vectors[0].tolist())
+
+        writer = TraceFileWriter(str(tmp_path / 'traces.jsonl'))
+        with start_trace('chat', writer=writer) as trace:
+            await retriever.retrieve('q', top_k=2, tenant_id='t1', dataset_id='ds-a')
+        writer.close()
+
+        assert [s.name for s in trace.spans] == ['chat', 'retrieve', 'embedding', 'vector_search']
+        assert trace.spans[3].attributes == {'hits': 2}
+        assert trace.spans[2].parent_id == trace.spans[1].span_id
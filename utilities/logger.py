@@ -56,3 +56,7 @@ def get_logger(name: str) -> logging.Logger:
         Logger instance
     """
     return logging.getLogger(name)
+
+
+# Shared application logger (used by modules importing `logger` directly)
+logger = get_logger("rag_enterprise")
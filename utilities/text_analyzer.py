@@ -0,0 +1,141 @@
+"""
+Text Analyzer - normalization, tokenization and light stemming for Arabic and English
+
+One analyzer turns text into index terms, for documents and queries alike:
+
+1. Arabic normalization with a precompiled translation table (alef with
+   hamza/madda -> ا, ة -> ه, ى -> ي, diacritics and tatweel dropped),
+   applied with a single str.translate pass
+2. Lowercasing and splitting into word runs (one compiled regex)
+3. Stop-word removal against a configurable stop list
+4. Light stemming: Arabic prefix/suffix stripping (light10 style) and
+   English plural stripping (S-stemmer)
+
+Segments are analyzed once when they are indexed and their terms are
+stored (DocumentSegment.keywords), so per request only the query is
+analyzed.
+"""
+from functools import lru_cache
+from typing import Iterable, List, Optional
+import re
+
+ARABIC_DIACRITICS = ''.join(chr(code) for code in range(0x064B, 0x0660)) + '\u0670'
+TATWEEL = '\u0640'
+
+_ARABIC_TABLE = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    **{mark: None for mark in ARABIC_DIACRITICS + TATWEEL}
+})
+
+_TOKEN = re.compile(r'\w+')
+
+ARABIC_STOP_WORDS = frozenset({
+    'في', 'من', 'إلى', 'على', 'عن', 'مع', 'هو', 'هي', 'هم', 'هذا', 'هذه', 'ذلك', 'تلك',
+    'التي', 'الذي', 'الذين', 'أن', 'إن', 'أو', 'ثم', 'لكن', 'بل', 'كان', 'كانت', 'قد',
+    'لا', 'ما', 'لم', 'لن', 'كل', 'بعض', 'غير', 'بين', 'عند', 'حتى', 'إذا', 'كما', 'أيضا',
+    'حيث', 'لقد', 'منذ', 'نحو', 'أي', 'ضمن', 'وفي', 'ومن', 'وهو', 'وهي'
+})
+
+ENGLISH_STOP_WORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'and', 'are', 'was', 'were', 'been', 'for', 'with',
+    'from', 'this', 'that', 'these', 'those', 'its', 'into', 'than', 'then', 'there',
+    'their', 'they', 'them', 'not', 'but', 'can', 'will', 'would', 'should', 'could',
+    'has', 'have', 'had', 'does', 'did', 'what', 'when', 'where', 'who', 'whom', 'how',
+    'also', 'about', 'any', 'each', 'other', 'some', 'such'
+})
+
+DEFAULT_STOP_WORDS = ARABIC_STOP_WORDS | ENGLISH_STOP_WORDS
+
+# One prefix (longest first) and then each suffix in turn are stripped, as long
+# as two letters remain
+_ARABIC_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_ARABIC_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+
+
+def normalize_arabic(text: str) -> str:
+    """Unify alef/taa marbuta/alef maqsura forms and drop diacritics and tatweel"""
+    return text.translate(_ARABIC_TABLE)
+
+
+def _stem_arabic(word: str) -> str:
+    if len(word) > 3 and word.startswith('و'):
+        word = word[1:]
+    for prefix in _ARABIC_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            word = word[len(prefix):]
+            break
+    for suffix in _ARABIC_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            word = word[:-len(suffix)]
+    return word
+
+
+def _stem_english(word: str) -> str:
+    if len(word) > 3:
+        if word.endswith('sses'):
+            return word[:-2]
+        if word.endswith('ies') and not word.endswith(('eies', 'aies')):
+            return word[:-3] + 'y'
+        if word.endswith('es') and not word.endswith(('aes', 'ees', 'oes')):
+            return word[:-1]
+        if word.endswith('s') and not word.endswith(('us', 'ss')):
+            return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def light_stem(token: str) -> str:
+    """Light stem of a normalized, lowercased token"""
+    if '\u0600' <= token[0] <= '\u06ff':
+        return _stem_arabic(token)
+    return _stem_english(token)
+
+
+class TextAnalyzer:
+    """Text -> index terms (callable, so it plugs in wherever an analyzer is expected)"""
+
+    def __init__(
+        self,
+        stop_words: Optional[Iterable[str]] = None,
+        stem: bool = True,
+        min_length: int = 3
+    ):
+        """
+        Args:
+            stop_words: Words to drop (default: Arabic and English lists);
+                normalized like the text, so any spelling variant works
+            stem: Apply light stemming
+            min_length: Shorter tokens are dropped (before stemming)
+        """
+        words = DEFAULT_STOP_WORDS if stop_words is None else stop_words
+        self.stop_words = frozenset(self.normalize(word) for word in words)
+        self.stem = stem
+        self.min_length = min_length
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return text.lower().translate(_ARABIC_TABLE)
+
+    def tokens(self, text: str) -> List[str]:
+        """Normalized word tokens, before stop words and stemming"""
+        return _TOKEN.findall(self.normalize(text))
+
+    def analyze(self, text: str) -> List[str]:
+        """Index terms of a text"""
+        stop_words, min_length = self.stop_words, self.min_length
+        terms = [token for token in self.tokens(text) if len(token) >= min_length and token not in stop_words]
+        if self.stem:
+            return [light_stem(term) for term in terms]
+        return terms
+
+    __call__ = analyze
+
+
+default_analyzer = TextAnalyzer()
+
+
+def analyze(text: str) -> List[str]:
+    """Index terms of a text with the default analyzer"""
+    return default_analyzer.analyze(text)
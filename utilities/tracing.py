@@ -0,0 +1,255 @@
+"""
+Request Tracing - lightweight spans for per-stage latency
+
+A trace is started per request (start_trace); code on the request path
+opens nested spans (span) that record start/end times and attributes.
+The active trace and span live in context variables, so spans opened in
+asyncio tasks and threads started from the request attach to it. Outside
+a trace, span() is a no-op.
+
+Finished traces can be written as JSON lines to a size-rotated trace file
+(TraceFileWriter) and summarized per stage (stage_breakdown).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
+import logging
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """One timed stage of a request"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "started_at", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, **attributes: Any):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.started_at = time.time()
+        self.attributes: Dict[str, Any] = attributes
+
+    def set(self, **attributes: Any):
+        """Add or update attributes"""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end - self.start) * 1000 if self.end is not None else None
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3) if self.end is not None else None,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Span returned outside a trace"""
+
+    def set(self, **attributes: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request; the first span is the root"""
+
+    def __init__(self, name: str, **attributes: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, **attributes)
+        self.spans: List[Span] = [self.root]
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return self.root.duration_ms
+
+    def finish(self):
+        self.root.finish()
+
+    def stages(self) -> Dict[str, float]:
+        """Total milliseconds per span name (finished spans below the root)"""
+        stages: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            if span.end is not None:
+                stages[span.name] = stages.get(span.name, 0.0) + span.duration_ms
+        return {name: round(ms, 3) for name, ms in stages.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'started_at': self.root.started_at,
+            'total_ms': round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            'stages': self.stages(),
+            'spans': [span.to_dict(self.root.start) for span in self.spans]
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, writer: Optional["TraceFileWriter"] = None, **attributes: Any) -> Iterator[Trace]:
+    """
+    Trace a request; spans opened inside attach to it
+
+    The trace is finished on exit (or earlier with trace.finish()) and
+    written to the trace file when tracing is enabled.
+    """
+    trace = Trace(name, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.set(error=type(e).__name__)
+        raise
+    finally:
+        trace.finish()
+        try:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+        except ValueError:
+            # Exited from another context (e.g. an async generator closed late)
+            pass
+        writer = writer or get_trace_writer()
+        if writer is not None:
+            writer.write(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Time a stage of the current trace (no-op outside a trace)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, **attributes)
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.finish()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            pass
+
+
+def record_span(name: str, start: float, end: float, **attributes: Any):
+    """
+    Add an already finished stage (perf_counter start/end) to the current trace
+
+    For stages that cannot hold a span open, e.g. an LLM stream consumed
+    across the yields of an async generator.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    recorded = Span(name, parent.span_id if parent else None, **attributes)
+    recorded.started_at -= recorded.start - start
+    recorded.start = start
+    recorded.end = end
+    trace.spans.append(recorded)
+
+
+class TraceFileWriter:
+    """Append traces as JSON lines to a size-rotated file"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._lock = threading.Lock()
+
+    def write(self, trace: Trace):
+        record = logging.makeLogRecord({'msg': json.dumps(trace.to_dict(), ensure_ascii=False, default=str)})
+        with self._lock:
+            try:
+                self._handler.emit(record)
+            except Exception as e:
+                logger.error(f"Failed to write trace {trace.trace_id}: {e}")
+
+    def close(self):
+        self._handler.close()
+
+
+_trace_writer: Optional[TraceFileWriter] = None
+
+
+def get_trace_writer() -> Optional[TraceFileWriter]:
+    """Process-wide trace file writer (None when trace_file_enabled is off)"""
+    global _trace_writer
+    if _trace_writer is None and settings.trace_file_enabled:
+        try:
+            _trace_writer = TraceFileWriter(
+                settings.trace_file_path,
+                max_bytes=settings.trace_file_max_bytes,
+                backup_count=settings.trace_file_backups
+            )
+        except OSError as e:
+            logger.error(f"Trace file disabled: {e}")
+            settings.trace_file_enabled = False
+    return _trace_writer
+
+
+def stage_breakdown(traces: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Latency per stage over many traces (as stored by Trace.to_dict)
+
+    Returns:
+        {stage: {count, average, p50, p95, max}} in milliseconds
+    """
+    samples: Dict[str, List[float]] = {}
+    for trace in traces:
+        for stage, ms in (trace or {}).get('stages', {}).items():
+            samples.setdefault(stage, []).append(ms)
+
+    breakdown = {}
+    for stage, values in samples.items():
+        values = np.asarray(values, dtype=float)
+        breakdown[stage] = {
+            'count': int(values.size),
+            'average': round(float(values.mean()), 3),
+            'p50': round(float(np.percentile(values, 50)), 3),
+            'p95': round(float(np.percentile(values, 95)), 3),
+            'max': round(float(values.max()), 3)
+        }
+    return breakdown